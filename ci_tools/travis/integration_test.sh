@@ -25,6 +25,7 @@ sqlalchemy:
     host: localhost
     port: 5432
     database: databoard_test" > config.yml
+ramp database init-db
 ramp database add-user --login admin_user --password password --firstname firstname --lastname lastname --email admin@email.com --access-level admin
 ramp setup init-event --name iris_test
 echo "ramp:
@@ -8,6 +8,7 @@ import shutil
 from ramp_utils import read_config
 from ramp_utils import generate_ramp_config
 
+from .utils import init_db as init_db_tables
 from .utils import session_scope
 
 from .tools import event as event_module
@@ -25,6 +26,16 @@ def main():
     pass
 
 
+@main.command()
+@click.option("--config", default='config.yml', show_default=True,
+              help='Configuration file YAML format containing the database '
+              'information')
+def init_db(config):
+    """Create the tables of the database."""
+    config = read_config(config)
+    init_db_tables(config['sqlalchemy'])
+
+
 @main.command()
 @click.option("--config", default='config.yml', show_default=True,
               help='Configuration file YAML format containing the database '
@@ -361,6 +372,50 @@ def update_all_users_leaderboards(config, event):
         leaderboard_module.update_all_user_leaderboards(session, event)
 
 
+@main.command()
+@click.option("--config", default='config.yml', show_default=True,
+              help='Configuration file YAML format containing the database '
+              'information')
+@click.option("--config-event", required=True,
+              help='Path to configuration file YAML format '
+              'containing the event information, eg config.yml')
+@click.option("--n-jobs", default=1, show_default=True,
+              help='The number of threads used to compute the scores of a '
+              'submission. -1 means using all the processors.')
+def rescore_event(config, config_event, n_jobs):
+    """Re-score all the scored submissions of an event.
+
+    The predictions are read from the predictions directory of the event.
+    """
+    internal_config = read_config(config)
+    ramp_config = generate_ramp_config(config_event, config)
+    event = ramp_config['event_name']
+    with session_scope(internal_config['sqlalchemy']) as session:
+        submissions = submission_module.get_submissions(
+            session, event, state='scored'
+        )
+        if not submissions:
+            click.echo('No scored submission for this event')
+            return
+        with click.progressbar(submissions,
+                               label='Re-scoring submissions') as bar:
+            for submission_id, submission_name, _ in bar:
+                path_predictions = os.path.join(
+                    ramp_config['ramp_predictions_dir'], submission_name
+                )
+                if not os.path.exists(path_predictions):
+                    raise click.ClickException(
+                        'The predictions of the submission {} are missing '
+                        'in {}'.format(submission_name, path_predictions)
+                    )
+                submission_module.score_submission(
+                    session, submission_id, n_jobs=n_jobs,
+                    path_predictions=path_predictions
+                )
+        leaderboard_module.update_leaderboards(session, event)
+        leaderboard_module.invalidate_user_leaderboards(session, event)
+
+
 def start():
     main()
 
@@ -62,6 +62,8 @@ class BaseQuery(orm.Query):
     standard SQLAlchemy sqlalchemy.orm.query.Query class and
     has all the methods of a standard query as well.
     """
+    DEFAULT_PER_PAGE = 20
+
     def paginate(self, page, per_page=20, error_out=True):
         """Return `Pagination` instance using already defined query
         parameters.
@@ -72,7 +74,7 @@ class BaseQuery(orm.Query):
         if per_page is None:
             per_page = self.DEFAULT_PER_PAGE
 
-        items = self.page(page, per_page).all()
+        items = self.limit(per_page).offset((page - 1) * per_page).all()
 
         if not items and page != 1 and error_out:
             raise IndexError
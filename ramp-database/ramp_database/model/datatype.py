@@ -1,3 +1,6 @@
+import hashlib
+import io
+import os
 import pickle
 import zlib
 
@@ -6,7 +9,22 @@ import numpy as np
 from sqlalchemy import LargeBinary
 from sqlalchemy import TypeDecorator
 
-__all__ = ['NumpyType']
+__all__ = ['NumpyType', 'NumpyArrayType', 'ArrayStore',
+           'configure_array_storage']
+
+# prefix of the values written by NumpyArrayType: it is followed by one byte
+# identifying the codec and by the encoded ``.npy`` content
+_ARRAY_MAGIC = b'RAMPNPY\x01'
+# prefix of the values referencing an array in the ArrayStore: it is followed
+# by the SHA-256 hex digest of the array
+_REFERENCE_MAGIC = b'RAMPREF\x01'
+
+_CODECS = {'none': b'\x00', 'lz4': b'\x01', 'zstd': b'\x02'}
+_CODECS_ID = {value: key for key, value in _CODECS.items()}
+
+# storage options shared by all the NumpyArrayType columns; see
+# configure_array_storage
+_STORAGE = {'codec': 'none', 'store': None, 'threshold': 1 << 20}
 
 
 class NumpyType(TypeDecorator):
@@ -45,3 +63,197 @@ class NumpyType(TypeDecorator):
             The NumPy array which has been loaded.
         """
         return pickle.loads(zlib.decompress(value))
+
+
+def _compress(data, codec):
+    if codec == 'none':
+        return data
+    elif codec == 'lz4':
+        import lz4.frame
+        return lz4.frame.compress(data)
+    elif codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compress(data)
+    raise ValueError("Unknown codec '{}'. Choose one of {}."
+                     .format(codec, sorted(_CODECS)))
+
+
+def _decompress(data, codec):
+    if codec == 'none':
+        return data
+    elif codec == 'lz4':
+        import lz4.frame
+        return lz4.frame.decompress(data)
+    import zstandard
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+class ArrayStore:
+    """Content-addressed storage of NumPy arrays on disk.
+
+    Each array is saved once in a ``.npy`` file named after the SHA-256 hash
+    of its content and is loaded back as a memory-mapped array.
+
+    Parameters
+    ----------
+    path : str
+        The directory where the arrays are stored.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _filename(self, digest):
+        return os.path.join(self.path, digest[:2], digest + '.npy')
+
+    def put(self, data):
+        """Store the content of a ``.npy`` file.
+
+        Parameters
+        ----------
+        data : bytes
+            The ``.npy`` content.
+
+        Returns
+        -------
+        digest : str
+            The SHA-256 hex digest identifying the array.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        filename = self._filename(digest)
+        if not os.path.exists(filename):
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            # write in a temporary file first such that a concurrent reader
+            # never sees a partially written array
+            tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+            with open(tmp_filename, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_filename, filename)
+        return digest
+
+    def get(self, digest):
+        """Load a stored array.
+
+        Parameters
+        ----------
+        digest : str
+            The SHA-256 hex digest identifying the array.
+
+        Returns
+        -------
+        array : :class:`numpy.memmap`
+            The memory-mapped array. It is opened in copy-on-write mode:
+            in-place modifications are not written back on disk.
+        """
+        return np.load(self._filename(digest), mmap_mode='c',
+                       allow_pickle=False)
+
+
+def configure_array_storage(codec='none', store_path=None,
+                            threshold=1 << 20):
+    """Configure how the :class:`NumpyArrayType` columns are written.
+
+    Parameters
+    ----------
+    codec : {'none', 'lz4', 'zstd'}, default='none'
+        The codec used to compress the arrays stored in the database.
+        ``'lz4'`` and ``'zstd'`` respectively require the ``lz4`` and
+        ``zstandard`` packages.
+    store_path : str or None, default=None
+        The directory of the :class:`ArrayStore` in which the large arrays of
+        the columns declared with ``external=True`` are written. If None, all
+        arrays are stored in the database.
+    threshold : int, default=1048576
+        The size in bytes above which an array is written in the
+        :class:`ArrayStore`.
+    """
+    if codec not in _CODECS:
+        raise ValueError("Unknown codec '{}'. Choose one of {}."
+                         .format(codec, sorted(_CODECS)))
+    _STORAGE['codec'] = codec
+    _STORAGE['store'] = None if store_path is None else ArrayStore(store_path)
+    _STORAGE['threshold'] = threshold
+
+
+class NumpyArrayType(TypeDecorator):
+    """Storing numpy arrays in the ``.npy`` format without pickling.
+
+    The arrays are written as ``.npy`` content optionally compressed with the
+    codec selected with :func:`configure_array_storage`. Columns declared
+    with ``external=True`` can write the large arrays in an
+    :class:`ArrayStore` and keep only a reference in the database. Values
+    written by :class:`NumpyType` can still be read.
+
+    Parameters
+    ----------
+    external : bool, default=False
+        Whether the large arrays can be written in the :class:`ArrayStore`.
+    """
+    impl = LargeBinary
+
+    def __init__(self, external=False, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.external = external
+
+    def process_bind_param(self, value, dialect):
+        """Serialize NumPy arrays.
+
+        Parameters
+        ----------
+        value : ndarray or None
+            The array to serialize.
+        dialect : Dialect
+            Dialect in use.
+        Returns
+        -------
+        data : bytes or None
+            The serialized array.
+        """
+        if value is None:
+            return None
+        array = np.asarray(value)
+        if array.dtype.hasobject:
+            # object arrays cannot be saved without pickling
+            return NumpyType().process_bind_param(array, dialect)
+        buffer = io.BytesIO()
+        np.save(buffer, array, allow_pickle=False)
+        data = buffer.getvalue()
+        store = _STORAGE['store']
+        if (self.external and store is not None and
+                array.nbytes >= _STORAGE['threshold']):
+            return _REFERENCE_MAGIC + store.put(data).encode('ascii')
+        codec = _STORAGE['codec']
+        return _ARRAY_MAGIC + _CODECS[codec] + _compress(data, codec)
+
+    def process_result_value(self, value, dialect):
+        """Load serialized NumPy arrays.
+
+        Parameters
+        ----------
+        value : bytes or None
+            The serialized array.
+        dialect : Dialect
+            Dialect in use.
+        Returns
+        -------
+        array : ndarray or None
+            The NumPy array which has been loaded. Arrays written in the
+            :class:`ArrayStore` are returned as :class:`numpy.memmap`.
+        """
+        if value is None:
+            return None
+        value = bytes(value)
+        if value.startswith(_ARRAY_MAGIC):
+            codec = _CODECS_ID[value[len(_ARRAY_MAGIC):len(_ARRAY_MAGIC) + 1]]
+            data = _decompress(value[len(_ARRAY_MAGIC) + 1:], codec)
+            return np.load(io.BytesIO(data), allow_pickle=False)
+        elif value.startswith(_REFERENCE_MAGIC):
+            store = _STORAGE['store']
+            if store is None:
+                raise ValueError(
+                    'The array is stored in an ArrayStore but no store is '
+                    'configured. Call configure_array_storage first.'
+                )
+            return store.get(value[len(_REFERENCE_MAGIC):].decode('ascii'))
+        # values written by NumpyType
+        return NumpyType().process_result_value(value, dialect)
@@ -10,6 +10,7 @@ from sqlalchemy import DateTime
 from sqlalchemy import ForeignKey
 from sqlalchemy import UniqueConstraint
 from sqlalchemy.orm import backref
+from sqlalchemy.orm import deferred
 from sqlalchemy.orm import relationship
 
 from .base import Model
@@ -108,6 +109,9 @@ class Event(Model):
         The public leaderboard of the competition in HTML.
     private_competition_leaderboard_html : str
         The private leaderboard of the competition in HTML.
+    leaderboard_version : int
+        The number of updates of the leaderboards. It changes each time the
+        leaderboards are updated.
     path_ramp_kit : str
         The path where the kit are located.
     ramp_sandbox_name : str
@@ -168,13 +172,21 @@ class Event(Model):
 
     n_submissions = Column(Integer, default=0)
 
-    public_leaderboard_html_no_links = Column(String, default=None)
-    public_leaderboard_html_with_links = Column(String, default=None)
-    private_leaderboard_html = Column(String, default=None)
-    failed_leaderboard_html = Column(String, default=None)
-    new_leaderboard_html = Column(String, default=None)
-    public_competition_leaderboard_html = Column(String, default=None)
-    private_competition_leaderboard_html = Column(String, default=None)
+    # the leaderboards are large: only load them when accessed
+    public_leaderboard_html_no_links = deferred(Column(String, default=None))
+    public_leaderboard_html_with_links = deferred(
+        Column(String, default=None)
+    )
+    private_leaderboard_html = deferred(Column(String, default=None))
+    failed_leaderboard_html = deferred(Column(String, default=None))
+    new_leaderboard_html = deferred(Column(String, default=None))
+    public_competition_leaderboard_html = deferred(
+        Column(String, default=None)
+    )
+    private_competition_leaderboard_html = deferred(
+        Column(String, default=None)
+    )
+    leaderboard_version = Column(Integer, default=0)
 
     # big change in the database
     ramp_sandbox_name = Column(String, nullable=False, unique=False,
@@ -486,6 +498,12 @@ class EventTeam(Model):
         The failed submission board for the team for the specific event.
     new_leaderboard_html : str
         The new submission board for the team for the specific event.
+    leaderboard_version : int
+        The number of updates of the leaderboards of the team. It changes
+        each time the leaderboards are updated.
+    leaderboard_outdated : bool
+        Whether the leaderboard and the failed submission board of the team
+        need to be recomputed before being displayed.
     submissions : list of :class:`ramp_database.model.Submission`
         A back-reference to the submissions associated with this event/team.
     """
@@ -508,9 +526,11 @@ class EventTeam(Model):
     signup_timestamp = Column(DateTime, nullable=False)
     approved = Column(Boolean, default=False)
 
-    leaderboard_html = Column(String, default=None)
-    failed_leaderboard_html = Column(String, default=None)
-    new_leaderboard_html = Column(String, default=None)
+    leaderboard_html = deferred(Column(String, default=None))
+    failed_leaderboard_html = deferred(Column(String, default=None))
+    new_leaderboard_html = deferred(Column(String, default=None))
+    leaderboard_version = Column(Integer, default=0)
+    leaderboard_outdated = Column(Boolean, default=False)
 
     UniqueConstraint(event_id, team_id, name='et_constraint')
 
@@ -6,7 +6,7 @@ from sqlalchemy.orm import backref
 from sqlalchemy.orm import relationship
 
 from .base import Model
-from .datatype import NumpyType
+from .datatype import NumpyArrayType
 
 __all__ = [
     'CVFold',
@@ -46,8 +46,8 @@ class CVFold(Model):
     id = Column(Integer, primary_key=True)
     type = Column(cv_fold_types, default='live')
 
-    train_is = Column(NumpyType, nullable=False)
-    test_is = Column(NumpyType, nullable=False)
+    train_is = Column(NumpyArrayType, nullable=False)
+    test_is = Column(NumpyArrayType, nullable=False)
 
     event_id = Column(Integer, ForeignKey('events.id'), nullable=False)
     event = relationship('Event',
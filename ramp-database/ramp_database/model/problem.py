@@ -1,4 +1,11 @@
+from collections import OrderedDict
+import hashlib
 import os
+import sys
+import threading
+import time
+
+import numpy as np
 
 from sqlalchemy import Float
 from sqlalchemy import Column
@@ -23,6 +30,187 @@ __all__ = [
 ]
 
 
+def _nbytes(obj):
+    """Estimate the memory used by an object."""
+    if hasattr(obj, 'memory_usage'):
+        # pandas dataframe or series
+        return int(np.sum(obj.memory_usage(deep=True)))
+    if hasattr(obj, 'nbytes'):
+        return int(obj.nbytes)
+    return sys.getsizeof(obj)
+
+
+def _data_fingerprint(path):
+    """Fingerprint the files of a data directory using their size and
+    modification time."""
+    hasher = hashlib.sha1()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for filename in sorted(files):
+            filepath = os.path.join(root, filename)
+            stat = os.stat(filepath)
+            hasher.update('{}:{}:{}'.format(
+                os.path.relpath(filepath, path), stat.st_size,
+                stat.st_mtime_ns).encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def _read_only(y):
+    """Prevent the in-place modification of a cached array."""
+    if isinstance(y, np.ndarray):
+        y.setflags(write=False)
+    return y
+
+
+class ProblemCache:
+    """Process-level cache of the problem modules and ground truths.
+
+    The problem module (and thus the ``Predictions`` class and the workflow
+    object) is cached using the path of the kit and the modification time of
+    ``problem.py``. The ground truths are additionally cached using a
+    fingerprint of the data directory, which is computed again at most every
+    ``fingerprint_ttl`` seconds. The cached ground truths stored in NumPy
+    arrays are read-only. The least recently used entries are evicted once
+    the memory budget is exceeded.
+
+    Parameters
+    ----------
+    max_bytes : int, default=536870912
+        The memory budget of the cache in bytes.
+    fingerprint_ttl : float, default=5
+        The time in seconds during which the fingerprint of a data directory
+        is reused. A modification of the data is thus taken into account
+        after at most ``fingerprint_ttl`` seconds.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 ** 2, fingerprint_ttl=5):
+        self.max_bytes = max_bytes
+        self.fingerprint_ttl = fingerprint_ttl
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        # data path -> (fingerprint, time at which it was computed)
+        self._fingerprints = {}
+        self._lock = threading.RLock()
+
+    def _get(self, key, load):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+        value = load()
+        nbytes = _nbytes(value)
+        with self._lock:
+            if key not in self._entries and nbytes <= self.max_bytes:
+                self._entries[key] = (value, nbytes)
+                self._nbytes += nbytes
+                while self._nbytes > self.max_bytes:
+                    _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                    self._nbytes -= evicted_nbytes
+        return value
+
+    def _data_fingerprint(self, path_ramp_data):
+        path_ramp_data = os.path.abspath(path_ramp_data)
+        now = time.monotonic()
+        with self._lock:
+            if path_ramp_data in self._fingerprints:
+                fingerprint, computed_at = self._fingerprints[path_ramp_data]
+                if now - computed_at < self.fingerprint_ttl:
+                    return fingerprint
+        fingerprint = _data_fingerprint(path_ramp_data)
+        with self._lock:
+            self._fingerprints[path_ramp_data] = (fingerprint, now)
+        return fingerprint
+
+    @staticmethod
+    def _module_key(path_ramp_kit):
+        problem_path = os.path.join(path_ramp_kit, 'problem.py')
+        return (os.path.abspath(path_ramp_kit),
+                os.stat(problem_path).st_mtime_ns)
+
+    def get_module(self, path_ramp_kit):
+        """Get the problem module of a kit.
+
+        Parameters
+        ----------
+        path_ramp_kit : str
+            The path where the kit is located.
+
+        Returns
+        -------
+        module : module
+            The problem module.
+        """
+        key = ('module',) + self._module_key(path_ramp_kit)
+        return self._get(key, lambda: import_module_from_source(
+            os.path.join(path_ramp_kit, 'problem.py'), 'problem'
+        ))
+
+    def get_ground_truth(self, path_ramp_kit, path_ramp_data, step):
+        """Get the true labels of the training or testing data.
+
+        Parameters
+        ----------
+        path_ramp_kit : str
+            The path where the kit is located.
+        path_ramp_data : str
+            The path where the data are located.
+        step : {'train', 'test'}
+            Whether to get the training or testing labels.
+
+        Returns
+        -------
+        y : ndarray or dataframe
+            The true labels. A NumPy array is read-only since it is shared
+            by the callers.
+        """
+        key = ((step,) + self._module_key(path_ramp_kit) +
+               (os.path.abspath(path_ramp_data),
+                self._data_fingerprint(path_ramp_data)))
+        module = self.get_module(path_ramp_kit)
+        get_data = getattr(module, 'get_{}_data'.format(step))
+        return self._get(key, lambda: _read_only(
+            get_data(path=path_ramp_data)[1]
+        ))
+
+    def clear(self, path_ramp_kit=None):
+        """Invalidate the cache.
+
+        The fingerprints of the data directories are always computed again.
+
+        Parameters
+        ----------
+        path_ramp_kit : str or None, default=None
+            The path of the kit for which the entries are removed. If None,
+            the whole cache is cleared.
+        """
+        with self._lock:
+            self._fingerprints.clear()
+            if path_ramp_kit is None:
+                self._entries.clear()
+                self._nbytes = 0
+                return
+            path_ramp_kit = os.path.abspath(path_ramp_kit)
+            for key in [key for key in self._entries
+                        if key[1] == path_ramp_kit]:
+                _, nbytes = self._entries.pop(key)
+                self._nbytes -= nbytes
+
+
+problem_cache = ProblemCache()
+
+
+def clear_problem_cache(path_ramp_kit=None):
+    """Invalidate the process-level cache of the problems.
+
+    Parameters
+    ----------
+    path_ramp_kit : str or None, default=None
+        The path of the kit for which the entries are removed. If None, the
+        whole cache is cleared.
+    """
+    problem_cache.clear(path_ramp_kit)
+
+
 class Problem(Model):
     """Problem table.
 
@@ -98,10 +286,7 @@ class Problem(Model):
     @property
     def module(self):
         """module: Get the problem module."""
-        return import_module_from_source(
-            os.path.join(self.path_ramp_kit, 'problem.py'),
-            'problem'
-        )
+        return problem_cache.get_module(self.path_ramp_kit)
 
     @property
     def title(self):
@@ -124,17 +309,23 @@ class Problem(Model):
 
     def ground_truths_train(self):
         """Predictions: the true labels for the training."""
-        _, y_train = self.get_train_data()
+        y_train = problem_cache.get_ground_truth(
+            self.path_ramp_kit, self.path_ramp_data, 'train'
+        )
         return self.Predictions(y_true=y_train)
 
     def ground_truths_test(self):
         """Predictions: the true labels for the testing."""
-        _, y_test = self.get_test_data()
+        y_test = problem_cache.get_ground_truth(
+            self.path_ramp_kit, self.path_ramp_data, 'test'
+        )
         return self.Predictions(y_true=y_test)
 
     def ground_truths_valid(self, test_is):
         """Predictions: the true labels for the validation."""
-        _, y_train = self.get_train_data()
+        y_train = problem_cache.get_ground_truth(
+            self.path_ramp_kit, self.path_ramp_data, 'train'
+        )
         return self.Predictions(y_true=y_train[test_is])
 
     @property
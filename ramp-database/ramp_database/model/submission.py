@@ -12,17 +12,20 @@ from sqlalchemy import DateTime
 from sqlalchemy import ForeignKey
 from sqlalchemy import UniqueConstraint
 from sqlalchemy import inspect
+from sqlalchemy import DDL
+from sqlalchemy import event as sa_event
 from sqlalchemy.orm import backref
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.hybrid import hybrid_property
 
 from .base import Model
 from .event import EventScoreType
-from .datatype import NumpyType
+from .datatype import NumpyArrayType
 
 __all__ = [
     'Submission',
     'SubmissionScore',
+    'SubmissionLeaderboardValue',
     'SubmissionFile',
     'SubmissionFileType',
     'SubmissionFileTypeExtension',
@@ -31,8 +34,13 @@ __all__ = [
     'SubmissionOnCVFold',
     'DetachedSubmissionOnCVFold',
     'SubmissionSimilarity',
+    'install_submission_notify_trigger',
 ]
 
+# channel on which PostgreSQL notifies that a submission is waiting to be
+# trained; the payload is the name of the event
+SUBMISSION_NOTIFY_CHANNEL = 'ramp_submission_new'
+
 # evaluate right after train/test, so no need for 'scored' states
 submission_states = Enum(
     'new',               # submitted by user to frontend server
@@ -129,6 +137,9 @@ class Submission(Model):
         A back-reference of the historical contributivities for the submission.
     scores : list of :class:`ramp_database.model.SubmissionScore`
         A back-reference of scores for the submission.
+    leaderboard_values : list of \
+:class:`ramp_database.model.SubmissionLeaderboardValue`
+        A back-reference of the materialised leaderboard values.
     files : list of :class:`ramp_database.model.SubmissionFile`
         A back-reference of files attached to the submission.
     on_cv_folds : list of :class:`ramp_database.model.SubmissionOnCVFold`
@@ -515,6 +526,56 @@ class Submission(Model):
             self.error_msg = ''
 
 
+# The trigger wakes up the dispatchers listening on the channel each time a
+# submission is added or reset to the 'new' state. It is only available with
+# PostgreSQL; other backends rely on polling.
+_submission_notify_function = DDL("""
+CREATE OR REPLACE FUNCTION ramp_notify_new_submission() RETURNS trigger AS $$
+DECLARE
+    event_name VARCHAR;
+BEGIN
+    IF NEW.state = 'new' THEN
+        SELECT events.name INTO event_name
+        FROM event_teams JOIN events ON events.id = event_teams.event_id
+        WHERE event_teams.id = NEW.event_team_id;
+        PERFORM pg_notify('%s', event_name);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+""" % SUBMISSION_NOTIFY_CHANNEL)
+
+_submission_notify_trigger = DDL("""
+DROP TRIGGER IF EXISTS ramp_submission_state_notify ON submissions;
+CREATE TRIGGER ramp_submission_state_notify
+AFTER INSERT OR UPDATE OF state ON submissions
+FOR EACH ROW EXECUTE PROCEDURE ramp_notify_new_submission();
+""")
+
+for _ddl in (_submission_notify_function, _submission_notify_trigger):
+    sa_event.listen(Submission.__table__, 'after_create',
+                    _ddl.execute_if(dialect='postgresql'))
+
+
+def install_submission_notify_trigger(db):
+    """Install the trigger notifying the new submissions.
+
+    The function and the trigger are replaced if they exist such that a
+    database created before the trigger was introduced gets it as well.
+    Nothing is done if the database is not PostgreSQL.
+
+    Parameters
+    ----------
+    db : :class:`sqlalchemy.Engine`
+        The engine to connect to the database.
+    """
+    if db.dialect.name != 'postgresql':
+        return
+    with db.begin() as conn:
+        for ddl in (_submission_notify_function, _submission_notify_trigger):
+            conn.execute(ddl)
+
+
 class SubmissionScore(Model):
     """SubmissionScore table.
 
@@ -561,8 +622,8 @@ class SubmissionScore(Model):
     test_score_cv_bag = Column(Float)  # holdout
     # we store the partial scores so to see the saturation and
     # overfitting as the number of cv folds grow
-    valid_score_cv_bags = Column(NumpyType)
-    test_score_cv_bags = Column(NumpyType)
+    valid_score_cv_bags = Column(NumpyArrayType)
+    test_score_cv_bags = Column(NumpyArrayType)
 
     @property
     def score_name(self):
@@ -581,6 +642,46 @@ class SubmissionScore(Model):
         return self.event_score_type.precision
 
 
+class SubmissionLeaderboardValue(Model):
+    """SubmissionLeaderboardValue table.
+
+    Materialised value of a leaderboard cell (scores, computation times, RAM)
+    for a submission, such that the leaderboards can be recomputed without
+    querying the scores of the submissions which did not change.
+
+    Attributes
+    ----------
+    id : int
+        The ID of the row table.
+    submission_id : int
+        The ID of the associated submission.
+    submission : :class:`ramp_database.model.Submission`
+        The submission instance associated.
+    name : str
+        The name of the leaderboard column (e.g. ``'bag public acc'``).
+    value : float
+        The value of the leaderboard cell.
+    state : str
+        The state of the submission when the value was computed. A value
+        computed for another state is considered outdated.
+    """
+    __tablename__ = 'submission_leaderboard_values'
+
+    id = Column(Integer, primary_key=True)
+    submission_id = Column(Integer, ForeignKey('submissions.id'),
+                           nullable=False, index=True)
+    submission = relationship(
+        'Submission',
+        backref=backref('leaderboard_values', cascade='all, delete-orphan')
+    )
+
+    name = Column(String, nullable=False)
+    value = Column(Float)
+    state = Column(String, nullable=False)
+
+    UniqueConstraint(submission_id, name, name='slv_constraint')
+
+
 # TODO: we should have a SubmissionWorkflowElementType table, describing the
 # type of files we are expecting for a given RAMP. Fast unit test should be
 # set up there, and each file should be unit tested right after submission.
@@ -693,8 +794,12 @@ class SubmissionFile(Model):
         code : str
             The code to write into the submission file.
         """
-        with open(self.path, 'w') as f:
+        # the file can be a hard link to a file shared with other
+        # submissions: write a new file instead of modifying it in place
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
             f.write(code)
+        os.replace(tmp_path, self.path)
 
 
 class SubmissionFileTypeExtension(Model):
@@ -929,8 +1034,8 @@ class SubmissionOnCVFold(Model):
 
     # prediction on the full training set, including train and valid points
     # properties train_predictions and valid_predictions will make the slicing
-    full_train_y_pred = Column(NumpyType, default=None)
-    test_y_pred = Column(NumpyType, default=None)
+    full_train_y_pred = Column(NumpyArrayType(external=True), default=None)
+    test_y_pred = Column(NumpyArrayType(external=True), default=None)
     train_time = Column(Float, default=0.0)
     valid_time = Column(Float, default=0.0)
     test_time = Column(Float, default=0.0)
@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+from numpy.testing import assert_array_equal
+import pytest
+
+from ramp_database.model import ArrayStore
+from ramp_database.model import NumpyArrayType
+from ramp_database.model import NumpyType
+from ramp_database.model import configure_array_storage
+
+
+@pytest.fixture
+def array_storage():
+    yield configure_array_storage
+    configure_array_storage()
+
+
+@pytest.mark.parametrize(
+    "array",
+    [np.arange(10), np.random.RandomState(0).rand(5, 3),
+     np.asfortranarray(np.ones((3, 4))), [0.1, 0.2], np.array(1.5)]
+)
+def test_numpy_array_type_round_trip(array):
+    column_type = NumpyArrayType()
+    data = column_type.process_bind_param(array, None)
+    assert data.startswith(b'RAMPNPY')
+    # the arrays are stored without pickling
+    assert b'numpy.core.multiarray' not in data
+    loaded = column_type.process_result_value(data, None)
+    assert_array_equal(loaded, np.asarray(array))
+    assert loaded.dtype == np.asarray(array).dtype
+
+
+def test_numpy_array_type_none():
+    column_type = NumpyArrayType()
+    assert column_type.process_bind_param(None, None) is None
+    assert column_type.process_result_value(None, None) is None
+
+
+def test_numpy_array_type_read_numpy_type():
+    # the values written by NumpyType can be read by NumpyArrayType
+    array = np.random.RandomState(0).rand(5, 3)
+    data = NumpyType().process_bind_param(array, None)
+    loaded = NumpyArrayType().process_result_value(data, None)
+    assert_array_equal(loaded, array)
+
+
+def test_numpy_array_type_object_array():
+    array = np.array(['a', None], dtype=object)
+    column_type = NumpyArrayType()
+    data = column_type.process_bind_param(array, None)
+    assert_array_equal(column_type.process_result_value(data, None), array)
+
+
+def test_configure_array_storage_error():
+    with pytest.raises(ValueError, match="Unknown codec 'xxx'"):
+        configure_array_storage(codec='xxx')
+
+
+@pytest.mark.parametrize("codec", ['lz4', 'zstd'])
+def test_numpy_array_type_codec(array_storage, codec):
+    pytest.importorskip({'lz4': 'lz4.frame', 'zstd': 'zstandard'}[codec])
+    array_storage(codec=codec)
+    array = np.zeros(10000)
+    column_type = NumpyArrayType()
+    data = column_type.process_bind_param(array, None)
+    assert len(data) < array.nbytes
+    assert_array_equal(column_type.process_result_value(data, None), array)
+
+
+def test_numpy_array_type_store(array_storage, tmpdir):
+    store_path = str(tmpdir)
+    array_storage(store_path=store_path, threshold=100)
+    large_array = np.random.RandomState(0).rand(100)
+    small_array = np.arange(3)
+
+    column_type = NumpyArrayType(external=True)
+    data = column_type.process_bind_param(large_array, None)
+    assert data.startswith(b'RAMPREF')
+    loaded = column_type.process_result_value(data, None)
+    assert isinstance(loaded, np.memmap)
+    assert_array_equal(loaded, large_array)
+    # modifying the array in-place does not modify the store
+    loaded[0] = -1
+    assert_array_equal(column_type.process_result_value(data, None),
+                       large_array)
+
+    # the same content is stored once
+    assert column_type.process_bind_param(large_array.copy(), None) == data
+    n_files = sum(len(files) for _, _, files in os.walk(store_path))
+    assert n_files == 1
+
+    # small arrays and non-external columns are kept in the database
+    data = column_type.process_bind_param(small_array, None)
+    assert data.startswith(b'RAMPNPY')
+    data = NumpyArrayType().process_bind_param(large_array, None)
+    assert data.startswith(b'RAMPNPY')
+
+    # the store is required to read a reference
+    data = column_type.process_bind_param(large_array, None)
+    array_storage()
+    with pytest.raises(ValueError, match='no store is configured'):
+        column_type.process_result_value(data, None)
+
+
+def test_array_store(tmpdir):
+    store = ArrayStore(str(tmpdir))
+    digest = store.put(b'not an array')
+    assert os.path.isfile(os.path.join(str(tmpdir), digest[:2],
+                                       digest + '.npy'))
@@ -1,5 +1,7 @@
+import os
 import shutil
 
+import numpy as np
 import pytest
 
 from ramp_utils import read_config
@@ -12,6 +14,8 @@ from rampwf.workflows import Estimator
 from ramp_database.model import Event
 from ramp_database.model import Model
 from ramp_database.model import ProblemKeyword
+from ramp_database.model import problem as problem_module
+from ramp_database.model.problem import ProblemCache
 
 from ramp_database.utils import setup_db
 from ramp_database.utils import session_scope
@@ -78,3 +82,113 @@ def test_problem_model_backref(session_scope_module, backref, expected_type):
     # only check if the list is not empty
     if backref_attr:
         assert isinstance(backref_attr[0], expected_type)
+
+
+PROBLEM_SOURCE = """
+import os
+import numpy as np
+
+problem_title = '{title}'
+
+
+class Predictions:
+    def __init__(self, y_true):
+        self.y_true = y_true
+
+
+def get_train_data(path='.'):
+    y = np.loadtxt(os.path.join(path, 'train.csv'))
+    return None, y
+
+
+def get_test_data(path='.'):
+    y = np.loadtxt(os.path.join(path, 'test.csv'))
+    return None, y
+"""
+
+
+@pytest.fixture
+def kit_data_dir(tmpdir):
+    kit_dir = os.path.join(str(tmpdir), 'kit')
+    data_dir = os.path.join(str(tmpdir), 'data')
+    os.makedirs(kit_dir)
+    os.makedirs(data_dir)
+    with open(os.path.join(kit_dir, 'problem.py'), 'w') as f:
+        f.write(PROBLEM_SOURCE.format(title='first'))
+    np.savetxt(os.path.join(data_dir, 'train.csv'), np.arange(100.))
+    np.savetxt(os.path.join(data_dir, 'test.csv'), np.arange(10.))
+    return kit_dir, data_dir
+
+
+def _touch_later(path):
+    # make sure that the modification time changes
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_problem_cache_module(kit_data_dir):
+    kit_dir, _ = kit_data_dir
+    cache = ProblemCache()
+    module = cache.get_module(kit_dir)
+    assert module.problem_title == 'first'
+    assert cache.get_module(kit_dir) is module
+
+    # modifying problem.py invalidates the module
+    problem_path = os.path.join(kit_dir, 'problem.py')
+    with open(problem_path, 'w') as f:
+        f.write(PROBLEM_SOURCE.format(title='second'))
+    _touch_later(problem_path)
+    assert cache.get_module(kit_dir).problem_title == 'second'
+
+    module = cache.get_module(kit_dir)
+    cache.clear(kit_dir)
+    assert cache.get_module(kit_dir) is not module
+
+
+def test_problem_cache_ground_truth(kit_data_dir):
+    kit_dir, data_dir = kit_data_dir
+    cache = ProblemCache(fingerprint_ttl=0)
+    y_train = cache.get_ground_truth(kit_dir, data_dir, 'train')
+    assert y_train.shape == (100,)
+    assert cache.get_ground_truth(kit_dir, data_dir, 'train') is y_train
+    y_test = cache.get_ground_truth(kit_dir, data_dir, 'test')
+    assert y_test.shape == (10,)
+    # the cached ground truths are shared and thus read-only
+    with pytest.raises(ValueError, match='read-only'):
+        y_train[0] = -1
+
+    # modifying the data invalidates the ground truth
+    train_path = os.path.join(data_dir, 'train.csv')
+    np.savetxt(train_path, np.arange(50.))
+    _touch_later(train_path)
+    assert cache.get_ground_truth(kit_dir, data_dir, 'train').shape == (50,)
+
+
+def test_problem_cache_fingerprint_ttl(kit_data_dir, monkeypatch):
+    kit_dir, data_dir = kit_data_dir
+    cache = ProblemCache(fingerprint_ttl=3600)
+    y_train = cache.get_ground_truth(kit_dir, data_dir, 'train')
+    # the data directory is not walked again before the end of the ttl
+    monkeypatch.setattr(problem_module, '_data_fingerprint', None)
+    assert cache.get_ground_truth(kit_dir, data_dir, 'train') is y_train
+    monkeypatch.undo()
+
+    train_path = os.path.join(data_dir, 'train.csv')
+    np.savetxt(train_path, np.arange(50.))
+    _touch_later(train_path)
+    assert cache.get_ground_truth(kit_dir, data_dir, 'train') is y_train
+    cache.fingerprint_ttl = 0
+    assert cache.get_ground_truth(kit_dir, data_dir, 'train').shape == (50,)
+
+
+def test_problem_cache_memory_budget(kit_data_dir):
+    kit_dir, data_dir = kit_data_dir
+    # only the training labels fit in the cache
+    cache = ProblemCache(max_bytes=1000)
+    y_train = cache.get_ground_truth(kit_dir, data_dir, 'train')
+    assert cache.get_ground_truth(kit_dir, data_dir, 'train') is y_train
+    cache.max_bytes = 900
+    y_test = cache.get_ground_truth(kit_dir, data_dir, 'test')
+    assert cache.get_ground_truth(kit_dir, data_dir, 'test') is y_test
+    # the training labels have been evicted
+    assert cache.get_ground_truth(kit_dir, data_dir, 'train') is not y_train
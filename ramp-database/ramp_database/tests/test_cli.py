@@ -4,6 +4,8 @@ import shutil
 import pytest
 import yaml
 
+from pandas.testing import assert_frame_equal
+
 from click.testing import CliRunner
 
 from ramp_utils import read_config
@@ -12,13 +14,21 @@ from ramp_utils.testing import database_config_template
 from ramp_utils.testing import ramp_config_template
 
 from ramp_database.utils import setup_db
+from ramp_database.utils import session_scope
 from ramp_database.model import Model
 from ramp_database.testing import create_toy_db
+from ramp_database.tools.submission import get_scores
+from ramp_database.tools.submission import get_submission_by_id
+from ramp_database.tools.submission import get_submissions
+from ramp_database.tools.submission import ingest_training_output
+from ramp_database.tools.submission import set_submission_state
 
 from ramp_database.cli import main
 
 from ramp_utils.cli import main as main_utils
 
+HERE = os.path.dirname(__file__)
+
 
 @pytest.fixture(scope="module")
 def make_toy_db(database_connection):
@@ -33,6 +43,15 @@ def make_toy_db(database_connection):
         Model.metadata.drop_all(db)
 
 
+def test_init_db(make_toy_db):
+    runner = CliRunner()
+    # the tables already created are left untouched
+    result = runner.invoke(main, ['init-db',
+                                  '--config', database_config_template()],
+                           catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+
+
 def test_add_user(make_toy_db):
     runner = CliRunner()
     result = runner.invoke(main, ['add-user',
@@ -376,3 +395,65 @@ def test_update_all_user_leaderboards(make_toy_db):
                                   '--event', 'iris_test'],
                            catch_exceptions=False)
     assert result.exit_code == 0, result.output
+
+
+@pytest.mark.filterwarnings('ignore:F-score is ill-defined and being set')
+def test_rescore_event(make_toy_db):
+    database_config = read_config(database_config_template())
+    ramp_config = generate_ramp_config(read_config(ramp_config_template()))
+    submission_id = 9
+    with session_scope(database_config['sqlalchemy']) as session:
+        # only the submission trained below is kept as scored
+        for other_id, _, _ in get_submissions(session, 'iris_test',
+                                              state='scored'):
+            set_submission_state(session, other_id, 'new')
+        # the dispatcher stores the training output in the predictions
+        # directory and not the predictions in the database
+        submission = get_submission_by_id(session, submission_id)
+        path_predictions = os.path.join(ramp_config['ramp_predictions_dir'],
+                                        submission.basename)
+        shutil.rmtree(path_predictions, ignore_errors=True)
+        shutil.copytree(os.path.join(HERE, '..', 'tools', 'tests', 'data',
+                                     'iris_predictions'), path_predictions)
+        ingest_training_output(session, submission_id, path_predictions)
+        expected_scores = get_scores(session, submission_id)
+        # alter the scores to check that they are computed again
+        for score in submission.scores:
+            score.valid_score_cv_bag = score.test_score_cv_bag = 0
+            score.valid_score_cv_bags = score.test_score_cv_bags = None
+            for fold_score in score.on_cv_folds:
+                fold_score.test_score = 0
+        session.commit()
+
+    runner = CliRunner()
+    result = runner.invoke(main, ['rescore-event',
+                                  '--config', database_config_template(),
+                                  '--config-event', ramp_config_template(),
+                                  '--n-jobs', 2],
+                           catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+
+    with session_scope(database_config['sqlalchemy']) as session:
+        assert_frame_equal(get_scores(session, submission_id),
+                           expected_scores)
+        submission = get_submission_by_id(session, submission_id)
+        for score in submission.scores:
+            fold_scores = [fold_score.valid_score
+                           for fold_score in score.on_cv_folds]
+            assert len(score.valid_score_cv_bags) == len(fold_scores)
+            assert len(score.test_score_cv_bags) == len(fold_scores)
+            assert score.valid_score_cv_bag == score.valid_score_cv_bags[-1]
+            assert score.test_score_cv_bag == score.test_score_cv_bags[-1]
+            if score.event_score_type.name == 'acc':
+                # the first bag is made of the first fold only
+                assert score.valid_score_cv_bags[0] == pytest.approx(
+                    fold_scores[0])
+
+    # the predictions are not in the database to re-score without the
+    # training output
+    shutil.rmtree(path_predictions)
+    result = runner.invoke(main, ['rescore-event',
+                                  '--config', database_config_template(),
+                                  '--config-event', ramp_config_template()])
+    assert result.exit_code == 1
+    assert 'The predictions of the submission' in result.output
@@ -1,5 +1,7 @@
 import shutil
 
+import numpy as np
+from numpy.testing import assert_array_equal
 import pytest
 
 from ramp_utils import read_config
@@ -9,10 +11,16 @@ from ramp_utils.testing import ramp_config_template
 from ramp_database.testing import create_test_db
 
 from ramp_database.model import Model
+from ramp_database.model import NumpyArrayType
 from ramp_database.model import SubmissionFileType
+from ramp_database.model import configure_array_storage
 
 from ramp_database.utils import check_password
+from ramp_database.utils import dispose_engines
+from ramp_database.utils import get_engine
 from ramp_database.utils import hash_password
+from ramp_database.utils import init_db
+from ramp_database.utils import setup_array_storage
 from ramp_database.utils import setup_db
 from ramp_database.utils import session_scope
 
@@ -50,6 +58,81 @@ def test_session_scope(database):
         assert len(file_type) > 0
 
 
+def test_init_db_notify_trigger(database):
+    database_config = read_config(
+        database_config_template(), filter_section='sqlalchemy'
+    )
+    db = get_engine(database_config)
+    with db.begin() as conn:
+        conn.execute('DROP TRIGGER ramp_submission_state_notify '
+                     'ON submissions;')
+    # the trigger is installed on the existing tables and can be installed
+    # several times
+    init_db(database_config)
+    init_db(database_config)
+    with db.connect() as conn:
+        triggers = conn.execute(
+            "SELECT tgname FROM pg_trigger "
+            "WHERE tgname = 'ramp_submission_state_notify';"
+        ).fetchall()
+    assert len(triggers) == 1
+
+
+def test_get_engine():
+    database_config = read_config(
+        database_config_template(), filter_section='sqlalchemy'
+    )
+    db = get_engine(database_config)
+    # the engine is shared by the identical configurations
+    assert get_engine(dict(database_config)) is db
+
+    pool_config = dict(database_config, pool_size=3, pool_recycle=60,
+                       pool_pre_ping=True)
+    db_pool = get_engine(pool_config)
+    assert db_pool is not db
+    assert db_pool.pool.size() == 3
+    assert db_pool.pool._recycle == 60
+    assert db_pool.pool._pre_ping
+
+    dispose_engines()
+    assert get_engine(database_config) is not db
+
+
+def test_get_engine_array_storage(tmpdir):
+    database_config = read_config(
+        database_config_template(), filter_section='sqlalchemy'
+    )
+    array_config = dict(database_config, array_store_path=str(tmpdir),
+                        array_store_threshold=10)
+    try:
+        db = get_engine(array_config)
+        # the storage options are not part of the URL
+        assert 'array' not in str(db.url)
+        column_type = NumpyArrayType(external=True)
+        data = column_type.process_bind_param(np.arange(10), None)
+        assert data.startswith(b'RAMPREF')
+        assert_array_equal(column_type.process_result_value(data, None),
+                           np.arange(10))
+    finally:
+        configure_array_storage()
+        dispose_engines()
+
+
+def test_setup_array_storage(tmpdir):
+    try:
+        # nothing is changed without storage options
+        setup_array_storage({'array_store_path': str(tmpdir)})
+        setup_array_storage({'drivername': 'postgresql'})
+        data = NumpyArrayType(external=True).process_bind_param(
+            np.zeros(1 << 18), None
+        )
+        assert data.startswith(b'RAMPREF')
+        with pytest.raises(ValueError, match="Unknown codec 'xxx'"):
+            setup_array_storage({'array_codec': 'xxx'})
+    finally:
+        configure_array_storage()
+
+
 def test_check_password():
     password = "hjst3789ep;ocikaqjw"
     hashed_password = hash_password(password)
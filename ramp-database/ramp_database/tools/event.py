@@ -20,6 +20,7 @@ from ._query import select_workflow_element_by_workflow_and_type
 from ._query import select_workflow_element_type_by_name
 
 from ..model import CVFold
+from ..model.problem import clear_problem_cache
 from ..model import Event
 from ..model import EventAdmin
 from ..model import EventScoreType
@@ -187,7 +188,9 @@ def add_problem(session, problem_name, kit_dir, data_dir, force=False):
                              'delete all linked events. Use"force=True" '
                              'if you want to overwrite the problem and '
                              'delete the events.')
+        clear_problem_cache(problem.path_ramp_kit)
         delete_problem(session, problem_name)
+    clear_problem_cache(kit_dir)
 
     # load the module to get the type of workflow used for the problem
     problem_module = import_module_from_source(
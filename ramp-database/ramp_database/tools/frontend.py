@@ -1,4 +1,12 @@
+import datetime
+
+from sqlalchemy import func
+
+from ramp_database.model import Event
+from ramp_database.model import EventTeam
+from ramp_database.model import Problem
 from ramp_database.model import Submission
+from ramp_database.model import Team
 
 from ._query import select_event_admin_by_instance
 from ._query import select_event_by_name
@@ -175,3 +183,83 @@ def is_user_sign_up_requested(session, event_name, user_name):
             (event_team.is_active and not event_team.approved)):
         return True
     return False
+
+
+def get_problems_overview(session, user_name=None):
+    """Get the problems with the state of their events for a user.
+
+    All the information is retrieved with a single query, whatever the number
+    of problems and events.
+
+    Parameters
+    ----------
+    session : :class:`sqlalchemy.orm.Session`
+        The session to directly perform the operation on the database.
+    user_name : str or None, default is None
+        The user name. If None, the user is considered as not signed up to
+        any event.
+
+    Returns
+    -------
+    problems : list of tuple
+        For each problem, a tuple with the
+        :class:`ramp_database.model.Problem` and a list of dictionaries
+        describing its events with the keys: ``'name'``, ``'title'``,
+        ``'is_public'``, ``'n_submissions'``, ``'n_participants'``,
+        ``'state'`` (``'close'``, ``'competitive'`` or ``'collab'``) and
+        ``'state_user'`` (``'not_signed'``, ``'waiting'`` or
+        ``'signed'``).
+    """
+    n_participants = (session.query(EventTeam.event_id,
+                                    func.count(EventTeam.id)
+                                        .label('n_participants'))
+                             .group_by(EventTeam.event_id)
+                             .subquery())
+    user_event_teams = (session.query(EventTeam.event_id,
+                                      EventTeam.approved)
+                               .join(Team, Team.id == EventTeam.team_id)
+                               .filter(Team.name == user_name)
+                               .subquery())
+    rows = (session.query(Problem, Event.name, Event.title, Event.is_public,
+                          Event.n_submissions, Event.opening_timestamp,
+                          Event.public_opening_timestamp,
+                          Event.closing_timestamp,
+                          n_participants.c.n_participants,
+                          user_event_teams.c.event_id,
+                          user_event_teams.c.approved)
+                   .outerjoin(Event, Event.problem_id == Problem.id)
+                   .outerjoin(n_participants,
+                              n_participants.c.event_id == Event.id)
+                   .outerjoin(user_event_teams,
+                              user_event_teams.c.event_id == Event.id)
+                   .order_by(Problem.id, Event.id)
+                   .all())
+
+    now = datetime.datetime.utcnow()
+    problems = []
+    for (problem, name, title, is_public, n_submissions, start, start_collab,
+         end, n_event_participants, user_event_id, approved) in rows:
+        if not problems or problems[-1][0] is not problem:
+            problems.append((problem, []))
+        if name is None:
+            # problem without event
+            continue
+        if now < start or now >= end:
+            state = 'close'
+        elif now < start_collab:
+            state = 'competitive'
+        else:
+            state = 'collab'
+        if user_event_id is None:
+            state_user = 'not_signed'
+        elif approved:
+            state_user = 'signed'
+        else:
+            state_user = 'waiting'
+        problems[-1][1].append({
+            'name': name, 'title': title, 'is_public': is_public,
+            'n_submissions': n_submissions,
+            'n_participants': n_event_participants or 0,
+            'state': state, 'state_user': state_user
+        })
+    return problems
@@ -4,22 +4,160 @@ from itertools import product
 import numpy as np
 import pandas as pd
 
+from sqlalchemy import and_
+from sqlalchemy import exists
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm import joinedload
+
+from ..model.base import BaseQuery
 from ..model.event import Event
 from ..model.event import EventTeam
 from ..model.submission import Submission
+from ..model.submission import SubmissionLeaderboardValue
 from ..model.team import Team
 
 from .team import get_event_team_by_name
 
-from .submission import get_bagged_scores
-from .submission import get_scores
-from .submission import get_submission_max_ram
-from .submission import get_time
+from .submission import get_scores_bulk
 
 width = -1 if LooseVersion(pd.__version__) < LooseVersion("1.0.0") else None
 pd.set_option('display.max_colwidth', width)
 
 
+def _compute_leaderboard_values(session, submissions, map_score_precision):
+    """Compute the leaderboard values of submissions.
+
+    Parameters
+    ----------
+    session : :class:`sqlalchemy.orm.Session`
+        The session to directly perform the operation on the database.
+    submissions : list of :class:`ramp_database.model.Submission`
+        The submission to report in the leaderboard.
+    map_score_precision : dict
+        The precision to use to round each score.
+
+    Returns
+    -------
+    values : dataframe
+        The value of each leaderboard column depending on the scores, the
+        computation time and the RAM used by the submissions. The dataframe
+        is indexed by the submission IDs.
+    """
+    submission_ids = [sub.id for sub in submissions]
+    df = get_scores_bulk(session, submission_ids)
+    # round the scores to the precision of each score type
+    for score_name, decimals in map_score_precision.items():
+        mask = (df['kind'] != 'time') & (df['score'] == score_name)
+        df.loc[mask, 'value'] = df.loc[mask, 'value'].round(decimals)
+    # select only the validation and testing steps and rename them to
+    # public and private
+    map_renaming = {'valid': 'public', 'test': 'private'}
+
+    def _pivot(df_stat, stat, values='value'):
+        df_stat = df_stat[df_stat['step'].isin(map_renaming)]
+        column = (stat + ' ' + df_stat['step'].map(map_renaming) + ' ' +
+                  df_stat['score'])
+        return (df_stat.assign(column=column)
+                       .pivot(index='submission_id', columns='column',
+                              values=values))
+
+    # take only max n bag
+    df_bag = df[df['kind'] == 'bagged_score']
+    highest_level = df_bag.groupby('submission_id')['fold'].transform('max')
+    df_bag = df_bag[df_bag['fold'] == highest_level]
+
+    df_scores = (df[df['kind'] == 'score']
+                 .groupby(['submission_id', 'step', 'score'])['value']
+                 .agg(['mean', 'std'])
+                 .reset_index())
+
+    df_time = (df[df['kind'] == 'time']
+               .groupby(['submission_id', 'step'])['value'].sum()
+               .unstack('step')
+               .rename(columns={'train': 'train time [s]',
+                                'valid': 'validation time [s]',
+                                'test': 'test time [s]'}))
+
+    values = pd.concat([_pivot(df_bag, 'bag'),
+                        _pivot(df_scores, 'mean', values='mean'),
+                        _pivot(df_scores, 'std', values='std'),
+                        df_time], axis=1)
+    values = values.reindex(submission_ids)
+    values['max RAM [MB]'] = [sub.max_ram for sub in submissions]
+    values.columns.name = None
+    return values.astype(float)
+
+
+def _get_leaderboard_values(session, submissions, map_score_precision):
+    """Get the leaderboard values of submissions from the materialised store.
+
+    Only the submissions without values or for which the state changed since
+    the values were computed are queried and their values are upserted in
+    the store. The session is not committed.
+
+    Parameters
+    ----------
+    session : :class:`sqlalchemy.orm.Session`
+        The session to directly perform the operation on the database.
+    submissions : list of :class:`ramp_database.model.Submission`
+        The submission to report in the leaderboard.
+    map_score_precision : dict
+        The precision to use to round each score.
+
+    Returns
+    -------
+    values : dataframe
+        The leaderboard values indexed by the submission IDs, in the same
+        order than ``submissions``.
+    """
+    submission_ids = [sub.id for sub in submissions]
+    rows = []
+    if submission_ids:
+        rows = (session.query(SubmissionLeaderboardValue.submission_id,
+                              SubmissionLeaderboardValue.name,
+                              SubmissionLeaderboardValue.value,
+                              SubmissionLeaderboardValue.state)
+                       .filter(SubmissionLeaderboardValue.submission_id.in_(
+                           submission_ids))
+                       .all())
+    df_stored = pd.DataFrame(
+        rows, columns=['submission_id', 'name', 'value', 'state']
+    )
+    # NaN (e.g. std of a single fold) can be stored as NULL
+    df_stored['value'] = df_stored['value'].astype(float)
+    stored_state = (df_stored.drop_duplicates('submission_id')
+                             .set_index('submission_id')['state'])
+
+    outdated = [sub for sub in submissions
+                if stored_state.get(sub.id) != sub.state]
+    df_stored = df_stored[~df_stored['submission_id'].isin(
+        [sub.id for sub in outdated])]
+    values = [df_stored.pivot(index='submission_id', columns='name',
+                              values='value')]
+    if outdated:
+        df_outdated = _compute_leaderboard_values(
+            session, outdated, map_score_precision
+        )
+        (session.query(SubmissionLeaderboardValue)
+                .filter(SubmissionLeaderboardValue.submission_id.in_(
+                    [sub.id for sub in outdated]))
+                .delete(synchronize_session=False))
+        map_state = {sub.id: sub.state for sub in outdated}
+        session.add_all([
+            SubmissionLeaderboardValue(
+                submission_id=submission_id, name=name, value=value,
+                state=map_state[submission_id]
+            )
+            for submission_id, row in df_outdated.iterrows()
+            for name, value in row.items()
+        ])
+        values.append(df_outdated)
+    values = pd.concat(values, axis=0, sort=False).reindex(submission_ids)
+    values.columns.name = None
+    return values
+
+
 def _compute_leaderboard(session, submissions, leaderboard_type, event_name,
                          with_links=True):
     """Format the leaderboard.
@@ -42,72 +180,25 @@ def _compute_leaderboard(session, submissions, leaderboard_type, event_name,
     leaderboard : dataframe
         The leaderboard in a dataframe format.
     """
-    record_score = []
     event = session.query(Event).filter_by(name=event_name).one()
     map_score_precision = {score_type.name: score_type.precision
                            for score_type in event.score_types}
-    for sub in submissions:
-        # take only max n bag
-        df_scores_bag = get_bagged_scores(session, sub.id)
-        highest_level = df_scores_bag.index.get_level_values('n_bag').max()
-        df_scores_bag = df_scores_bag.loc[(slice(None), highest_level), :]
-        df_scores_bag.index = df_scores_bag.index.droplevel('n_bag')
-        df_scores_bag = df_scores_bag.round(map_score_precision)
-
-        df_scores = get_scores(session, sub.id)
-        df_scores = df_scores.round(map_score_precision)
-
-        df_time = get_time(session, sub.id)
-        df_time = df_time.stack().to_frame()
-        df_time.index = df_time.index.set_names(['fold', 'step'])
-        df_time = df_time.rename(columns={0: 'time'})
-        df_time = df_time.sum(axis=0, level="step").T
-
-        df_scores_mean = df_scores.groupby('step').mean()
-        df_scores_std = df_scores.groupby('step').std()
-
-        # select only the validation and testing steps and rename them to
-        # public and private
-        map_renaming = {'valid': 'public', 'test': 'private'}
-        df_scores_mean = (df_scores_mean.loc[list(map_renaming.keys())]
-                                        .rename(index=map_renaming)
-                                        .stack().to_frame().T)
-        df_scores_std = (df_scores_std.loc[list(map_renaming.keys())]
-                                      .rename(index=map_renaming)
-                                      .stack().to_frame().T)
-        df_scores_bag = (df_scores_bag.rename(index=map_renaming)
-                                      .stack().to_frame().T)
-
-        df = pd.concat([df_scores_bag, df_scores_mean, df_scores_std], axis=1,
-                       keys=['bag', 'mean', 'std'])
-
-        df.columns = df.columns.set_names(['stat', 'set', 'score'])
-
-        # change the multi-index into a stacked index
-        df.columns = df.columns.map(lambda x: " ".join(x))
-
-        # add the aggregated time information
-        df_time.index = df.index
-        df_time = df_time.rename(
-            columns={'train': 'train time [s]',
-                     'valid': 'validation time [s]',
-                     'test': 'test time [s]'}
-        )
-        df = pd.concat([df, df_time], axis=1)
-
-        if leaderboard_type == 'private':
-            df['submission ID'] = sub.basename.replace('submission_', '')
-        df['team'] = sub.team.name
-        df['submission'] = sub.name_with_link if with_links else sub.name
-        df['contributivity'] = int(round(100 * sub.contributivity))
-        df['historical contributivity'] = int(round(
-            100 * sub.historical_contributivity))
-        df['max RAM [MB]'] = get_submission_max_ram(session, sub.id)
-        df['submitted at (UTC)'] = pd.Timestamp(sub.submission_timestamp)
-        record_score.append(df)
-
-    # stack all the records
-    df = pd.concat(record_score, axis=0, ignore_index=True, sort=False)
+    df = _get_leaderboard_values(session, submissions, map_score_precision)
+    df = df.reset_index(drop=True)
+    if leaderboard_type == 'private':
+        df['submission ID'] = [sub.basename.replace('submission_', '')
+                               for sub in submissions]
+    df['team'] = [sub.team.name for sub in submissions]
+    df['submission'] = [sub.name_with_link if with_links else sub.name
+                        for sub in submissions]
+    df['contributivity'] = [int(round(100 * sub.contributivity))
+                            for sub in submissions]
+    df['historical contributivity'] = [
+        int(round(100 * sub.historical_contributivity))
+        for sub in submissions
+    ]
+    df['submitted at (UTC)'] = [pd.Timestamp(sub.submission_timestamp)
+                                for sub in submissions]
 
     # keep only second precision for the time stamp
     df['submitted at (UTC)'] = df['submitted at (UTC)'].astype('datetime64[s]')
@@ -201,39 +292,14 @@ def _compute_competition_leaderboard(session, submissions, leaderboard_type,
                  'bag public ' + score_name: 'public ' + score_name}
     )
 
-    # select best submission for each team
-    best_df = (leaderboard_df.groupby('team').min()
-               if score_type.is_lower_the_better
-               else leaderboard_df.groupby('team').max())
-    best_df = best_df[['public ' + score_name]].reset_index()
-    best_df['best'] = True
-
-    # merge to get a best indicator column then select best
-    leaderboard_df = pd.merge(
-        leaderboard_df, best_df, how='left',
-        left_on=['team', 'public ' + score_name],
-        right_on=['team', 'public ' + score_name]
-    )
-    leaderboard_df = leaderboard_df.fillna(False)
-    leaderboard_df = leaderboard_df[leaderboard_df['best']]
-    leaderboard_df = leaderboard_df.drop(columns='best')
-
-    # dealing with ties: we need the lowest timestamp
-    best_df = leaderboard_df.groupby('team').min()
-    best_df = best_df[['submitted at (UTC)']].reset_index()
-    best_df['best'] = True
-    leaderboard_df = pd.merge(
-        leaderboard_df, best_df, how='left',
-        left_on=['team', 'submitted at (UTC)'],
-        right_on=['team', 'submitted at (UTC)'])
-    leaderboard_df = leaderboard_df.fillna(False)
-    leaderboard_df = leaderboard_df[leaderboard_df['best']]
-    leaderboard_df = leaderboard_df.drop(columns='best')
-
-    # sort by public score then by submission timestamp, compute rank
+    # select best submission for each team, dealing with ties by taking the
+    # lowest timestamp. Sorting by public score then by submission timestamp
+    # gives directly the public rank.
     leaderboard_df = leaderboard_df.sort_values(
         by=['public ' + score_name, 'submitted at (UTC)'],
         ascending=[score_type.is_lower_the_better, True])
+    leaderboard_df = leaderboard_df.drop_duplicates(subset='team',
+                                                    keep='first')
     leaderboard_df['public rank'] = np.arange(len(leaderboard_df)) + 1
 
     # sort by private score then by submission timestamp, compute rank
@@ -242,10 +308,8 @@ def _compute_competition_leaderboard(session, submissions, leaderboard_type,
         ascending=[score_type.is_lower_the_better, True])
     leaderboard_df['private rank'] = np.arange(len(leaderboard_df)) + 1
 
-    leaderboard_df['move'] = \
-        leaderboard_df['public rank'] - leaderboard_df['private rank']
-    leaderboard_df['move'] = [
-        '{:+d}'.format(m) if m != 0 else '-' for m in leaderboard_df['move']]
+    move = leaderboard_df['public rank'] - leaderboard_df['private rank']
+    leaderboard_df['move'] = move.map('{:+d}'.format).where(move != 0, '-')
 
     col_selected = (
         [leaderboard_type + ' rank', 'team', 'submission',
@@ -293,7 +357,9 @@ def get_leaderboard(session, leaderboard_type, event_name, user_name=None,
                 .filter(Event.id == EventTeam.event_id)
                 .filter(Team.id == EventTeam.team_id)
                 .filter(EventTeam.id == Submission.event_team_id)
-                .filter(Event.name == event_name))
+                .filter(Event.name == event_name)
+                .options(joinedload(Submission.event_team)
+                         .joinedload(EventTeam.team)))
     if user_name is not None:
         q = q.filter(Team.name == user_name)
     submissions = q.all()
@@ -354,6 +420,152 @@ def get_leaderboard(session, leaderboard_type, event_name, user_name=None,
     return df_html
 
 
+def get_leaderboard_page(session, event_name, page=1, per_page=20, sort=None,
+                         team_name=None, with_links=True):
+    """Get a page of the public leaderboard.
+
+    The submissions are sorted and paginated in the database using the
+    leaderboard values stored for each submission, such that only the
+    submissions of the requested page are loaded. The values missing or
+    outdated in the store are computed within a savepoint which is rolled
+    back: nothing is written to the database.
+
+    Parameters
+    ----------
+    session : :class:`sqlalchemy.orm.Session`
+        The session to directly perform the operation on the database.
+    event_name : str
+        The event name.
+    page : int, default=1
+        The page to get, starting at 1.
+    per_page : int, default=20
+        The number of submissions per page.
+    sort : str or None, default=None
+        The column used to sort the leaderboard: ``'team'``,
+        ``'submission'``, ``'submitted at (UTC)'``, the name of a score type,
+        ``'train time [s]'``, ``'validation time [s]'`` or
+        ``'max RAM [MB]'``. The order is ascending unless the column is
+        prefixed with ``'-'``. If None, the submissions are sorted from the
+        best to the worst official score.
+    team_name : str or None, default=None
+        The name of the team. If None, the submissions of all teams are
+        reported.
+    with_links : bool, default=True
+        Whether or not to report the link to each submission.
+
+    Returns
+    -------
+    leaderboard : dict
+        The dictionary contains the ``'columns'`` of the leaderboard, the
+        ``'submissions'`` of the page as a list of dictionaries mapping the
+        columns to their value, the ``'page'``, the number of submissions
+        ``'per_page'``, the ``'total'`` number of submissions and the
+        number of ``'pages'``.
+    """
+    if page < 1:
+        raise ValueError('The page should be greater or equal to 1. Got {} '
+                         'instead.'.format(page))
+    if per_page < 1:
+        raise ValueError('The number of submissions per page should be '
+                         'greater or equal to 1. Got {} instead.'
+                         .format(per_page))
+    event = session.query(Event).filter_by(name=event_name).one()
+    official_score_type = event.get_official_score_type(session)
+    score_names = [event.official_score_name] + [
+        score_type.name for score_type in event.score_types
+        if score_type.name != event.official_score_name
+    ]
+    time_columns = ['train time [s]', 'validation time [s]', 'max RAM [MB]']
+    columns = (['team', 'submission'] + score_names + time_columns +
+               ['submitted at (UTC)'])
+
+    if sort is None:
+        sort_column = event.official_score_name
+        descending = not official_score_type.is_lower_the_better
+    else:
+        descending = sort.startswith('-')
+        sort_column = sort[1:] if descending else sort
+    if sort_column not in columns:
+        raise ValueError('The leaderboard can be sorted by {}. Got "{}" '
+                         'instead.'.format(columns, sort))
+
+    q = (BaseQuery(Submission, session=session)
+         .join(EventTeam, EventTeam.id == Submission.event_team_id)
+         .join(Team, Team.id == EventTeam.team_id)
+         .join(Event, Event.id == EventTeam.event_id)
+         .filter(Event.name == event_name)
+         .filter(Submission.name != Event.ramp_sandbox_name)
+         .filter(Submission.is_valid.is_(True))
+         .filter(Submission.state == 'scored')
+         .options(joinedload(Submission.event_team)
+                  .joinedload(EventTeam.team)))
+    if team_name is not None:
+        q = q.filter(Team.name == team_name)
+
+    map_sort_column = {'team': Team.name,
+                       'submission': Submission.name,
+                       'submitted at (UTC)': Submission.submission_timestamp}
+    map_score_precision = {score_type.name: score_type.precision
+                           for score_type in event.score_types}
+    # the values of the submissions scored since the last update of the
+    # leaderboards are used to sort the submissions but are not committed
+    savepoint = session.begin_nested()
+    try:
+        stored_value = aliased(SubmissionLeaderboardValue)
+        outdated = q.filter(~exists().where(and_(
+            stored_value.submission_id == Submission.id,
+            stored_value.state == Submission.state
+        ))).all()
+        if outdated:
+            _get_leaderboard_values(session, outdated, map_score_precision)
+            session.flush()
+
+        if sort_column in map_sort_column:
+            sort_by = map_sort_column[sort_column]
+        else:
+            value_name = (sort_column if sort_column in time_columns
+                          else 'bag public ' + sort_column)
+            sort_value = aliased(SubmissionLeaderboardValue)
+            q = q.outerjoin(sort_value,
+                            and_(sort_value.submission_id == Submission.id,
+                                 sort_value.name == value_name))
+            sort_by = sort_value.value
+            # the submissions without value are reported last
+            q = q.order_by(sort_by.is_(None))
+        q = q.order_by(sort_by.desc() if descending else sort_by.asc(),
+                       Submission.id)
+        pagination = q.paginate(page, per_page, error_out=False)
+
+        submissions = pagination.items
+        values = _get_leaderboard_values(session, submissions,
+                                         map_score_precision)
+    finally:
+        savepoint.rollback()
+    values = values.rename(columns={'bag public ' + score_name: score_name
+                                    for score_name in score_names})
+    values = values.reindex(columns=score_names + time_columns)
+    values = values.astype(object).where(values.notnull(), None)
+
+    leaderboard_submissions = []
+    for sub, (_, row) in zip(submissions, values.iterrows()):
+        leaderboard_submission = {'team': sub.event_team.team.name,
+                                  'submission': sub.name}
+        leaderboard_submission.update(row.to_dict())
+        leaderboard_submission['submitted at (UTC)'] = (
+            sub.submission_timestamp.replace(microsecond=0).isoformat()
+        )
+        if with_links:
+            leaderboard_submission['link'] = sub.link
+        leaderboard_submissions.append(leaderboard_submission)
+
+    return {'columns': columns,
+            'submissions': leaderboard_submissions,
+            'page': pagination.page,
+            'per_page': pagination.per_page,
+            'total': pagination.total,
+            'pages': pagination.pages}
+
+
 def update_leaderboards(session, event_name, new_only=False):
     """Update the leaderboards for a given event.
 
@@ -391,6 +603,10 @@ def update_leaderboards(session, event_name, new_only=False):
     event.new_leaderboard_html = get_leaderboard(
         session, 'new', event_name
     )
+    # incremented by the database such that concurrent updates are counted
+    event.leaderboard_version = (
+        func.coalesce(Event.leaderboard_version, 0) + 1
+    )
     session.commit()
 
 
@@ -419,9 +635,13 @@ def update_user_leaderboards(session, event_name, user_name,
         event_team.failed_leaderboard_html = get_leaderboard(
             session, 'failed', event_name, user_name
         )
+        event_team.leaderboard_outdated = False
     event_team.new_leaderboard_html = get_leaderboard(
         session, 'new', event_name, user_name
     )
+    event_team.leaderboard_version = (
+        func.coalesce(EventTeam.leaderboard_version, 0) + 1
+    )
     session.commit()
 
 
@@ -450,7 +670,42 @@ def update_all_user_leaderboards(session, event_name, new_only=False):
             event_team.failed_leaderboard_html = get_leaderboard(
                 session, 'failed', event_name, user_name
             )
+            event_team.leaderboard_outdated = False
         event_team.new_leaderboard_html = get_leaderboard(
             session, 'new', event_name, user_name
         )
+        event_team.leaderboard_version = (
+            func.coalesce(EventTeam.leaderboard_version, 0) + 1
+        )
+    session.commit()
+
+
+def invalidate_user_leaderboards(session, event_name, user_names=None):
+    """Mark the leaderboards of users as outdated for a given event.
+
+    Contrary to :func:`update_all_user_leaderboards`, the leaderboards are
+    not recomputed: they will be updated with
+    :func:`update_user_leaderboards` the next time they are requested.
+
+    Parameters
+    ----------
+    session : :class:`sqlalchemy.orm.Session`
+        The session to directly perform the operation on the database.
+    event_name : str
+        The event name.
+    user_names : list of str or None, default is None
+        The user names. If None, the leaderboards of all users are
+        invalidated.
+    """
+    event = session.query(Event).filter_by(name=event_name).one()
+    q = session.query(EventTeam).filter(EventTeam.event_id == event.id)
+    if user_names is not None:
+        team_ids = [team_id for team_id, in
+                    session.query(Team.id)
+                           .filter(Team.name.in_(user_names))]
+        q = q.filter(EventTeam.team_id.in_(team_ids))
+    q.update({EventTeam.leaderboard_outdated: True,
+              EventTeam.leaderboard_version:
+              func.coalesce(EventTeam.leaderboard_version, 0) + 1},
+             synchronize_session=False)
     session.commit()
@@ -1,5 +1,7 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import datetime
+import hashlib
 import logging
 import os
 import shutil
@@ -7,8 +9,13 @@ import shutil
 import numpy as np
 import pandas as pd
 
+from sqlalchemy import func
 from sqlalchemy.orm import defer
 
+from rampwf.utils.combine import get_score_cv_bags
+
+from ramp_utils.training_output import load_training_output
+
 from ..exceptions import DuplicateSubmissionError
 from ..exceptions import MissingExtensionError
 from ..exceptions import MissingSubmissionFileError
@@ -16,11 +23,18 @@ from ..exceptions import TooEarlySubmissionError
 from ..exceptions import UnknownStateError
 
 from ..model.submission import submission_states
+from ..model import Event
+from ..model import EventScoreType
+from ..model import EventTeam
 from ..model import Submission
 from ..model import SubmissionFile
 from ..model import SubmissionFileTypeExtension
+from ..model import SubmissionLeaderboardValue
 from ..model import SubmissionOnCVFold
+from ..model import SubmissionScore
+from ..model import SubmissionScoreOnCVFold
 from ..model import SubmissionSimilarity
+from ..model import Team
 from ..model import UserInteraction
 
 from ._query import select_event_by_name
@@ -35,6 +49,62 @@ from ._query import select_team_by_name
 STATES = submission_states.enums
 logger = logging.getLogger('RAMP-DATABASE')
 
+# directory, in the submissions directory of an event, storing each submitted
+# file once by content
+SUBMISSION_STORE_DIRNAME = '.store'
+
+
+def _hash_file(filename, chunk_size=1 << 20):
+    sha256 = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _materialize_file(src, dst, store_dir):
+    """Copy a file by hard linking its copy in the content store.
+
+    The file is added to the store if its content is not already stored. It
+    is copied when the filesystem does not support hard links.
+    """
+    digest = _hash_file(src)
+    stored_file = os.path.join(store_dir, digest[:2], digest)
+    try:
+        if not os.path.isfile(stored_file):
+            os.makedirs(os.path.dirname(stored_file), exist_ok=True)
+            tmp_file = '{}.{}.tmp'.format(stored_file, os.getpid())
+            shutil.copy2(src, tmp_file)
+            os.replace(tmp_file, stored_file)
+        os.link(stored_file, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def copy_submission_file(src, dst):
+    """Copy a file over a submission file.
+
+    The submission file can be a hard link to a file of the content store
+    shared with other submissions. The copy is therefore written to a
+    temporary file which then replaces ``dst``, leaving the shared file
+    untouched.
+
+    Parameters
+    ----------
+    src : str
+        The path of the file to copy.
+    dst : str
+        The path of the submission file.
+    """
+    tmp_file = '{}.{}.tmp'.format(dst, os.getpid())
+    try:
+        shutil.copy2(src, tmp_file)
+        os.replace(tmp_file, dst)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
 
 # Add functions: add information to the database
 # TODO: move the queries in "_query"
@@ -61,6 +131,14 @@ def add_submission(session, event_name, team_name, submission_name,
     -------
     submission : :class:`ramp_database.model.Submission`
         The newly created submission.
+
+    Notes
+    -----
+    The submitted files are stored once by SHA-256 in the ``.store``
+    directory of the event submissions directory. The files of the
+    submission directory are hard links to the stored files such that
+    identical files, e.g. the starting kits submitted for each team, do not
+    use additional disk space.
     """
     event = select_event_by_name(session, event_name)
     team = select_team_by_name(session, team_name)
@@ -187,14 +265,17 @@ def add_submission(session, event_name, team_name, submission_name,
                 return element.is_editable
         return True
 
-    # copy the submission file in the submission folder
+    # copy the submission file in the submission folder: the files are
+    # stored once by content and hard linked in the submission folder
     if os.path.exists(submission.path):
         shutil.rmtree(submission.path)
     os.makedirs(submission.path)
+    store_dir = os.path.join(event.path_ramp_submissions,
+                             SUBMISSION_STORE_DIRNAME)
     for filename in submission.f_names:
         src = os.path.join(submission_path, filename)
         dst = os.path.join(submission.path, filename)
-        shutil.copy2(src=src, dst=dst)
+        _materialize_file(src, dst, store_dir)
 
     # for remembering it in the sandbox view
     event_team.last_submission_name = submission_name
@@ -467,6 +548,117 @@ def get_scores(session, submission_id):
     return scores
 
 
+def get_scores_bulk(session, submission_ids):
+    """Get the scores, bagged scores and computation time of several
+    submissions.
+
+    The information of all submissions is fetched with a constant number of
+    queries, independently of the number of submissions, folds, and scores.
+
+    Parameters
+    ----------
+    session : :class:`sqlalchemy.orm.Session`
+        The session to directly perform the operation on the database.
+    submission_ids : list of int
+        The ids of the submissions.
+
+    Returns
+    -------
+    scores : pd.DataFrame
+        A long-format dataframe with the columns:
+
+        * ``submission_id``: the id of the submission;
+        * ``kind``: ``'score'`` for the score of a fold, ``'bagged_score'``
+          for a bagged score, and ``'time'`` for the computation time of a
+          fold;
+        * ``fold``: the index of the fold or, for the bagged scores, the
+          number of folds bagged minus one;
+        * ``step``: ``'train'``, ``'valid'``, or ``'test'``;
+        * ``score``: the name of the score (None for the computation time);
+        * ``value``: the value of the score or the time.
+    """
+    columns = ['submission_id', 'kind', 'fold', 'step', 'score', 'value']
+    submission_ids = list(submission_ids)
+    if not submission_ids:
+        return pd.DataFrame(columns=columns)
+    steps = ('train', 'valid', 'test')
+
+    # the fold index is given by the order of the fold ids
+    all_cv_folds = (session.query(SubmissionOnCVFold.submission_id,
+                                  SubmissionOnCVFold.id,
+                                  SubmissionOnCVFold.train_time,
+                                  SubmissionOnCVFold.valid_time,
+                                  SubmissionOnCVFold.test_time)
+                           .filter(SubmissionOnCVFold.submission_id.in_(
+                               submission_ids))
+                           .all())
+    df_folds = pd.DataFrame(
+        all_cv_folds,
+        columns=['submission_id', 'cv_fold_id', 'train', 'valid', 'test']
+    )
+    df_folds['fold'] = (df_folds.groupby('submission_id')['cv_fold_id']
+                                .rank(method='first').astype(int) - 1)
+    df_time = df_folds.melt(id_vars=['submission_id', 'fold'],
+                            value_vars=list(steps), var_name='step',
+                            value_name='value')
+    df_time['kind'] = 'time'
+    df_time['score'] = None
+
+    fold_scores = (session.query(SubmissionScoreOnCVFold
+                                 .submission_on_cv_fold_id,
+                                 EventScoreType.name,
+                                 SubmissionScoreOnCVFold.train_score,
+                                 SubmissionScoreOnCVFold.valid_score,
+                                 SubmissionScoreOnCVFold.test_score)
+                          .join(SubmissionScore, SubmissionScore.id ==
+                                SubmissionScoreOnCVFold.submission_score_id)
+                          .join(EventScoreType, EventScoreType.id ==
+                                SubmissionScore.event_score_type_id)
+                          .filter(SubmissionScore.submission_id.in_(
+                              submission_ids))
+                          .all())
+    df_scores = pd.DataFrame(
+        fold_scores,
+        columns=['cv_fold_id', 'score', 'train', 'valid', 'test']
+    )
+    df_scores = df_scores.merge(
+        df_folds[['cv_fold_id', 'submission_id', 'fold']], on='cv_fold_id'
+    )
+    df_scores = df_scores.melt(
+        id_vars=['submission_id', 'fold', 'score'], value_vars=list(steps),
+        var_name='step', value_name='value'
+    )
+    df_scores['kind'] = 'score'
+
+    bagged_scores = (session.query(SubmissionScore.submission_id,
+                                   EventScoreType.name,
+                                   SubmissionScore.valid_score_cv_bags,
+                                   SubmissionScore.test_score_cv_bags)
+                            .join(EventScoreType, EventScoreType.id ==
+                                  SubmissionScore.event_score_type_id)
+                            .filter(SubmissionScore.submission_id.in_(
+                                submission_ids))
+                            .all())
+    # the values written by NumpyType store None as a 0-d array
+    records = [
+        (submission_id, n_bag, step, score_name, value)
+        for submission_id, score_name, valid_bags, test_bags in bagged_scores
+        for step, score_all_bags in (('valid', valid_bags),
+                                     ('test', test_bags))
+        if np.ndim(score_all_bags) > 0
+        for n_bag, value in enumerate(score_all_bags)
+    ]
+    df_bagged = pd.DataFrame(
+        records, columns=['submission_id', 'fold', 'step', 'score', 'value']
+    )
+    df_bagged['kind'] = 'bagged_score'
+
+    df = pd.concat([df_scores, df_bagged, df_time], ignore_index=True,
+                   sort=False)
+    df['value'] = df['value'].astype(float)
+    return df[columns]
+
+
 def get_bagged_scores(session, submission_id):
     """Get the bagged scores for each fold of a submission.
 
@@ -558,6 +750,36 @@ def get_event_nb_folds(session, event_name):
     return len(event.cv_folds)
 
 
+def get_team_train_times(session, event_name):
+    """Get the mean training time of the scored submissions of each team.
+
+    Parameters
+    ----------
+    session : :class:`sqlalchemy.orm.Session`
+        The session to directly perform the operation on the database.
+    event_name : str
+        The event name.
+
+    Returns
+    -------
+    train_times : dict
+        The mean of the ``train_time_cv_mean`` of the scored submissions keyed
+        by team name. The teams without scored submissions are not included.
+    """
+    train_times = (session.query(Team.name,
+                                 func.avg(Submission.train_time_cv_mean))
+                          .join(EventTeam, EventTeam.team_id == Team.id)
+                          .join(Event, Event.id == EventTeam.event_id)
+                          .join(Submission,
+                                Submission.event_team_id == EventTeam.id)
+                          .filter(Event.name == event_name)
+                          .filter(Submission.state == 'scored')
+                          .group_by(Team.name)
+                          .all())
+    return {team_name: float(train_time)
+            for team_name, train_time in train_times}
+
+
 def get_source_submissions(session, submission_id):
     """Get the submissions with which a user interacted.
 
@@ -595,6 +817,14 @@ def get_source_submissions(session, submission_id):
 
 
 # Setter functions: set information in the database
+def _clear_leaderboard_values(session, submission_id):
+    """Remove the materialised leaderboard values of a submission such that
+    they are recomputed with the new scores."""
+    (session.query(SubmissionLeaderboardValue)
+            .filter_by(submission_id=submission_id)
+            .delete(synchronize_session=False))
+
+
 def set_submission_state(session, submission_id, state):
     """Set the set of a submission.
 
@@ -647,13 +877,11 @@ def set_predictions(session, submission_id, path_predictions):
                                     defer("test_y_pred"))
                            .all())
     all_cv_folds = sorted(all_cv_folds, key=lambda x: x.id)
-    for fold_id, cv_fold in enumerate(all_cv_folds):
-        path_results = os.path.join(path_predictions,
-                                    'fold_{}'.format(fold_id))
-        cv_fold.full_train_y_pred = np.load(
-            os.path.join(path_results, 'y_pred_train.npz'))['y_pred']
-        cv_fold.test_y_pred = np.load(
-            os.path.join(path_results, 'y_pred_test.npz'))['y_pred']
+    training_output = load_training_output(path_predictions,
+                                           predictions=True)
+    for cv_fold, fold in zip(all_cv_folds, training_output['folds']):
+        cv_fold.full_train_y_pred = fold['y_pred_train']
+        cv_fold.test_y_pred = fold['y_pred_test']
     session.commit()
 
 
@@ -675,16 +903,11 @@ def set_time(session, submission_id, path_predictions):
                                     defer("test_y_pred"))
                            .all())
     all_cv_folds = sorted(all_cv_folds, key=lambda x: x.id)
-    for fold_id, cv_fold in enumerate(all_cv_folds):
-        path_results = os.path.join(path_predictions,
-                                    'fold_{}'.format(fold_id))
-        results = {}
-        for step in ('train', 'valid', 'test'):
-            results[step + '_time'] = np.loadtxt(
-                os.path.join(path_results, step + '_time')
-            ).item()
-        for key, value in results.items():
-            setattr(cv_fold, key, value)
+    training_output = load_training_output(path_predictions)
+    for cv_fold, fold in zip(all_cv_folds, training_output['folds']):
+        for step, value in fold['time'].items():
+            setattr(cv_fold, step + '_time', value)
+    _clear_leaderboard_values(session, submission_id)
     session.commit()
 
 
@@ -706,16 +929,14 @@ def set_scores(session, submission_id, path_predictions):
                                     defer("test_y_pred"))
                            .all())
     all_cv_folds = sorted(all_cv_folds, key=lambda x: x.id)
-    for fold_id, cv_fold in enumerate(all_cv_folds):
-        path_results = os.path.join(path_predictions,
-                                    'fold_{}'.format(fold_id))
-        scores_update = pd.read_csv(
-            os.path.join(path_results, 'scores.csv'), index_col=0
-        )
+    training_output = load_training_output(path_predictions)
+    for cv_fold, fold in zip(all_cv_folds, training_output['folds']):
+        scores_update = fold['scores']
         for score in cv_fold.scores:
             for step in scores_update.index:
                 value = scores_update.loc[step, score.name]
                 setattr(score, step + '_score', value)
+    _clear_leaderboard_values(session, submission_id)
     session.commit()
 
 
@@ -732,8 +953,7 @@ def set_bagged_scores(session, submission_id, path_predictions):
         The path where the results files are located.
     """
     submission = select_submission_by_id(session, submission_id)
-    df = pd.read_csv(os.path.join(path_predictions, 'bagged_scores.csv'),
-                     index_col=[0, 1])
+    df = load_training_output(path_predictions)['bagged_scores']
     df_steps = df.index.get_level_values('step').unique().tolist()
     for score in submission.scores:
         for step in ('valid', 'test'):
@@ -748,9 +968,142 @@ def set_bagged_scores(session, submission_id, path_predictions):
                 score_all_bags = None
             setattr(score, '{}_score_cv_bag'.format(step), score_last_bag)
             setattr(score, '{}_score_cv_bags'.format(step), score_all_bags)
+    _clear_leaderboard_values(session, submission_id)
     session.commit()
 
 
+def ingest_training_outputs(session, training_outputs):
+    """Store the results of trained submissions in a single transaction.
+
+    For each submission, the times and scores of each fold and the bagged
+    scores are read and written with bulk updates, the submission is set to
+    the ``'scored'`` state, and the mean and standard deviation of the times
+    across folds are stored. It is equivalent to :func:`set_time`,
+    :func:`set_scores`, :func:`set_bagged_scores`, and
+    :func:`set_submission_state` with a single commit.
+
+    Parameters
+    ----------
+    session : :class:`sqlalchemy.orm.Session`
+        The session to directly perform the operation on the database.
+    training_outputs : dict
+        The path where the results files are located keyed by submission id.
+
+    See also
+    --------
+    ramp_database.tools.ingest_training_output : Ingest a single submission.
+    """
+    if not training_outputs:
+        return
+    submission_ids = list(training_outputs)
+    cv_folds = defaultdict(list)
+    for cv_fold_id, submission_id in (
+            session.query(SubmissionOnCVFold.id,
+                          SubmissionOnCVFold.submission_id)
+                   .filter(SubmissionOnCVFold.submission_id.in_(
+                       submission_ids))
+                   .order_by(SubmissionOnCVFold.id)):
+        cv_folds[submission_id].append(cv_fold_id)
+    fold_scores = defaultdict(list)
+    for fold_score_id, cv_fold_id, score_name in (
+            session.query(SubmissionScoreOnCVFold.id,
+                          SubmissionScoreOnCVFold.submission_on_cv_fold_id,
+                          EventScoreType.name)
+                   .join(SubmissionScore, SubmissionScore.id ==
+                         SubmissionScoreOnCVFold.submission_score_id)
+                   .join(EventScoreType, EventScoreType.id ==
+                         SubmissionScore.event_score_type_id)
+                   .filter(SubmissionScore.submission_id.in_(
+                       submission_ids))):
+        fold_scores[cv_fold_id].append((fold_score_id, score_name))
+    submission_scores = defaultdict(list)
+    for score in (session.query(SubmissionScore)
+                         .filter(SubmissionScore.submission_id.in_(
+                             submission_ids))
+                         .options(defer('valid_score_cv_bags'),
+                                  defer('test_score_cv_bags'))):
+        submission_scores[score.submission_id].append(
+            (score.id, score.score_name, score.event_score_type)
+        )
+
+    # read all the files before to modify the database
+    outputs = {
+        submission_id: load_training_output(path_predictions)
+        for submission_id, path_predictions in training_outputs.items()
+    }
+
+    cv_fold_mappings, fold_score_mappings = [], []
+    score_mappings, submission_mappings = [], []
+    for submission_id, output in outputs.items():
+        folds, bagged_scores = output['folds'], output['bagged_scores']
+        for cv_fold_id, fold in zip(cv_folds[submission_id], folds):
+            cv_fold_mappings.append(dict(
+                id=cv_fold_id, state='scored',
+                **{step + '_time': value
+                   for step, value in fold['time'].items()}
+            ))
+            scores = fold['scores']
+            for fold_score_id, score_name in fold_scores[cv_fold_id]:
+                fold_score_mappings.append(dict(
+                    id=fold_score_id,
+                    **{step + '_score': scores.loc[step, score_name]
+                       for step in scores.index}
+                ))
+        bagged_steps = bagged_scores.index.get_level_values('step').unique()
+        highest_n_bag = bagged_scores.index.get_level_values('n_bag').max()
+        for score_id, score_name, event_score_type in \
+                submission_scores[submission_id]:
+            mapping = {'id': score_id}
+            for step in ('valid', 'test'):
+                if step in bagged_steps:
+                    score_last_bag = bagged_scores.loc[(step, highest_n_bag),
+                                                       score_name]
+                    score_all_bags = np.asarray(
+                        bagged_scores.loc[(step, slice(None)), score_name]
+                    )
+                else:
+                    score_last_bag = float(event_score_type.worst)
+                    score_all_bags = None
+                mapping[step + '_score_cv_bag'] = score_last_bag
+                mapping[step + '_score_cv_bags'] = score_all_bags
+            score_mappings.append(mapping)
+        mapping = {'id': submission_id, 'state': 'scored'}
+        for step in ('train', 'valid', 'test'):
+            fold_times = [fold['time'][step] for fold in folds]
+            mapping[step + '_time_cv_mean'] = np.mean(fold_times)
+            mapping[step + '_time_cv_std'] = np.std(fold_times)
+        submission_mappings.append(mapping)
+
+    session.bulk_update_mappings(SubmissionOnCVFold, cv_fold_mappings)
+    session.bulk_update_mappings(SubmissionScoreOnCVFold, fold_score_mappings)
+    session.bulk_update_mappings(SubmissionScore, score_mappings)
+    session.bulk_update_mappings(Submission, submission_mappings)
+    (session.query(SubmissionLeaderboardValue)
+            .filter(SubmissionLeaderboardValue.submission_id.in_(
+                submission_ids))
+            .delete(synchronize_session=False))
+    session.commit()
+
+
+def ingest_training_output(session, submission_id, path_predictions):
+    """Store the results of a trained submission in a single transaction.
+
+    Parameters
+    ----------
+    session : :class:`sqlalchemy.orm.Session`
+        The session to directly perform the operation on the database.
+    submission_id : int
+        The id of the submission.
+    path_predictions : str
+        The path where the results files are located.
+
+    See also
+    --------
+    ramp_database.tools.ingest_training_outputs : Ingest several submissions.
+    """
+    ingest_training_outputs(session, {submission_id: path_predictions})
+
+
 def set_submission_max_ram(session, submission_id, max_ram_mb):
     """Set the max amount RAM used by a submission during processing.
 
@@ -765,6 +1118,7 @@ def set_submission_max_ram(session, submission_id, max_ram_mb):
     """
     submission = select_submission_by_id(session, submission_id)
     submission.max_ram = max_ram_mb
+    _clear_leaderboard_values(session, submission_id)
     session.commit()
 
 
@@ -788,25 +1142,54 @@ def set_submission_error_msg(session, submission_id, error_msg):
 
 # Computing functions: old style functions when it was using some functionality
 #  from the database itself.
-def score_submission(session, submission_id):
+def _compute_score(score_function, ground_truths, predictions,
+                   valid_indexes=None):
+    if valid_indexes is None:
+        return float(score_function(ground_truths, predictions))
+    return float(score_function(ground_truths, predictions, valid_indexes))
+
+
+def _compute_bagged_scores(score_type, predictions_list, ground_truths,
+                           test_is_list=None):
+    _, scores = get_score_cv_bags(score_type, predictions_list,
+                                  ground_truths, test_is_list=test_is_list)
+    return [float(score) for score in scores]
+
+
+def score_submission(session, submission_id, n_jobs=1,
+                     path_predictions=None):
     """Score a submission and change its state to 'scored'
 
+    The ground truths are loaded once and the predictions of each fold are
+    loaded once. The training, validation, and testing scores of all
+    (fold, score) pairs, as well as the bagged validation and testing
+    scores, are then evaluated in a pool of threads.
+
     Parameters
     ----------
     session : :class:`sqlalchemy.orm.Session`
         The session to directly perform the operation on the database.
     submission_id : int
         submission id
+    n_jobs : int, default=1
+        The number of threads used to compute the scores. -1 means using all
+        the processors.
+    path_predictions : str or None, default=None
+        The path where the results files of the submission are located. If
+        None, the predictions stored in the database with
+        :func:`set_predictions` are used.
 
     Raises
     ------
     ValueError :
-        when the state of the submission is not 'tested'
-        (only a submission with state 'tested' can be scored)
+        when the state of the submission is not 'tested' or 'scored'
+        (only a submission with state 'tested' can be scored and a submission
+        already scored can be re-scored), or when ``path_predictions`` is
+        None and the predictions are not stored in the database.
     """
     submission = select_submission_by_id(session, submission_id)
-    if submission.state != 'tested':
-        raise ValueError('Submission state must be "tested"'
+    if submission.state not in ('tested', 'scored'):
+        raise ValueError('Submission state must be "tested" or "scored"'
                          ' to score, not "{}"'.format(submission.state))
 
     # We are conservative:
@@ -815,20 +1198,117 @@ def score_submission(session, submission_id):
     # manually if needed for submission in various error states.
     all_cv_folds = (session.query(SubmissionOnCVFold)
                            .filter_by(submission_id=submission_id)
-                           .options(defer("full_train_y_pred"),
-                                    defer("test_y_pred"))
                            .all())
     all_cv_folds = sorted(all_cv_folds, key=lambda x: x.id)
+
+    # everything requiring the database is loaded before to dispatch the
+    # computation to the threads
+    problem = submission.event.problem
+    Predictions = submission.Predictions
+    if path_predictions is not None:
+        folds = load_training_output(path_predictions,
+                                     predictions=True)['folds']
+        if len(folds) != len(all_cv_folds):
+            raise ValueError(
+                'The training output in "{}" contains {} folds instead of {}'
+                .format(path_predictions, len(folds), len(all_cv_folds))
+            )
+        y_preds = [(fold['y_pred_train'], fold['y_pred_test'])
+                   for fold in folds]
+    else:
+        y_preds = [(cv_fold.full_train_y_pred, cv_fold.test_y_pred)
+                   for cv_fold in all_cv_folds]
+    if any((cv_fold.is_trained and y_pred_train is None) or
+            (cv_fold.is_tested and y_pred_test is None)
+            for cv_fold, (y_pred_train, y_pred_test)
+            in zip(all_cv_folds, y_preds)):
+        raise ValueError(
+            'The predictions of the submission "{}" are not stored in the '
+            'database. Give the path of its training output in the '
+            'predictions directory of the event.'.format(submission.name)
+        )
+    score_types = {
+        event_score_type.id: event_score_type.score_type_object
+        for event_score_type in submission.event.score_types
+    }
+    true_full_train_predictions = problem.ground_truths_train()
+    true_test_predictions = problem.ground_truths_test()
+    tasks = []
+    valid_predictions, test_predictions_list, valid_is_list = [], [], []
+    for cv_fold, (y_pred_train, y_pred_test) in zip(all_cv_folds, y_preds):
+        # the predictions are sliced by the score function using the fold
+        # indices, avoiding to create a sliced copy for each score
+        if cv_fold.is_trained:
+            full_train_predictions = Predictions(y_pred=y_pred_train)
+        if cv_fold.is_validated:
+            # the bagging expects the predictions restricted to the fold
+            valid_predictions.append(Predictions(
+                y_pred=y_pred_train, fold_is=cv_fold.cv_fold.test_is
+            ))
+            valid_is_list.append(cv_fold.cv_fold.test_is)
+        if cv_fold.is_tested:
+            test_predictions = Predictions(y_pred=y_pred_test)
+            test_predictions_list.append(test_predictions)
+        for score in cv_fold.scores:
+            score_function = score_types[
+                score.submission_score.event_score_type_id
+            ].score_function
+            worst = score.event_score_type.worst
+            if cv_fold.is_trained:
+                tasks.append((score, 'train_score', _compute_score,
+                              (score_function, true_full_train_predictions,
+                               full_train_predictions,
+                               cv_fold.cv_fold.train_is)))
+            else:
+                score.train_score = worst
+            if cv_fold.is_validated:
+                tasks.append((score, 'valid_score', _compute_score,
+                              (score_function, true_full_train_predictions,
+                               full_train_predictions,
+                               cv_fold.cv_fold.test_is)))
+            else:
+                score.valid_score = worst
+            if cv_fold.is_tested:
+                tasks.append((score, 'test_score', _compute_score,
+                              (score_function, true_test_predictions,
+                               test_predictions)))
+            else:
+                score.test_score = worst
+    # the bagged scores combine the predictions of the first folds
+    for score in submission.scores:
+        score_type = score_types[score.event_score_type_id]
+        for step, predictions_list, ground_truths, test_is_list in (
+                ('valid', valid_predictions, true_full_train_predictions,
+                 valid_is_list),
+                ('test', test_predictions_list, true_test_predictions,
+                 None)):
+            if predictions_list:
+                tasks.append((score, step, _compute_bagged_scores,
+                              (score_type, predictions_list, ground_truths,
+                               test_is_list)))
+            else:
+                setattr(score, '{}_score_cv_bag'.format(step),
+                        float(score.event_score_type.worst))
+                setattr(score, '{}_score_cv_bags'.format(step), None)
+
+    if n_jobs < 0:
+        n_jobs = max(os.cpu_count() + 1 + n_jobs, 1)
+    if n_jobs == 1:
+        results = [function(*args) for _, _, function, args in tasks]
+    else:
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(
+                lambda task: task[2](*task[3]), tasks
+            ))
+    for (score, attribute, function, _), result in zip(tasks, results):
+        if function is _compute_bagged_scores:
+            setattr(score, '{}_score_cv_bag'.format(attribute), result[-1])
+            setattr(score, '{}_score_cv_bags'.format(attribute), result)
+        else:
+            setattr(score, attribute, result)
     for submission_on_cv_fold in all_cv_folds:
-        submission_on_cv_fold.session = session
-        submission_on_cv_fold.compute_train_scores()
-        submission_on_cv_fold.compute_valid_scores()
-        submission_on_cv_fold.compute_test_scores()
         submission_on_cv_fold.state = 'scored'
     session.commit()
-    # TODO: We are not managing the bagged score.
-    # submission.compute_test_score_cv_bag(session)
-    # submission.compute_valid_score_cv_bag(session)
     # Means and stds were constructed on demand by fetching fold times.
     # It was slow because submission_on_folds contain also possibly large
     # predictions. If postgres solves this issue (which can be tested on
@@ -847,6 +1327,7 @@ def score_submission(session, submission_id):
         [ts.valid_time for ts in all_cv_folds])
     submission.test_time_cv_std = np.std(
         [ts.test_time for ts in all_cv_folds])
+    _clear_leaderboard_values(session, submission_id)
     submission.state = 'scored'
     session.commit()
 
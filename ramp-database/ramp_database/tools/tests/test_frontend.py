@@ -4,11 +4,15 @@ import shutil
 
 import pytest
 
+from sqlalchemy import event as sa_event
+
 from ramp_utils import read_config
 from ramp_utils import generate_ramp_config
 from ramp_utils.testing import database_config_template
 from ramp_utils.testing import ramp_config_template
 
+from ramp_database.model import Event
+from ramp_database.model import EventTeam
 from ramp_database.model import Model
 
 from ramp_database.utils import setup_db
@@ -20,10 +24,12 @@ from ramp_database.tools.event import get_event
 from ramp_database.tools.event import get_event_admin
 from ramp_database.tools.user import add_user
 from ramp_database.tools.user import approve_user
+from ramp_database.tools.user import get_team_by_name
 from ramp_database.tools.user import get_user_by_name
 from ramp_database.tools.submission import add_submission
 from ramp_database.tools.team import sign_up_team
 
+from ramp_database.tools.frontend import get_problems_overview
 from ramp_database.tools.frontend import is_user_sign_up_requested
 from ramp_database.tools.frontend import is_admin
 from ramp_database.tools.frontend import is_accessible_code
@@ -46,6 +52,20 @@ def session_toy_db(database_connection):
         Model.metadata.drop_all(db)
 
 
+@pytest.fixture
+def session_toy_function(database_connection):
+    database_config = read_config(database_config_template())
+    ramp_config = ramp_config_template()
+    try:
+        deployment_dir = create_toy_db(database_config, ramp_config)
+        with session_scope(database_config['sqlalchemy']) as session:
+            yield session
+    finally:
+        shutil.rmtree(deployment_dir, ignore_errors=True)
+        db, _ = setup_db(database_config['sqlalchemy'])
+        Model.metadata.drop_all(db)
+
+
 def test_check_admin(session_toy_db):
     event_name = 'iris_test'
     user_name = 'test_iris_admin'
@@ -197,3 +217,61 @@ def test_is_accessible_leaderboard(session_toy_db):
     event.closing_timestamp = datetime.datetime.utcnow()
     assert not is_accessible_leaderboard(session_toy_db, event_name,
                                          'test_user_2')
+
+
+def _count_queries(session, func, *args):
+    n_queries = []
+
+    def _count(*args):
+        n_queries.append(1)
+
+    engine = session.get_bind()
+    sa_event.listen(engine, 'before_cursor_execute', _count)
+    try:
+        func(session, *args)
+    finally:
+        sa_event.remove(engine, 'before_cursor_execute', _count)
+    return len(n_queries)
+
+
+def test_get_problems_overview(session_toy_function):
+    problems = get_problems_overview(session_toy_function, 'test_user')
+    problem_names = [problem.name for problem, _ in problems]
+    assert sorted(problem_names) == ['boston_housing', 'iris']
+    events = {event['name']: event
+              for _, problem_events in problems for event in problem_events}
+    assert events['iris_test']['state_user'] == 'signed'
+    assert events['iris_test']['n_participants'] == 2
+    assert events['iris_test']['state'] in ('close', 'competitive', 'collab')
+    problems = get_problems_overview(session_toy_function)
+    assert all(event['state_user'] == 'not_signed'
+               for _, problem_events in problems for event in problem_events)
+
+    # the number of queries does not depend on the number of events
+    n_queries = _count_queries(session_toy_function, get_problems_overview,
+                               'test_user')
+    event = get_event(session_toy_function, 'iris_test')
+    event_row = {column.name: getattr(event, column.name)
+                 for column in Event.__table__.columns
+                 if column.name != 'id'}
+    team = get_team_by_name(session_toy_function, 'test_user')
+    for event_idx in range(50):
+        event_row['name'] = 'iris_test_{}'.format(event_idx)
+        session_toy_function.execute(Event.__table__.insert(), [event_row])
+        new_event = get_event(session_toy_function, event_row['name'])
+        session_toy_function.execute(EventTeam.__table__.insert(), [{
+            'event_id': new_event.id, 'team_id': team.id,
+            'signup_timestamp': datetime.datetime.utcnow(),
+            'approved': bool(event_idx % 2)
+        }])
+    session_toy_function.commit()
+    session_toy_function.expire_all()
+    assert _count_queries(session_toy_function, get_problems_overview,
+                          'test_user') == n_queries
+
+    problems = get_problems_overview(session_toy_function, 'test_user')
+    events = {event['name']: event
+              for _, problem_events in problems for event in problem_events}
+    assert events['iris_test_0']['state_user'] == 'waiting'
+    assert events['iris_test_1']['state_user'] == 'signed'
+    assert events['iris_test_1']['n_participants'] == 1
@@ -15,11 +15,17 @@ from ramp_database.utils import session_scope
 from ramp_database.testing import create_toy_db
 
 from ramp_database.model import EventTeam
+from ramp_database.model import SubmissionLeaderboardValue
 
 from ramp_database.tools.event import get_event
+from ramp_database.tools.submission import get_submission_by_name
+from ramp_database.tools.submission import get_submissions
+from ramp_database.tools.submission import set_submission_max_ram
 from ramp_database.tools.team import get_event_team_by_name
 
 from ramp_database.tools.leaderboard import get_leaderboard
+from ramp_database.tools.leaderboard import get_leaderboard_page
+from ramp_database.tools.leaderboard import invalidate_user_leaderboards
 from ramp_database.tools.leaderboard import update_all_user_leaderboards
 from ramp_database.tools.leaderboard import update_leaderboards
 from ramp_database.tools.leaderboard import update_user_leaderboards
@@ -96,8 +102,12 @@ def test_update_leaderboard_functions(session_toy_function):
     dispatcher.launch()
     session_toy_function.commit()
 
+    event = get_event(session_toy_function, event_name)
+    previous_version = event.leaderboard_version
     update_leaderboards(session_toy_function, event_name)
     event = get_event(session_toy_function, event_name)
+    # the version changes each time the leaderboards are updated
+    assert event.leaderboard_version == previous_version + 1
     assert event.private_leaderboard_html
     assert event.public_leaderboard_html_with_links
     assert event.public_leaderboard_html_no_links
@@ -106,9 +116,13 @@ def test_update_leaderboard_functions(session_toy_function):
     assert event.private_competition_leaderboard_html
     assert event.new_leaderboard_html is None
 
+    event_team = get_event_team_by_name(session_toy_function, event_name,
+                                        user_name)
+    previous_version = event_team.leaderboard_version
     update_user_leaderboards(session_toy_function, event_name, user_name)
     event_team = get_event_team_by_name(session_toy_function, event_name,
                                         user_name)
+    assert event_team.leaderboard_version == previous_version + 1
     assert event_team.leaderboard_html
     assert event_team.failed_leaderboard_html
     assert event_team.new_leaderboard_html is None
@@ -121,6 +135,128 @@ def test_update_leaderboard_functions(session_toy_function):
         assert et.leaderboard_html
         assert et.failed_leaderboard_html
         assert et.new_leaderboard_html is None
+        assert not et.leaderboard_outdated
+
+    # invalidating the leaderboards does not recompute them
+    event_team = get_event_team_by_name(session_toy_function, event_name,
+                                        user_name)
+    previous_version = event_team.leaderboard_version
+    invalidate_user_leaderboards(session_toy_function, event_name,
+                                 [user_name])
+    for et in event_teams:
+        session_toy_function.refresh(et)
+        assert et.leaderboard_outdated == (et.team.name == user_name)
+        assert et.leaderboard_html
+    assert event_team.leaderboard_version == previous_version + 1
+    update_user_leaderboards(session_toy_function, event_name, user_name)
+    assert not event_team.leaderboard_outdated
+
+    invalidate_user_leaderboards(session_toy_function, event_name)
+    for et in event_teams:
+        session_toy_function.refresh(et)
+        assert et.leaderboard_outdated
+
+
+def test_leaderboard_values_store(session_toy_function):
+    event_name = 'iris_test'
+    config = read_config(database_config_template())
+    event_config = read_config(ramp_config_template())
+    dispatcher = Dispatcher(
+        config, event_config, n_workers=-1, hunger_policy='exit'
+    )
+    dispatcher.launch()
+    session_toy_function.commit()
+
+    # the values are materialised when computing the leaderboard
+    update_leaderboards(session_toy_function, event_name)
+    submissions = get_submissions(session_toy_function, event_name, 'scored')
+    submission_ids = [sub_id for sub_id, _, _ in submissions]
+    values = (session_toy_function.query(SubmissionLeaderboardValue)
+                                  .filter(SubmissionLeaderboardValue
+                                          .submission_id.in_(submission_ids))
+                                  .all())
+    assert {value.submission_id for value in values} == set(submission_ids)
+    assert all(value.state == 'scored' for value in values)
+
+    # changing the results of a submission invalidate only its values
+    set_submission_max_ram(session_toy_function, submission_ids[0], 1234.5)
+    assert not (session_toy_function.query(SubmissionLeaderboardValue)
+                                    .filter_by(submission_id=submission_ids[0])
+                                    .all())
+    assert (session_toy_function.query(SubmissionLeaderboardValue)
+                                .filter_by(submission_id=submission_ids[1])
+                                .all())
+    leaderboard = get_leaderboard(session_toy_function, 'private', event_name)
+    assert '1234.5' in leaderboard
+
+
+def test_get_leaderboard_page(session_toy_function):
+    event_name = 'iris_test'
+    leaderboard = get_leaderboard_page(session_toy_function, event_name)
+    assert leaderboard['submissions'] == []
+    assert leaderboard['total'] == 0
+
+    config = read_config(database_config_template())
+    event_config = read_config(ramp_config_template())
+    dispatcher = Dispatcher(
+        config, event_config, n_workers=-1, hunger_policy='exit'
+    )
+    dispatcher.launch()
+    session_toy_function.commit()
+
+    leaderboard = get_leaderboard_page(session_toy_function, event_name,
+                                       per_page=2)
+    assert leaderboard['columns'][:3] == ['team', 'submission', 'acc']
+    assert (leaderboard['page'], leaderboard['per_page'],
+            leaderboard['total'], leaderboard['pages']) == (1, 2, 3, 2)
+    first_page = leaderboard['submissions']
+    assert len(first_page) == 2
+    assert all('link' in sub for sub in first_page)
+    last_page = get_leaderboard_page(session_toy_function, event_name,
+                                     page=2, per_page=2)['submissions']
+    assert len(last_page) == 1
+    # the best submissions are reported first
+    scores = [sub['acc'] for sub in first_page + last_page]
+    assert scores == sorted(scores, reverse=True)
+
+    # outdated values are computed again to sort the submissions but they
+    # are not written in the database
+    best = first_page[0]['submission']
+    best_id = get_submission_by_name(session_toy_function, event_name,
+                                     first_page[0]['team'], best).id
+    (session_toy_function.query(SubmissionLeaderboardValue)
+                         .filter_by(submission_id=best_id)
+                         .update({'state': 'new'}))
+    (session_toy_function.query(SubmissionLeaderboardValue)
+                         .filter_by(submission_id=best_id,
+                                    name='bag public acc')
+                         .update({'value': -1}))
+    session_toy_function.commit()
+    leaderboard = get_leaderboard_page(session_toy_function, event_name)
+    assert leaderboard['submissions'][0]['submission'] == best
+    assert leaderboard['submissions'][0]['acc'] == scores[0]
+    session_toy_function.rollback()
+    stored_value = (session_toy_function.query(SubmissionLeaderboardValue)
+                                        .filter_by(submission_id=best_id,
+                                                   name='bag public acc')
+                                        .one())
+    assert (stored_value.value, stored_value.state) == (-1, 'new')
+
+    leaderboard = get_leaderboard_page(session_toy_function, event_name,
+                                       sort='-submission', with_links=False)
+    names = [sub['submission'] for sub in leaderboard['submissions']]
+    assert names == sorted(names, reverse=True)
+    assert all('link' not in sub for sub in leaderboard['submissions'])
+
+    leaderboard = get_leaderboard_page(session_toy_function, event_name,
+                                       team_name='test_user')
+    assert leaderboard['total'] == 1
+    assert leaderboard['submissions'][0]['team'] == 'test_user'
+
+    with pytest.raises(ValueError, match='can be sorted by'):
+        get_leaderboard_page(session_toy_function, event_name, sort='xxx')
+    with pytest.raises(ValueError, match='page should be'):
+        get_leaderboard_page(session_toy_function, event_name, page=0)
 
 
 @pytest.mark.parametrize(
@@ -8,6 +8,7 @@ import numpy as np
 from numpy.testing import assert_allclose
 import pandas as pd
 from pandas.testing import assert_frame_equal
+import rampwf as rw
 
 from ramp_utils import read_config
 from ramp_utils import generate_ramp_config
@@ -44,6 +45,7 @@ from ramp_database.tools.submission import get_bagged_scores
 from ramp_database.tools.submission import get_event_nb_folds
 from ramp_database.tools.submission import get_predictions
 from ramp_database.tools.submission import get_scores
+from ramp_database.tools.submission import get_scores_bulk
 from ramp_database.tools.submission import get_source_submissions
 from ramp_database.tools.submission import get_submission_by_id
 from ramp_database.tools.submission import get_submission_by_name
@@ -51,8 +53,11 @@ from ramp_database.tools.submission import get_submission_state
 from ramp_database.tools.submission import get_submission_error_msg
 from ramp_database.tools.submission import get_submission_max_ram
 from ramp_database.tools.submission import get_submissions
+from ramp_database.tools.submission import get_team_train_times
 from ramp_database.tools.submission import get_time
 
+from ramp_database.tools.submission import ingest_training_output
+from ramp_database.tools.submission import ingest_training_outputs
 from ramp_database.tools.submission import set_bagged_scores
 from ramp_database.tools.submission import set_predictions
 from ramp_database.tools.submission import set_scores
@@ -61,6 +66,9 @@ from ramp_database.tools.submission import set_submission_max_ram
 from ramp_database.tools.submission import set_submission_state
 from ramp_database.tools.submission import set_time
 
+from ramp_database.tools.submission import _compute_bagged_scores
+from ramp_database.tools.submission import _materialize_file
+from ramp_database.tools.submission import copy_submission_file
 from ramp_database.tools.submission import score_submission
 from ramp_database.tools.submission import submit_starting_kits
 
@@ -282,6 +290,63 @@ def test_submit_starting_kits(base_db):
     submission_name = {get_submission_by_id(session, sub_id).name
                        for sub_id in submissions_id}
     assert submission_name == expected_submission_name
+    # the submitted files are hard links to the files of the content store
+    for sub_id in submissions_id:
+        submission = get_submission_by_id(session, sub_id)
+        for filename in submission.f_names:
+            path_file = os.path.join(submission.path, filename)
+            assert os.stat(path_file).st_nlink >= 2
+
+
+@pytest.mark.parametrize("support_link", [True, False])
+def test_materialize_file(tmpdir, monkeypatch, support_link):
+    if not support_link:
+        def link(src, dst):
+            raise OSError('Hard links are not supported')
+        monkeypatch.setattr(os, 'link', link)
+    store_dir = os.path.join(str(tmpdir), '.store')
+    filenames = {}
+    for name, content in [('a', 'same'), ('b', 'same'), ('c', 'other')]:
+        src = os.path.join(str(tmpdir), name + '_src.py')
+        with open(src, 'w') as f:
+            f.write(content)
+        filenames[name] = os.path.join(str(tmpdir), name + '.py')
+        _materialize_file(src, filenames[name], store_dir)
+        with open(filenames[name]) as f:
+            assert f.read() == content
+
+    def inode(name):
+        return os.stat(filenames[name]).st_ino
+
+    # identical files share the same copy only if hard links are supported
+    assert (inode('a') == inode('b')) == support_link
+    assert inode('a') != inode('c')
+
+
+def test_copy_submission_file(tmpdir):
+    store_dir = os.path.join(str(tmpdir), '.store')
+    src = os.path.join(str(tmpdir), 'src.py')
+    with open(src, 'w') as f:
+        f.write('shared')
+    filenames = [os.path.join(str(tmpdir), name)
+                 for name in ('team_1.py', 'team_2.py')]
+    for filename in filenames:
+        _materialize_file(src, filename, store_dir)
+
+    new_src = os.path.join(str(tmpdir), 'new_src.py')
+    with open(new_src, 'w') as f:
+        f.write('modified')
+    copy_submission_file(new_src, filenames[0])
+    with open(filenames[0]) as f:
+        assert f.read() == 'modified'
+    # the file shared through the content store is not modified
+    with open(filenames[1]) as f:
+        assert f.read() == 'shared'
+    stored_file, = [os.path.join(root, name)
+                    for root, _, files in os.walk(store_dir)
+                    for name in files]
+    with open(stored_file) as f:
+        assert f.read() == 'shared'
 
 
 @pytest.mark.parametrize(
@@ -401,6 +466,103 @@ def test_check_bagged_scores(session_scope_module):
     assert_frame_equal(scores, expected_df, check_less_precise=True)
 
 
+def test_get_scores_bulk(session_scope_module):
+    # the bulk loader should give the same information than the per
+    # submission getters
+    submission_id = 1
+    path_results = os.path.join(HERE, 'data', 'iris_predictions')
+    set_time(session_scope_module, submission_id, path_results)
+    set_scores(session_scope_module, submission_id, path_results)
+    set_bagged_scores(session_scope_module, submission_id, path_results)
+    df = get_scores_bulk(session_scope_module, [submission_id, 2])
+    assert list(df.columns) == ['submission_id', 'kind', 'fold', 'step',
+                                'score', 'value']
+    assert set(df['kind']) == {'score', 'bagged_score', 'time'}
+
+    df_sub = df[df['submission_id'] == submission_id]
+    scores = (df_sub[df_sub['kind'] == 'score']
+              .pivot_table(index=['fold', 'step'], columns='score',
+                           values='value'))
+    expected_scores = get_scores(session_scope_module, submission_id)
+    assert_frame_equal(scores.loc[expected_scores.index,
+                                  expected_scores.columns],
+                       expected_scores, check_names=False)
+
+    bagged_scores = (df_sub[df_sub['kind'] == 'bagged_score']
+                     .pivot_table(index=['step', 'fold'], columns='score',
+                                  values='value'))
+    expected_bagged_scores = get_bagged_scores(session_scope_module,
+                                               submission_id)
+    assert_allclose(
+        bagged_scores[expected_bagged_scores.columns].values,
+        expected_bagged_scores.values
+    )
+
+    times = (df_sub[df_sub['kind'] == 'time']
+             .pivot(index='fold', columns='step', values='value'))
+    expected_times = get_time(session_scope_module, submission_id)
+    assert_frame_equal(times[expected_times.columns], expected_times,
+                       check_names=False)
+
+    assert get_scores_bulk(session_scope_module, []).empty
+
+
+def test_ingest_training_output(session_scope_module):
+    # the single transaction ingestion should give the same results than the
+    # per-step setters
+    path_results = os.path.join(HERE, 'data', 'iris_predictions')
+    set_time(session_scope_module, 1, path_results)
+    set_scores(session_scope_module, 1, path_results)
+    set_bagged_scores(session_scope_module, 1, path_results)
+    previous_states = {submission_id: get_submission_state(
+        session_scope_module, submission_id) for submission_id in (2, 3, 4)}
+    try:
+        ingest_training_outputs(session_scope_module,
+                                {2: path_results, 3: path_results})
+        for submission_id in (2, 3):
+            assert get_submission_state(session_scope_module,
+                                        submission_id) == 'scored'
+            assert_frame_equal(get_time(session_scope_module, submission_id),
+                               get_time(session_scope_module, 1))
+            assert_frame_equal(get_scores(session_scope_module,
+                                          submission_id),
+                               get_scores(session_scope_module, 1))
+            assert_frame_equal(
+                get_bagged_scores(session_scope_module, submission_id),
+                get_bagged_scores(session_scope_module, 1)
+            )
+        submission = get_submission_by_id(session_scope_module, 2)
+        assert submission.train_time_cv_mean == pytest.approx(
+            get_time(session_scope_module, 1)['train'].mean()
+        )
+
+        ingest_training_output(session_scope_module, 4, path_results)
+        assert get_submission_state(session_scope_module, 4) == 'scored'
+    finally:
+        for submission_id, state in previous_states.items():
+            submission = get_submission_by_id(session_scope_module,
+                                              submission_id)
+            submission.state = state
+            submission.train_time_cv_mean = None
+        session_scope_module.commit()
+
+
+def test_get_team_train_times(session_scope_module):
+    submission = get_submission_by_id(session_scope_module, 1)
+    previous_state = submission.state
+    try:
+        submission.state = 'scored'
+        submission.train_time_cv_mean = 2.5
+        session_scope_module.commit()
+        train_times = get_team_train_times(session_scope_module, 'iris_test')
+        assert train_times[submission.team.name] == pytest.approx(2.5)
+        assert get_team_train_times(session_scope_module,
+                                    'boston_housing_test') == {}
+    finally:
+        submission.state = previous_state
+        session_scope_module.commit()
+
+
 def test_check_predictions(session_scope_module):
     # check both set_predictions and get_predictions
     submission_id = 1
@@ -440,6 +602,33 @@ def test_check_submission_error_msg(session_scope_module):
     assert err_msg == expected_err_msg
 
 
+def test_compute_bagged_scores():
+    Predictions = rw.prediction_types.make_multiclass(label_names=[0, 1, 2])
+    score_type = rw.score_types.Accuracy(name='acc')
+    y_true = np.array([0, 1, 2] * 10)
+    ground_truths = Predictions(y_true=y_true)
+    test_is_list = [np.arange(0, 10), np.arange(10, 20), np.arange(20, 30)]
+    # the predictions of the last fold are wrong on its validation indices
+    y_pred_train = np.eye(3)[y_true]
+    y_pred_wrong = np.eye(3)[(y_true + 1) % 3]
+    y_pred_trains = [y_pred_train, y_pred_train, y_pred_wrong]
+    # the predictions cover the whole training set and are restricted to
+    # the validation indices of each fold, as done by score_submission
+    predictions_list = [
+        Predictions(y_pred=y_pred, fold_is=test_is)
+        for y_pred, test_is in zip(y_pred_trains, test_is_list)
+    ]
+    scores = _compute_bagged_scores(score_type, predictions_list,
+                                    ground_truths, test_is_list)
+    assert_allclose(scores, [1, 1, 2 / 3])
+
+    # without validation indices, the full predictions are bagged
+    scores = _compute_bagged_scores(
+        score_type, [Predictions(y_pred=y_pred_train)], ground_truths
+    )
+    assert scores == [1.0]
+
+
 @pytest.mark.filterwarnings('ignore:F-score is ill-defined and being set')
 def test_score_submission(session_scope_module):
     submission_id = 9
@@ -462,6 +651,30 @@ def test_score_submission(session_scope_module):
     scores = get_scores(session_scope_module, submission_id)
     assert_frame_equal(scores, expected_df, check_less_precise=True)
 
+    # a scored submission can be re-scored in parallel
+    score_submission(session_scope_module, submission_id, n_jobs=2)
+    scores = get_scores(session_scope_module, submission_id)
+    assert_frame_equal(scores, expected_df, check_less_precise=True)
+    # the bagged scores are computed as well
+    submission = get_submission_by_id(session_scope_module, submission_id)
+    for score in submission.scores:
+        assert len(score.valid_score_cv_bags) == 2
+        assert len(score.test_score_cv_bags) == 2
+        assert score.test_score_cv_bag == score.test_score_cv_bags[-1]
+
+    # the predictions can be read from the training output instead of the
+    # database
+    for submission_on_cv_fold in submission.on_cv_folds:
+        submission_on_cv_fold.full_train_y_pred = None
+        submission_on_cv_fold.test_y_pred = None
+    session_scope_module.commit()
+    with pytest.raises(ValueError, match='are not stored in the database'):
+        score_submission(session_scope_module, submission_id)
+    score_submission(session_scope_module, submission_id,
+                     path_predictions=path_results)
+    scores = get_scores(session_scope_module, submission_id)
+    assert_frame_equal(scores, expected_df, check_less_precise=True)
+
 
 def test_get_source_submission(session_scope_module):
     # since we do not record interaction without the front-end, we should get
@@ -3,19 +3,127 @@ The :mod:`ramp_database.utils` module provides tools to setup and connect to
 the RAMP database.
 """
 
+import os
+import threading
 from contextlib import contextmanager
 
 import bcrypt
 
 from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.engine.url import URL
 
 from .model import Model
+from .model import configure_array_storage
+from .model import install_submission_notify_trigger
+
+ENGINE_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout',
+                  'pool_recycle', 'pool_pre_ping')
+# options of the ``sqlalchemy`` section mapped to the parameters of
+# ramp_database.model.configure_array_storage
+ARRAY_STORAGE_OPTIONS = {'array_codec': 'codec',
+                         'array_store_path': 'store_path',
+                         'array_store_threshold': 'threshold'}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(config):
+    """Get the engine connecting to a database.
+
+    A single engine, and thus a single pool of connections, is created by
+    process for each configuration.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration file containing the information to connect to the
+        dataset. If you are using the configuration provided by ramp, it
+        corresponds to the the `sqlalchemy` key. Besides the parameters of
+        the URL, the keys ``pool_size``, ``max_overflow``, ``pool_timeout``,
+        ``pool_recycle`` and ``pool_pre_ping`` are passed to
+        :func:`sqlalchemy.create_engine` and the storage of the arrays is
+        configured with the keys ``array_codec``, ``array_store_path`` and
+        ``array_store_threshold``, see :func:`setup_array_storage`.
+
+    Returns
+    -------
+    db : :class:`sqlalchemy.Engine`
+        The engine to connect to the database.
+    """
+    # the connections of the pool cannot be shared with a forked process
+    key = (os.getpid(), tuple(sorted(config.items())))
+    with _engines_lock:
+        db = _engines.get(key)
+        if db is None:
+            url_config = {key: value for key, value in config.items()
+                          if key not in ENGINE_OPTIONS and
+                          key not in ARRAY_STORAGE_OPTIONS}
+            engine_options = {key: value for key, value in config.items()
+                              if key in ENGINE_OPTIONS}
+            setup_array_storage(config)
+            db = create_engine(URL(**url_config), **engine_options)
+            _engines[key] = db
+    return db
+
+
+def setup_array_storage(config):
+    """Configure the storage of the arrays from the database configuration.
+
+    The storage is shared by the process and is only configured if one of
+    the ``array_codec``, ``array_store_path`` or ``array_store_threshold``
+    keys is given.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration file containing the information to connect to the
+        dataset. If you are using the configuration provided by ramp, it
+        corresponds to the the `sqlalchemy` key.
+
+    See also
+    --------
+    ramp_database.model.configure_array_storage
+    """
+    storage_options = {param: config[key]
+                       for key, param in ARRAY_STORAGE_OPTIONS.items()
+                       if key in config}
+    if storage_options:
+        configure_array_storage(**storage_options)
+
+
+def dispose_engines():
+    """Close the connections of all the engines created by
+    :func:`get_engine`."""
+    with _engines_lock:
+        for db in _engines.values():
+            db.dispose()
+        _engines.clear()
+
+
+def init_db(config):
+    """Create the tables of the RAMP database which do not exist yet.
+
+    The trigger notifying the new submissions to the dispatchers is
+    (re)installed on the existing tables.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration file containing the information to connect to the
+        dataset. If you are using the configuration provided by ramp, it
+        corresponds to the the `sqlalchemy` key.
+    """
+    db = get_engine(config)
+    Model.metadata.create_all(db)
+    install_submission_notify_trigger(db)
 
 
 def setup_db(config):
-    """Create a sqlalchemy engine and session to interact with the database.
+    """Create the database tables and a session to interact with the
+    database.
 
     Parameters
     ----------
@@ -32,20 +140,21 @@ def setup_db(config):
         Configured Session class which can later be used to communicate with
         the database.
     """
-    # create the URL from the configuration
-    db_url = URL(**config)
-    db = create_engine(db_url)
-    Session = sessionmaker(db)
+    db = get_engine(config)
     # Link the relational model to the database
     Model.metadata.create_all(db)
 
-    return db, Session
+    return db, sessionmaker(db)
 
 
 @contextmanager
 def session_scope(config):
     """Connect to a database and provide a session to make some operation.
 
+    The connection is taken from the pool of the engine returned by
+    :func:`get_engine`. The tables are expected to exist, see
+    :func:`init_db`.
+
     Parameters
     ----------
     config : dict
@@ -58,7 +167,7 @@ def session_scope(config):
     session : :class:`sqlalchemy.orm.Session`
         The session to directly perform the operation on the database.
     """
-    db, Session = setup_db(config)
+    db = get_engine(config)
     with db.connect() as conn:
         session = Session(bind=conn)
         try:
@@ -36,7 +36,8 @@ INSTALL_REQUIRES = ['bcrypt', 'click', 'gitpython', 'nbconvert', 'numpy',
                     'pandas', 'psycopg2-binary', 'sqlalchemy']
 EXTRAS_REQUIRE = {
     'tests': ['pytest', 'pytest-cov'],
-    'docs': ['sphinx', 'sphinx_rtd_theme', 'numpydoc']
+    'docs': ['sphinx', 'sphinx_rtd_theme', 'numpydoc'],
+    'compression': ['lz4', 'zstandard']
 }
 PACKAGE_DATA = {
     'ramp_database': [
@@ -1,6 +1,7 @@
 from .aws import AWSWorker
 from .dispatcher import Dispatcher
 from .local import CondaEnvWorker
+from .multi_dispatcher import MultiEventDispatcher
 
 from ._version import __version__
 
@@ -11,6 +12,7 @@ __all__ = [
     'AWSWorker',
     'CondaEnvWorker',
     'Dispatcher',
+    'MultiEventDispatcher',
     'available_workers',
     '__version__'
 ]
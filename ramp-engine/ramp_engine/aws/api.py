@@ -1,10 +1,18 @@
 from __future__ import print_function, absolute_import, unicode_literals
+import atexit
+import hashlib
+import io
 import os
 import time
 import logging
 import subprocess
 import re
 import codecs
+import shlex
+import shutil
+import tarfile
+import tempfile
+import threading
 
 # amazon api
 import botocore  # noqa
@@ -52,6 +60,12 @@ CHECK_FINISHED_TRAINING_INTERVAL_SECS_FIELD = (
 LOCAL_LOG_FOLDER_FIELD = 'logs_dir'
 TRAIN_LOOP_INTERVAL_SECS_FIELD = 'train_loop_interval_secs'
 MEMORY_PROFILING_FIELD = 'memory_profiling'
+SSH_CONTROL_PERSIST_SECS_FIELD = 'ssh_control_persist_secs'
+STATUS_CACHE_TTL_SECS_FIELD = 'status_cache_ttl_secs'
+POOL_MIN_IDLE_FIELD = 'pool_min_idle'
+POOL_MAX_IDLE_FIELD = 'pool_max_idle'
+POOL_IDLE_TTL_SECS_FIELD = 'pool_idle_ttl_secs'
+DELTA_UPLOAD_FIELD = 'delta_upload'
 
 HOOKS_SECTION = 'hooks'
 HOOK_START_TRAINING = 'start_training'
@@ -81,14 +95,53 @@ ALL_FIELDS = [
     LOCAL_LOG_FOLDER_FIELD,
     TRAIN_LOOP_INTERVAL_SECS_FIELD,
     MEMORY_PROFILING_FIELD,
+    SSH_CONTROL_PERSIST_SECS_FIELD,
+    STATUS_CACHE_TTL_SECS_FIELD,
+    POOL_MIN_IDLE_FIELD,
+    POOL_MAX_IDLE_FIELD,
+    POOL_IDLE_TTL_SECS_FIELD,
+    DELTA_UPLOAD_FIELD,
     HOOKS_SECTION,
 ]
 ALL_FIELDS = set(ALL_FIELDS)
-REQUIRED_FIELDS = ALL_FIELDS - {HOOKS_SECTION}
+OPTIONAL_FIELDS = {
+    HOOKS_SECTION,
+    SSH_CONTROL_PERSIST_SECS_FIELD,
+    STATUS_CACHE_TTL_SECS_FIELD,
+    POOL_MIN_IDLE_FIELD,
+    POOL_MAX_IDLE_FIELD,
+    POOL_IDLE_TTL_SECS_FIELD,
+    DELTA_UPLOAD_FIELD,
+}
+REQUIRED_FIELDS = ALL_FIELDS - OPTIONAL_FIELDS
 
 # constants
 RAMP_AWS_BACKEND_TAG = 'ramp_aws_backend_instance'
 SUBMISSIONS_FOLDER = 'submissions'
+# folder of the remote ramp kit storing the uploaded files by content hash
+BLOBS_FOLDER = '.ramp_blobs'
+# time during which an idle multiplexed ssh connection is kept open
+DEFAULT_SSH_CONTROL_PERSIST_SECS = 600
+
+# the boto sessions and the public ips of the instances are cached to avoid
+# querying the ec2 api for each remote command
+_BOTO_SESSIONS = {}
+_INSTANCE_IPS = {}
+_CACHE_LOCK = threading.Lock()
+# folder containing the sockets of the multiplexed ssh connections
+_SSH_CONTROL_DIR = None
+# time during which the training status of the instances is reused
+DEFAULT_STATUS_CACHE_TTL_SECS = 10
+# the training status of the instances shared by all the workers:
+# instance id -> (time of the check, status)
+_TRAINING_STATUS = {}
+# the state of all the ramp instances: (time of the check, {id: state})
+_INSTANCE_STATES = [None, {}]
+# time after which an idle instance of the pool is terminated
+DEFAULT_POOL_IDLE_TTL_SECS = 600
+# the content hashes of the files uploaded on each instance:
+# instance id -> set of hashes
+_UPLOADED_BLOBS = {}
 
 
 def _wait_until_train_finished(config, instance_id, submission_name):
@@ -196,6 +249,10 @@ def terminate_ec2_instance(config, instance_id):
     instance_id : str
         instance id
     """
+    _close_ssh_connection(config, instance_id)
+    with _CACHE_LOCK:
+        _TRAINING_STATUS.pop(instance_id, None)
+        _UPLOADED_BLOBS.pop(instance_id, None)
     sess = _get_boto_session(config)
     resource = sess.resource('ec2')
     logger.info('Killing the instance {}...'.format(instance_id))
@@ -278,13 +335,116 @@ def upload_submission(config, instance_id, submission_name,
 
     submission_id : int
         submission id
+
+    Unless ``delta_upload`` is False, only the files whose content has not
+    been uploaded yet on the instance are sent, see `_upload_delta`. rsync
+    is used otherwise or if the delta upload fails.
     """
     submission_path = os.path.join(submissions_dir, submission_name)
     ramp_kit_folder = config[REMOTE_RAMP_KIT_FOLDER_FIELD]
     dest_folder = os.path.join(ramp_kit_folder, SUBMISSIONS_FOLDER)
+    if config.get(DELTA_UPLOAD_FIELD, True):
+        exit_status = _upload_delta(config, instance_id, submission_path,
+                                    os.path.join(dest_folder,
+                                                 submission_name))
+        if exit_status == 0:
+            return exit_status
+        logger.warning('Delta upload of "{}" failed, falling back to rsync'
+                       .format(submission_name))
     return _upload(config, instance_id, submission_path, dest_folder)
 
 
+def _hash_file(path, chunk_size=1 << 20):
+    """Return the sha256 of the content of a file."""
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def _upload_delta(config, instance_id, source, dest):
+    """
+    Upload a local folder to an ec2 instance, sending only the files whose
+    content is not on the instance yet.
+
+    The files are stored on the instance by content hash in the
+    ``.ramp_blobs`` folder of the remote ramp kit. The missing files and the
+    manifest of the folder are sent in a single compressed tar stream, then
+    the folder is rebuilt from the stored files by the same ssh command. The
+    hashes uploaded on each instance are tracked locally and forgotten when
+    the instance is terminated.
+
+    Parameters
+    ----------
+
+    config : dict
+        configuration
+
+    instance_id : str
+        instance id
+
+    source : str
+        local folder
+
+    dest : str
+        remote folder, replaced by the content of ``source``
+
+    Returns
+    -------
+
+    int, the exit status of the ssh command
+    """
+    manifest = []
+    for root, _, files in os.walk(source):
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            manifest.append((_hash_file(path), os.path.relpath(path, source),
+                             path))
+    with _CACHE_LOCK:
+        uploaded = set(_UPLOADED_BLOBS.get(instance_id, ()))
+    manifest_name = '{}.manifest'.format(os.path.basename(dest))
+    manifest_content = ''.join('{} {}\n'.format(file_hash, relpath)
+                               for file_hash, relpath, _ in manifest)
+    missing = set()
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode='w:gz') as tar:
+        for file_hash, _, path in manifest:
+            if file_hash not in uploaded and file_hash not in missing:
+                tar.add(path, arcname=file_hash)
+                missing.add(file_hash)
+        info = tarfile.TarInfo(manifest_name)
+        info.size = len(manifest_content.encode('utf-8'))
+        tar.addfile(info, io.BytesIO(manifest_content.encode('utf-8')))
+    blobs = os.path.join(config[REMOTE_RAMP_KIT_FOLDER_FIELD], BLOBS_FOLDER)
+    remote_cmd = (
+        'set -e; mkdir -p {blobs}; tar xzf - -C {blobs}; rm -rf {dest}; '
+        'mkdir -p {dest}; cd {dest}; '
+        'while read -r hash path; do '
+        'mkdir -p "$(dirname "$path")"; cp {blobs}/"$hash" "$path"; '
+        'done < {blobs}/{manifest}'
+    ).format(blobs=shlex.quote(blobs), dest=shlex.quote(dest),
+             manifest=shlex.quote(manifest_name))
+    values = {
+        'ssh': _ssh_command(config),
+        'user': config[AMI_USER_NAME_FIELD],
+        'ip': _get_instance_ip(config, instance_id),
+        'cmd': shlex.quote(remote_cmd),
+    }
+    cmd = "{ssh} {user}@{ip} {cmd}".format(**values)
+    logger.debug('Upload {} new file(s) out of {} to "{}"'.format(
+        len(missing), len(manifest), dest))
+    exit_status = subprocess.run(cmd, shell=True,
+                                 input=data.getvalue()).returncode
+    with _CACHE_LOCK:
+        if exit_status == 0:
+            _UPLOADED_BLOBS.setdefault(instance_id, set()).update(missing)
+        else:
+            # the state of the instance is unknown
+            _UPLOADED_BLOBS.pop(instance_id, None)
+    return exit_status
+
+
 def download_log(config, instance_id, submission_name, folder=None):
     """
     Download the log file from an ec2 instance to a local folder `folder`.
@@ -504,6 +664,9 @@ def launch_train(config, instance_id, submission_name):
     cmd = cmd.format(**values)
     # tag the ec2 instance with info about submission
     _tag_instance_by_submission(config, instance_id, submission_name)
+    # the cached status predates the new screen
+    with _CACHE_LOCK:
+        _TRAINING_STATUS.pop(instance_id, None)
     logger.info('Launch training of {}..'.format(submission_name))
     return _run(config, instance_id, cmd)
 
@@ -588,18 +751,13 @@ def _rsync(config, instance_id, source, dest):
         dest file or folder
 
     """
-    key_path = config[KEY_PATH_FIELD]
     ami_username = config[AMI_USER_NAME_FIELD]
-
-    sess = _get_boto_session(config)
-    resource = sess.resource('ec2')
-    inst = resource.Instance(instance_id)
-    ip = inst.public_ip_address
+    ip = _get_instance_ip(config, instance_id)
     fmt = {'user': ami_username, 'ip': ip}
     values = {
         'user': ami_username,
         'ip': ip,
-        'cmd': "ssh -o 'StrictHostKeyChecking no' -i " + key_path,
+        'cmd': _ssh_command(config),
         'source': source.format(**fmt),
         'dest': dest.format(**fmt),
     }
@@ -637,17 +795,12 @@ def _run(config, instance_id, cmd, return_output=False):
     If `return_output` is False, then an int containing
     the exit status of the command.
     """
-    key_path = config[KEY_PATH_FIELD]
     ami_username = config[AMI_USER_NAME_FIELD]
-
-    sess = _get_boto_session(config)
-    resource = sess.resource('ec2')
-    inst = resource.Instance(instance_id)
-    ip = inst.public_ip_address
+    ip = _get_instance_ip(config, instance_id)
     values = {
         'user': ami_username,
         'ip': ip,
-        'ssh': "ssh -o 'StrictHostKeyChecking no' -i " + key_path,
+        'ssh': _ssh_command(config),
         'cmd': cmd,
     }
     cmd = "{ssh} {user}@{ip} \"{cmd}\"".format(**values)
@@ -658,6 +811,76 @@ def _run(config, instance_id, cmd, return_output=False):
         return subprocess.call(cmd, shell=True)
 
 
+def _get_instance_ip(config, instance_id):
+    """
+    Return the public ip of an ec2 instance. The ip is cached since it does
+    not change during the lifetime of the instance.
+    """
+    with _CACHE_LOCK:
+        ip = _INSTANCE_IPS.get(instance_id)
+    if ip is None:
+        sess = _get_boto_session(config)
+        resource = sess.resource('ec2')
+        ip = resource.Instance(instance_id).public_ip_address
+        # the ip is not known yet when the instance is starting
+        if ip is not None:
+            with _CACHE_LOCK:
+                _INSTANCE_IPS[instance_id] = ip
+    return ip
+
+
+def _get_ssh_control_dir():
+    """
+    Return the folder containing the sockets of the multiplexed ssh
+    connections, created the first time it is needed.
+    """
+    global _SSH_CONTROL_DIR
+    with _CACHE_LOCK:
+        if _SSH_CONTROL_DIR is None or not os.path.isdir(_SSH_CONTROL_DIR):
+            _SSH_CONTROL_DIR = tempfile.mkdtemp(prefix='ramp-aws-ssh-')
+            atexit.register(shutil.rmtree, _SSH_CONTROL_DIR,
+                            ignore_errors=True)
+        return _SSH_CONTROL_DIR
+
+
+def _ssh_command(config):
+    """
+    Return the ssh command used to connect to the ec2 instances.
+
+    Unless ``ssh_control_persist_secs`` is 0, the connection to an instance
+    is multiplexed: the first command opens a master connection which is
+    reused by the following commands and transfers, and closed after being
+    idle for ``ssh_control_persist_secs`` seconds.
+    """
+    cmd = "ssh -o 'StrictHostKeyChecking no' -i " + config[KEY_PATH_FIELD]
+    persist = int(config.get(SSH_CONTROL_PERSIST_SECS_FIELD,
+                             DEFAULT_SSH_CONTROL_PERSIST_SECS))
+    if persist > 0:
+        # %C is a hash of the connection parameters which keeps the path of
+        # the socket short enough
+        control_path = os.path.join(_get_ssh_control_dir(), '%C')
+        cmd += (" -o ControlMaster=auto -o ControlPath={} "
+                "-o ControlPersist={}".format(control_path, persist))
+    return cmd
+
+
+def _close_ssh_connection(config, instance_id):
+    """
+    Close the multiplexed ssh connection to an ec2 instance, if any, and
+    forget its ip.
+    """
+    with _CACHE_LOCK:
+        ip = _INSTANCE_IPS.pop(instance_id, None)
+        control_dir = _SSH_CONTROL_DIR
+    if ip is None or control_dir is None:
+        return
+    cmd = "{ssh} -O exit {user}@{ip}".format(
+        ssh=_ssh_command(config), user=config[AMI_USER_NAME_FIELD], ip=ip)
+    logger.debug(cmd)
+    subprocess.call(cmd, shell=True, stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL)
+
+
 def _is_ready(config, instance_id):
     """
     Return True if an instance is ready to be used
@@ -674,7 +897,8 @@ def _training_finished(config, instance_id, submission_name):
     """
     Return True if a submission has finished training
     """
-    return not _has_screen(config, instance_id, submission_name)
+    status = _get_training_status(config, instance_id)
+    return submission_name not in status['screens']
 
 
 def _training_successful(config, instance_id, submission_name,
@@ -684,23 +908,112 @@ def _training_successful(config, instance_id, submission_name,
     If the folder training_output exists and each fold directory contains
     .npz prediction files we consider that the training was successful.
     """
-    folder = _get_remote_training_output_folder(
-        config, instance_id, submission_name)
-
-    cmd = "ls -l {}|grep fold_|wc -l".format(folder)
-    nb_folds = int(_run(config, instance_id, cmd, return_output=True))
-
-    cmd = "find {}|egrep 'fold.*/y_pred_train.npz'|wc -l".format(folder)
-    nb_train_files = int(_run(config, instance_id, cmd, return_output=True))
-
-    cmd = "find {}|egrep 'fold.*/y_pred_test.npz'|wc -l".format(folder)
-    nb_test_files = int(_run(config, instance_id, cmd, return_output=True))
+    status = _get_training_status(config, instance_id)
+    nb_folds, nb_train_files, nb_test_files = status['outputs'].get(
+        submission_name, (0, 0, 0))
     if actual_nb_folds is not None:
         return nb_folds == nb_train_files == nb_test_files == actual_nb_folds
     else:
         return nb_folds == nb_train_files == nb_test_files != 0
 
 
+def _get_training_status(config, instance_id):
+    """
+    Return the training status of an ec2 instance, shared by all the workers
+    and cached for ``status_cache_ttl_secs`` seconds.
+
+    The state of all the ramp instances is retrieved with a single call to
+    the ec2 api. The screens and the training outputs of a running instance
+    are retrieved with a single remote command.
+
+    Returns
+    -------
+
+    dict with the keys:
+
+    - 'state': the state of the instance, e.g. 'running' or 'terminated'
+    - 'screens': the set of the names of the screens, i.e. of the
+      submissions being trained
+    - 'outputs': a dict mapping the name of each submission to its number of
+      folds, of training predictions and of testing predictions
+    """
+    ttl = float(config.get(STATUS_CACHE_TTL_SECS_FIELD,
+                           DEFAULT_STATUS_CACHE_TTL_SECS))
+    with _CACHE_LOCK:
+        cached = _TRAINING_STATUS.get(instance_id)
+    if cached is not None and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+    state = _get_instance_states(config, ttl).get(instance_id, 'running')
+    if state in ('pending', 'running'):
+        status = _fetch_training_status(config, instance_id)
+    else:
+        # nothing can run anymore on a stopped or terminated instance
+        logger.warning('The instance "{}" is {}'.format(instance_id, state))
+        status = {'screens': set(), 'outputs': {}}
+    status['state'] = state
+    with _CACHE_LOCK:
+        _TRAINING_STATUS[instance_id] = (time.monotonic(), status)
+    return status
+
+
+def _get_instance_states(config, ttl):
+    """
+    Return the state of all the ramp ec2 instances, cached for ``ttl``
+    seconds.
+    """
+    with _CACHE_LOCK:
+        checked_at, states = _INSTANCE_STATES
+    if checked_at is not None and time.monotonic() - checked_at < ttl:
+        return states
+    sess = _get_boto_session(config)
+    client = sess.client('ec2')
+    response = client.describe_instances(
+        Filters=[{'Name': 'tag:' + RAMP_AWS_BACKEND_TAG, 'Values': ['1']}]
+    )
+    states = {
+        inst['InstanceId']: inst['State']['Name']
+        for reservation in response['Reservations']
+        for inst in reservation['Instances']
+    }
+    with _CACHE_LOCK:
+        _INSTANCE_STATES[:] = [time.monotonic(), states]
+    return states
+
+
+def _fetch_training_status(config, instance_id):
+    """
+    Retrieve the screens and the training outputs of all the submissions of
+    an ec2 instance with a single remote command.
+    """
+    submissions_folder = os.path.join(config[REMOTE_RAMP_KIT_FOLDER_FIELD],
+                                      SUBMISSIONS_FOLDER)
+    separator = '--ramp-training-outputs--'
+    cmd = (
+        r"screen -ls | awk '{{print \$1}}' | cut -d. -f2; echo {sep}; "
+        r"find {folder} -mindepth 3 -maxdepth 4 -path '*/training_output/*' "
+        r"\( -name 'fold_*' -o -name 'y_pred_train.npz' "
+        r"-o -name 'y_pred_test.npz' \) 2>/dev/null; true"
+    ).format(sep=separator, folder=submissions_folder)
+    output = _run(config, instance_id, cmd, return_output=True)
+    if isinstance(output, bytes):
+        output = output.decode('utf-8')
+    screens, _, paths = output.partition(separator)
+    outputs = {}
+    for path in paths.split():
+        parts = os.path.relpath(path, submissions_folder).split(os.sep)
+        # <submission>/training_output/<fold>[/<predictions>]
+        counts = outputs.setdefault(parts[0], [0, 0, 0])
+        if len(parts) == 3:
+            counts[0] += 1
+        elif parts[3] == 'y_pred_train.npz':
+            counts[1] += 1
+        elif parts[3] == 'y_pred_test.npz':
+            counts[2] += 1
+    return {'screens': set(screens.split()),
+            'outputs': {name: tuple(counts)
+                        for name, counts in outputs.items()}}
+
+
 def _folder_exists(config, instance_id, folder):
     """
     Return True if a folder exists remotely in an instance
@@ -768,6 +1081,26 @@ def _delete_tag(config, instance_id, key):
 
 
 def _get_boto_session(config):
+    """
+    Return a boto session for the credentials of the configuration. The
+    sessions are cached per thread since they are not thread-safe.
+    """
+    key = (threading.get_ident(),) + tuple(
+        config.get(field) for field in (PROFILE_NAME_FIELD,
+                                        ACCESS_KEY_ID_FIELD,
+                                        SECRET_ACCESS_KEY_FIELD,
+                                        REGION_NAME_FIELD)
+    )
+    with _CACHE_LOCK:
+        sess = _BOTO_SESSIONS.get(key)
+    if sess is None:
+        sess = _create_boto_session(config)
+        with _CACHE_LOCK:
+            _BOTO_SESSIONS[key] = sess
+    return sess
+
+
+def _create_boto_session(config):
     if PROFILE_NAME_FIELD in config:
         sess = boto3.session.Session(
             profile_name=config[PROFILE_NAME_FIELD],
@@ -33,6 +33,7 @@ from .api import (
     _training_finished, _training_successful,
     _get_submission_max_ram, download_mprof_data, download_predictions,
     _get_log_content, _wait_until_train_finished)
+from .pool import get_instance_pool, pool_enabled
 
 
 logger = logging.getLogger('ramp_aws')
@@ -189,11 +190,12 @@ def launch_ec2_instance_and_train(config, submission_id):
     """
     This function does the following steps:
 
-    1) launch a new ec2 instance
+    1) launch a new ec2 instance, or take an idle one from the pool of
+       instances if ``pool_max_idle`` is set
     2) upload the submission into the ec2 the instance
     3) train the submission
     4) get back the predictions and the log
-    5) terminate the ec2 instance.
+    5) terminate the ec2 instance, or give it back to the pool.
 
     Parameters
     ----------
@@ -206,6 +208,24 @@ def launch_ec2_instance_and_train(config, submission_id):
 
     """
     conf_aws = config[AWS_CONFIG_SECTION]
+    if pool_enabled(conf_aws):
+        pool = get_instance_pool(conf_aws)
+        instance_id = pool.acquire()
+        if instance_id is None:
+            logger.error('Unable to get an instance to train the submission '
+                         '{}'.format(submission_id))
+            return
+        trained = False
+        try:
+            set_submission_state(config, submission_id, 'sent_to_training')
+            train_on_existing_ec2_instance(config, instance_id, submission_id)
+            trained = True
+        finally:
+            # an instance left in an unknown state is not reused
+            pool.release(instance_id,
+                         _get_submission_folder_name(submission_id),
+                         terminate=not trained)
+        return
     instance, = launch_ec2_instances(conf_aws, nb=1)
     set_submission_state(config, submission_id, 'sent_to_training')
     _wait_until_ready(config, instance.id)
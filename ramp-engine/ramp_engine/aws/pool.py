@@ -0,0 +1,307 @@
+"""
+Warm pool of ec2 instances reused between the trainings of the submissions,
+such that the submissions do not wait for an instance to boot.
+"""
+import logging
+import os
+import threading
+import time
+
+from . import api as aws
+
+logger = logging.getLogger('RAMP-AWS')
+
+# tag storing the pool and the state ('idle' or 'busy') of an instance such
+# that the idle instances can be reused after a restart of the dispatcher
+POOL_TAG = 'ramp_aws_pool'
+
+# pools shared by all the workers of the process: pool name -> pool
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _get_pool_name(config):
+    image = (config.get(aws.AMI_IMAGE_ID_FIELD) or
+             config.get(aws.AMI_IMAGE_NAME_FIELD))
+    return '{}/{}/{}'.format(config.get(aws.REGION_NAME_FIELD), image,
+                             config[aws.INSTANCE_TYPE_FIELD])
+
+
+def pool_enabled(config):
+    """Whether the instances are pooled, i.e. ``pool_max_idle`` is
+    positive."""
+    return int(config.get(aws.POOL_MAX_IDLE_FIELD, 0)) > 0
+
+
+def get_instance_pool(config):
+    """Get the instance pool shared by the workers with the same region, image
+    and instance type.
+
+    The idle instances tagged by a previous pool with the same configuration
+    are reused.
+
+    Parameters
+    ----------
+    config : dict
+        The configuration of the AWS worker.
+
+    Returns
+    -------
+    pool : :class:`InstancePool`
+        The instance pool.
+    """
+    name = _get_pool_name(config)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(name)
+        if pool is None:
+            pool = InstancePool(
+                config,
+                min_idle=int(config.get(aws.POOL_MIN_IDLE_FIELD, 0)),
+                max_idle=int(config.get(aws.POOL_MAX_IDLE_FIELD, 0)),
+                idle_ttl=float(config.get(aws.POOL_IDLE_TTL_SECS_FIELD,
+                                          aws.DEFAULT_POOL_IDLE_TTL_SECS)),
+            )
+            pool.adopt_idle_instances()
+            _POOLS[name] = pool
+    return pool
+
+
+def close_instance_pool(config):
+    """Terminate the idle instances of the pool used with a configuration.
+
+    The pools of the workers with other configurations are left untouched.
+
+    Parameters
+    ----------
+    config : dict
+        The configuration of the AWS worker.
+    """
+    with _POOLS_LOCK:
+        pool = _POOLS.pop(_get_pool_name(config), None)
+    if pool is not None:
+        pool.close()
+
+
+class InstancePool:
+    """Pool of ec2 instances reused between trainings.
+
+    The pool keeps between ``min_idle`` and ``max_idle`` idle instances
+    depending on the number of submissions awaiting a worker, see
+    :meth:`scale`. The idle instances above this target are terminated once
+    they have been idle for ``idle_ttl`` seconds. The instances are launched
+    in background threads.
+
+    Parameters
+    ----------
+    config : dict
+        The configuration of the AWS worker.
+    min_idle : int, default=0
+        The number of idle instances kept even when no submission is waiting.
+    max_idle : int, default=1
+        The maximum number of idle instances launched in advance.
+    idle_ttl : float, default=600
+        The time in seconds after which an idle instance which is not needed
+        anymore is terminated.
+    """
+
+    def __init__(self, config, min_idle=0, max_idle=1, idle_ttl=600):
+        self.config = config
+        self.name = _get_pool_name(config)
+        self.min_idle = min_idle
+        self.max_idle = max(max_idle, min_idle)
+        self.idle_ttl = idle_ttl
+        # idle instance id -> time at which it became idle
+        self._idle = {}
+        self._busy = set()
+        self._n_launching = 0
+        self._n_waiting = 0
+        self._cond = threading.Condition()
+
+    def metrics(self):
+        """Get the number of idle, busy and launching instances.
+
+        Returns
+        -------
+        metrics : dict
+            The ``'n_idle'``, ``'n_busy'`` and ``'n_launching'`` instances.
+        """
+        with self._cond:
+            return {'n_idle': len(self._idle), 'n_busy': len(self._busy),
+                    'n_launching': self._n_launching}
+
+    def _tag(self, instance_id, state):
+        try:
+            aws._add_or_update_tag(self.config, instance_id, POOL_TAG,
+                                   '{}:{}'.format(self.name, state))
+        except Exception as e:
+            logger.warning('Cannot tag the instance "{}": {}'
+                           .format(instance_id, e))
+
+    def adopt_idle_instances(self):
+        """Reuse the running instances tagged as idle in this pool."""
+        tag = '{}:idle'.format(self.name)
+        adopted = [
+            instance_id
+            for instance_id in aws.list_ec2_instance_ids(self.config)
+            if aws._get_tags(self.config, instance_id).get(POOL_TAG) == tag
+        ]
+        with self._cond:
+            for instance_id in adopted:
+                self._idle[instance_id] = time.monotonic()
+            self._cond.notify_all()
+        if adopted:
+            logger.info('Reuse the idle instances {}'.format(adopted))
+
+    def acquire(self, timeout=None):
+        """Get an instance to train a submission.
+
+        An idle instance is used if any. Otherwise, the instance currently
+        launched in the background is awaited or a new instance is launched.
+
+        Parameters
+        ----------
+        timeout : float or None, default=None
+            The maximum time in seconds to wait for an instance launched in
+            the background.
+
+        Returns
+        -------
+        instance_id : str or None
+            The id of the instance, or None if it could not be launched.
+        """
+        with self._cond:
+            self._n_waiting += 1
+            try:
+                self._cond.wait_for(
+                    lambda: self._idle or
+                    self._n_launching < self._n_waiting,
+                    timeout=timeout
+                )
+                if self._idle:
+                    # the most recently used instance such that the others
+                    # can expire
+                    instance_id = max(self._idle, key=self._idle.get)
+                    del self._idle[instance_id]
+                    self._busy.add(instance_id)
+                else:
+                    instance_id = None
+                    self._n_launching += 1
+            finally:
+                self._n_waiting -= 1
+        if instance_id is None:
+            instance_id = self._launch(1, idle=False)
+        if instance_id is not None:
+            self._tag(instance_id, 'busy')
+        return instance_id
+
+    def release(self, instance_id, submission_name=None, terminate=False):
+        """Give back an instance once the results of a training are
+        collected.
+
+        The remote folder of the submission is removed. If it fails, the
+        instance is terminated instead of being reused.
+
+        Parameters
+        ----------
+        instance_id : str
+            The id of the instance.
+        submission_name : str or None, default=None
+            The name of the submission trained on the instance.
+        terminate : bool, default=False
+            Whether to terminate the instance instead of reusing it, e.g.
+            when the training was interrupted by an error.
+        """
+        exit_status = 1 if terminate else 0
+        if submission_name is not None and not terminate:
+            folder = os.path.join(
+                self.config[aws.REMOTE_RAMP_KIT_FOLDER_FIELD],
+                aws.SUBMISSIONS_FOLDER, submission_name
+            )
+            exit_status = aws._run(self.config, instance_id,
+                                   'rm -rf {}'.format(folder))
+        if exit_status == 0:
+            # tag before the instance can be acquired again
+            self._tag(instance_id, 'idle')
+        with self._cond:
+            self._busy.discard(instance_id)
+            if exit_status == 0:
+                self._idle[instance_id] = time.monotonic()
+                self._cond.notify_all()
+        if exit_status != 0:
+            if not terminate:
+                logger.error('Cannot clean the instance "{}", it is '
+                             'terminated'.format(instance_id))
+            aws.terminate_ec2_instance(self.config, instance_id)
+
+    def scale(self, n_awaiting):
+        """Adapt the number of idle instances to the submissions awaiting a
+        worker.
+
+        The target number of idle instances is ``n_awaiting`` bounded by
+        ``min_idle`` and ``max_idle``. The missing instances are launched in
+        the background and the extra instances idle for more than
+        ``idle_ttl`` seconds are terminated.
+
+        Parameters
+        ----------
+        n_awaiting : int
+            The number of submissions awaiting a worker.
+        """
+        target = min(max(n_awaiting, self.min_idle), self.max_idle)
+        expired = []
+        with self._cond:
+            n_missing = target - len(self._idle) - self._n_launching
+            if n_missing > 0:
+                self._n_launching += n_missing
+            now = time.monotonic()
+            n_extra = len(self._idle) - target
+            for instance_id in sorted(self._idle, key=self._idle.get):
+                if (n_extra <= 0 or
+                        now - self._idle[instance_id] < self.idle_ttl):
+                    break
+                del self._idle[instance_id]
+                expired.append(instance_id)
+                n_extra -= 1
+        if n_missing > 0:
+            logger.info('Launching {} instance(s) in the pool "{}"'
+                        .format(n_missing, self.name))
+            threading.Thread(target=self._launch, args=(n_missing,),
+                             daemon=True).start()
+        for instance_id in expired:
+            logger.info('Terminate the idle instance "{}"'
+                        .format(instance_id))
+            aws.terminate_ec2_instance(self.config, instance_id)
+
+    def _launch(self, nb, idle=True):
+        """Launch ``nb`` instances already counted as launching. They are
+        added to the idle instances, or the id of the single instance is
+        returned if ``idle`` is False."""
+        try:
+            instances = aws.launch_ec2_instances(self.config, nb=nb)
+        except Exception as e:
+            logger.error('Cannot launch instances: {}'.format(e))
+            instances = None
+        instance_ids = ([instance.id for instance in instances]
+                        if instances else [])
+        if idle:
+            for instance_id in instance_ids:
+                self._tag(instance_id, 'idle')
+        with self._cond:
+            self._n_launching -= nb
+            if idle:
+                for instance_id in instance_ids:
+                    self._idle[instance_id] = time.monotonic()
+            else:
+                self._busy.update(instance_ids)
+            self._cond.notify_all()
+        if idle or not instance_ids:
+            return None
+        return instance_ids[0]
+
+    def close(self):
+        """Terminate the idle instances."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for instance_id in idle:
+            aws.terminate_ec2_instance(self.config, instance_id)
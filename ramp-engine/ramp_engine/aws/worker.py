@@ -2,6 +2,9 @@ import logging
 
 from ..base import BaseWorker, _get_traceback
 from . import api as aws
+from .pool import close_instance_pool
+from .pool import get_instance_pool
+from .pool import pool_enabled
 
 
 logger = logging.getLogger('RAMP-AWS')
@@ -60,7 +63,15 @@ class AWSWorker(BaseWorker):
 
         logger.info("Setting up AWSWorker for submission '{}'".format(
             self.submission))
-        self.instance, = aws.launch_ec2_instances(self.config)
+        if pool_enabled(self.config):
+            instance_id = get_instance_pool(self.config).acquire()
+            self.instance = (
+                None if instance_id is None else
+                aws._get_boto_session(self.config).resource('ec2')
+                                                  .Instance(instance_id)
+            )
+        else:
+            self.instance, = aws.launch_ec2_instances(self.config)
         if self.instance:
             logger.info("Instance launched for submission '{}'".format(
                 self.submission))
@@ -68,6 +79,7 @@ class AWSWorker(BaseWorker):
             logger.info("Unable to launch instance for submission "
                         "'{}'".format(self.submission))
             self.status = 'error'
+            return
         for _ in range(5):
             # try uploading the submission a few times, as this regularly fails
             exit_status = aws.upload_submission(
@@ -144,6 +156,24 @@ class AWSWorker(BaseWorker):
         return exit_status, error_msg
 
     def teardown(self):
-        """Terminate the Amazon instance"""
-        aws.terminate_ec2_instance(self.config, self.instance.id)
+        """Terminate the Amazon instance, or give it back to the pool of
+        instances if ``pool_max_idle`` is set."""
+        if pool_enabled(self.config):
+            get_instance_pool(self.config).release(self.instance.id,
+                                                   self.submission)
+        else:
+            aws.terminate_ec2_instance(self.config, self.instance.id)
         super().teardown()
+
+    @classmethod
+    def scale_resources(cls, config, n_awaiting):
+        """Adapt the pool of idle instances to the number of submissions
+        awaiting a worker if ``pool_max_idle`` is set."""
+        if pool_enabled(config):
+            get_instance_pool(config).scale(n_awaiting)
+
+    @classmethod
+    def release_resources(cls, config):
+        """Terminate the idle instances of the pool used with ``config``."""
+        if pool_enabled(config):
+            close_instance_pool(config)
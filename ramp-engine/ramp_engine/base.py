@@ -39,6 +39,10 @@ class BaseWorker(metaclass=ABCMeta):
             * 'collected': the results of the training have been collected.
             * 'killed'
     """
+    # whether the worker accepts a ``fold`` parameter to train a single CV
+    # fold or to bag the trained folds ('bag')
+    supports_fold_tasks = False
+
     def __init__(self, config, submission):
         self.config = config
         self.submission = submission
@@ -61,6 +65,33 @@ class BaseWorker(metaclass=ABCMeta):
         """Clean up (i.e., removing path, etc.) before killing the worker."""
         self.status = 'killed'
 
+    @classmethod
+    def scale_resources(cls, config, n_awaiting):
+        """Adapt the resources shared by the workers (e.g. a pool of
+        machines) to the number of submissions awaiting a worker. Nothing is
+        done by default.
+
+        Parameters
+        ----------
+        config : dict
+            Configuration of the workers.
+        n_awaiting : int
+            The number of submissions awaiting a worker.
+        """
+        pass
+
+    @classmethod
+    def release_resources(cls, config):
+        """Release the resources shared by the workers once the dispatcher
+        stops. Nothing is done by default.
+
+        Parameters
+        ----------
+        config : dict
+            Configuration of the workers.
+        """
+        pass
+
     @abstractmethod
     def _is_submission_finished(self):
         """Indicate the status of submission"""
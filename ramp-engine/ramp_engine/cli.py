@@ -25,8 +25,19 @@ def main():
               'information.')
 @click.option("--events-dir", show_default=True,
               help='Directory where the event config files are located.')
+@click.option("--multi-event", is_flag=True,
+              help='Process all the open events in a single process sharing '
+              'a pool of workers instead of starting a dispatcher per event.')
+@click.option("--n-workers", default=-1, show_default=True,
+              help='In multi-event mode, the maximum number of workers '
+              'running simultaneously across all the events. A negative '
+              'value is relative to the number of CPUs.')
+@click.option("--event-refresh-interval", default=60, show_default=True,
+              help='In multi-event mode, the time in seconds between two '
+              'checks of the open events.')
 @click.option('-v', '--verbose', count=True)
-def daemon(config, events_dir, verbose):
+def daemon(config, events_dir, multi_event, n_workers, event_refresh_interval,
+           verbose):
     """Launch the RAMP dispatcher.
 
     The RAMP dispatcher is in charge of starting RAMP workers, collecting
@@ -42,7 +53,9 @@ def daemon(config, events_dir, verbose):
             level=level, datefmt='%Y:%m:%d %H:%M:%S'
         )
 
-    daemon = Daemon(config=config, events_dir=events_dir)
+    daemon = Daemon(config=config, events_dir=events_dir,
+                    multi_event=multi_event, n_workers=n_workers,
+                    event_refresh_interval=event_refresh_interval)
     daemon.launch()
 
 
@@ -81,11 +94,19 @@ def dispatcher(config, event_config, verbose):
     hunger_policy = dispatcher_config.get('hunger_policy', 'sleep')
     time_between_collection = dispatcher_config.get(
         'time_between_collection', 1)
+    event_driven = dispatcher_config.get('event_driven', False)
+    poll_timeout = dispatcher_config.get('poll_timeout', 60)
+    scheduling_policy = dispatcher_config.get('scheduling_policy', 'fifo')
+    deadline_window = dispatcher_config.get('deadline_window', 3600)
+    fold_parallel = dispatcher_config.get('fold_parallel', False)
 
     disp = Dispatcher(
         config=config, event_config=event_config, worker=worker_type,
         n_workers=n_workers, n_threads=n_threads, hunger_policy=hunger_policy,
-        time_between_collection=time_between_collection
+        time_between_collection=time_between_collection,
+        event_driven=event_driven, poll_timeout=poll_timeout,
+        scheduling_policy=scheduling_policy,
+        deadline_window=deadline_window, fold_parallel=fold_parallel
     )
     disp.launch()
 
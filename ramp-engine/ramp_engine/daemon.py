@@ -10,6 +10,8 @@ from ramp_database.utils import session_scope
 
 from ramp_utils import read_config
 
+from .multi_dispatcher import MultiEventDispatcher
+
 logger = logging.getLogger("RAMP-DAEMON")
 
 
@@ -25,9 +27,21 @@ class Daemon:
         The path in which all events configuration files will be located. We
         expect a pattern as `event_dir/<a ramp event>/config.yml`. The config
         file will be used to start the daemon.
+    multi_event : bool, default=False
+        Whether to process all the open events within the daemon process
+        using a :class:`~ramp_engine.multi_dispatcher.MultiEventDispatcher`
+        instead of starting one dispatcher subprocess per open event.
+    n_workers : int, default=-1
+        In multi-event mode, the maximum number of workers running
+        simultaneously across all the events. A negative value is relative to
+        the number of CPUs.
+    event_refresh_interval : int, default=60
+        In multi-event mode, the amount of time in seconds between two checks
+        of the open events.
     """
 
-    def __init__(self, config, events_dir):
+    def __init__(self, config, events_dir, multi_event=False, n_workers=-1,
+                 event_refresh_interval=60):
         self.config = config
         self._database_config = read_config(
             config, filter_section="sqlalchemy"
@@ -38,6 +52,13 @@ class Daemon:
                 "The path {} is not existing.".format(events_dir)
             )
         self._proc = deque()
+        self._multi_dispatcher = None
+        if multi_event:
+            self._multi_dispatcher = MultiEventDispatcher(
+                config=config, events_dir=events_dir, n_workers=n_workers,
+                hunger_policy='sleep',
+                event_refresh_interval=event_refresh_interval
+            )
         signal.signal(signal.SIGINT, self.kill_dispatcher)
         signal.signal(signal.SIGTERM, self.kill_dispatcher)
         self._poison_pill = False
@@ -71,6 +92,8 @@ class Daemon:
             logger.info(
                 "Kill dispatcher for the event {}".format(event)
             )
+        if self._multi_dispatcher is not None:
+            self._multi_dispatcher.kill()
         self._poison_pill = True
 
     def launch(self):
@@ -78,6 +101,9 @@ class Daemon:
 
         The daemon will be killed using a keyboard interuption.
         """
+        if self._multi_dispatcher is not None:
+            self._multi_dispatcher.launch()
+            return
         with session_scope(self._database_config) as session:
             self.launch_dispatchers(session)
             while not self._poison_pill:
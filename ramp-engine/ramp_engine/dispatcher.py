@@ -2,23 +2,25 @@ import logging
 import multiprocessing
 import numbers
 import os
+import shutil
 import time
 
+from collections import deque
 from queue import Queue
 from queue import LifoQueue
 
+from ramp_database.tools.event import get_event
+from ramp_database.tools.submission import get_event_nb_folds
 from ramp_database.tools.submission import get_submissions
 from ramp_database.tools.submission import get_submission_by_id
 from ramp_database.tools.submission import get_submission_state
+from ramp_database.tools.submission import get_team_train_times
+from ramp_database.tools.submission import ingest_training_outputs
 
-from ramp_database.tools.submission import set_bagged_scores
 # from ramp_database.tools.submission import set_predictions
-from ramp_database.tools.submission import set_time
-from ramp_database.tools.submission import set_scores
 from ramp_database.tools.submission import set_submission_error_msg
 from ramp_database.tools.submission import set_submission_state
 
-from ramp_database.tools.leaderboard import update_all_user_leaderboards
 from ramp_database.tools.leaderboard import update_leaderboards
 from ramp_database.tools.leaderboard import update_user_leaderboards
 
@@ -29,6 +31,10 @@ from ramp_utils import generate_worker_config
 from ramp_utils import read_config
 
 from .local import CondaEnvWorker
+from .notification import ChildProcessNotifier
+from .notification import make_submission_notifier
+from .notification import wait_for_notification
+from .scheduler import SubmissionQueue
 
 logger = logging.getLogger('RAMP-DISPATCHER')
 
@@ -86,21 +92,76 @@ class Dispatcher:
            submissions, as the check for collection will be done through SSH.
            Thus, if the time between checks is too small, the repetitive
            SSH requests may be potentially blocked by the cloud provider.
+    event_driven : bool, default=False
+        Whether to block between two iterations until a new submission is
+        notified or a worker finished instead of continuously polling the
+        database. With PostgreSQL, new submissions are notified through
+        ``LISTEN/NOTIFY``. With other databases, only the finished workers
+        are notified and the database is checked every ``poll_timeout``.
+    poll_timeout : int, default=60
+        In event-driven mode, the maximum amount of time in seconds between two
+        checks of the database. It is a safety net in case a notification is
+        lost.
+    scheduling_policy : {'fifo', 'fair_share', 'sjf', 'deadline'}, \
+            default='fifo'
+        The order in which the awaiting submissions are launched:
+
+        * if 'fifo': in their order of arrival;
+        * if 'fair_share': the team with the fewest running submissions is
+          served first;
+        * if 'sjf': the submissions of the teams with the shortest mean
+          training time are served first;
+        * if 'deadline': as 'fair_share' but, within ``deadline_window``
+          seconds of the closing of the event, the submissions expected to
+          finish before the closing are served first, shortest first.
+    deadline_window : int, default=3600
+        The time in seconds before the closing of the event from which the
+        'deadline' policy takes the closing into account.
+    fold_parallel : bool, default=False
+        Whether to split each submission into one task per CV fold such that
+        the folds are trained concurrently within the ``n_workers`` budget.
+        Once all folds are trained, a last task bags them. The worker should
+        support fold tasks (e.g. :class:`~ramp_engine.local.CondaEnvWorker`).
     """
     def __init__(self, config, event_config, worker=None, n_workers=1,
                  n_threads=None, hunger_policy=None,
-                 time_between_collection=1):
+                 time_between_collection=1, event_driven=False,
+                 poll_timeout=60, scheduling_policy='fifo',
+                 deadline_window=3600, fold_parallel=False):
         self.worker = CondaEnvWorker if worker is None else worker
         self.n_workers = (max(multiprocessing.cpu_count() + 1 + n_workers, 1)
                           if n_workers < 0 else n_workers)
         self.hunger_policy = hunger_policy
         self.time_between_collection = time_between_collection
+        self.event_driven = event_driven
+        self.poll_timeout = poll_timeout
+        self.fold_parallel = fold_parallel
+        if fold_parallel and not getattr(self.worker, 'supports_fold_tasks',
+                                         False):
+            raise ValueError(
+                "The worker {} cannot train the CV folds of a submission "
+                "separately. Set 'fold_parallel' to False."
+                .format(self.worker.__name__)
+            )
+        # progress of the submissions trained fold by fold: submission id ->
+        # dict with the number of unfinished tasks and the first error
+        self._fold_tasks = {}
+        # flags driving the event-driven mode
+        self._fetch_needed = True
+        self._last_fetch = None
+        self._force_collection = False
         # init the poison pill to kill the dispatcher
         self._poison_pill = False
         # create the different dispatcher queues
-        self._awaiting_worker_queue = Queue()
+        policy_params = ({'deadline_window': deadline_window}
+                         if scheduling_policy == 'deadline' else None)
+        self._awaiting_worker_queue = SubmissionQueue(
+            scheduling_policy, policy_params=policy_params
+        )
         self._processing_worker_queue = LifoQueue(maxsize=self.n_workers)
         self._processed_submission_queue = Queue()
+        # time spent to collect the results of the last 100 workers
+        self._collection_times = deque(maxlen=100)
         # split the different configuration required
         if (isinstance(config, str) and
                 isinstance(event_config, str)):
@@ -124,53 +185,145 @@ class Dispatcher:
 
     def fetch_from_db(self, session):
         """Fetch the submission from the database and create the workers."""
+        self._fetch_needed = False
+        self._last_fetch = time.time()
         submissions = get_submissions(session,
                                       self._ramp_config['event_name'],
                                       state='new')
         if not submissions:
             return
+        event_name = self._ramp_config['event_name']
+        self._awaiting_worker_queue.closing_timestamp = \
+            get_event(session, event_name).closing_timestamp
+        train_times = {}
+        if self._awaiting_worker_queue.policy.uses_expected_time:
+            train_times = get_team_train_times(session, event_name)
+        if self.fold_parallel:
+            n_folds = get_event_nb_folds(session, event_name)
         for submission_id, submission_name, _ in submissions:
             # do not train the sandbox submission
             submission = get_submission_by_id(session, submission_id)
             if not submission.is_not_sandbox:
                 continue
-            # create the worker
-            worker = self.worker(self._worker_config, submission_name)
+            team_name = submission.team.name
+            # create the workers: a single one for the whole submission or
+            # one per CV fold
+            if self.fold_parallel:
+                workers = [self.worker(self._worker_config, submission_name,
+                                       fold=fold_i)
+                           for fold_i in range(n_folds)]
+                self._fold_tasks[submission_id] = {
+                    'n_unfinished': n_folds, 'bagging': False,
+                    'returncode': 0, 'error_msg': '', 'state': None
+                }
+            else:
+                workers = [self.worker(self._worker_config, submission_name)]
             set_submission_state(session, submission_id, 'sent_to_training')
             update_user_leaderboards(
-                session, self._ramp_config['event_name'],
-                submission .team.name, new_only=True,
+                session, event_name, team_name, new_only=True,
             )
-            self._awaiting_worker_queue.put_nowait((worker, (submission_id,
-                                                             submission_name)))
+            for worker in workers:
+                self._awaiting_worker_queue.put_nowait(
+                    (worker, (submission_id, submission_name)), team_name,
+                    expected_time=train_times.get(team_name)
+                )
             logger.info('Submission {} added to the queue of submission to be '
                         'processed'.format(submission_name))
+        logger.info('Queue metrics: {}'.format(self.queue_metrics()))
+
+    def queue_metrics(self):
+        """Metrics about the queue of awaiting submissions.
+
+        Returns
+        -------
+        metrics : dict
+            The queue length, the number of running submissions, and the
+            waiting times in seconds. See
+            :meth:`ramp_engine.scheduler.SubmissionQueue.metrics`.
+        """
+        return self._awaiting_worker_queue.metrics()
+
+    def worker_metrics(self):
+        """Metrics about the workers.
+
+        Returns
+        -------
+        metrics : dict
+            The dictionary contains:
+
+            * ``'n_processing'``: the number of workers processing a
+              submission;
+            * ``'mean_collection_time'`` and ``'max_collection_time'``: the
+              time in seconds spent to collect the results of the last 100
+              workers.
+        """
+        collection_times = list(self._collection_times)
+        return {
+            'n_processing': self._processing_worker_queue.qsize(),
+            'mean_collection_time': (
+                sum(collection_times) / len(collection_times)
+                if collection_times else 0.
+            ),
+            'max_collection_time': max(collection_times, default=0.),
+        }
 
     def launch_workers(self, session):
         """Launch the awaiting workers if possible."""
-        while (not self._processing_worker_queue.full() and
-               not self._awaiting_worker_queue.empty()):
-            worker, (submission_id, submission_name) = \
-                self._awaiting_worker_queue.get()
-            logger.info('Starting worker: {}'.format(worker))
-            worker.setup()
-            if worker.status == 'error':
-                set_submission_state(session, submission_id, 'checking_error')
-                continue
+        self.worker.scale_resources(self._worker_config,
+                                    self._awaiting_worker_queue.qsize())
+        while self.can_launch_worker():
+            self.launch_next_worker(session)
+
+    def can_launch_worker(self):
+        """Whether a worker is awaiting and a processing slot is free."""
+        return (not self._processing_worker_queue.full() and
+                not self._awaiting_worker_queue.empty())
+
+    def launch_next_worker(self, session):
+        """Launch the next awaiting worker.
+
+        Returns
+        -------
+        launched : bool
+            Whether the worker has been launched. It is False if the worker
+            failed to start.
+        """
+        worker, (submission_id, submission_name) = \
+            self._awaiting_worker_queue.get()
+        submission = get_submission_by_id(session, submission_id)
+        fold_task = self._fold_tasks.get(submission_id)
+        if fold_task is not None and fold_task['returncode']:
+            # another fold of the submission failed: do not train this one
+            self._awaiting_worker_queue.task_done(submission.team.name)
+            self._fold_task_done(session, submission_id, submission_name)
+            return False
+        logger.info('Starting worker: {}'.format(worker))
+        worker.setup()
+        if worker.status != 'error':
             worker.launch_submission()
-            if worker.status == 'error':
-                set_submission_state(session, submission_id, 'checking_error')
-                continue
+        if worker.status == 'error':
+            self._awaiting_worker_queue.task_done(submission.team.name)
+            if fold_task is not None:
+                self._fold_task_done(
+                    session, submission_id, submission_name, returncode=1,
+                    error_msg='The worker {} failed to start.'.format(worker),
+                    state='checking_error'
+                )
+            else:
+                set_submission_state(session, submission_id,
+                                     'checking_error')
+            return False
+        if submission.state != 'training':
             set_submission_state(session, submission_id, 'training')
-            submission = get_submission_by_id(session, submission_id)
             update_user_leaderboards(
                 session, self._ramp_config['event_name'],
                 submission.team.name, new_only=True,
             )
-            self._processing_worker_queue.put_nowait(
-                (worker, (submission_id, submission_name)))
-            logger.info('Store the worker {} into the processing queue'
-                        .format(worker))
+        self._processing_worker_queue.put_nowait(
+            (worker, (submission_id, submission_name)))
+        logger.info('Store the worker {} into the processing queue'
+                    .format(worker))
+        return True
 
     def collect_result(self, session):
         """Collect result from processed workers."""
@@ -180,7 +333,7 @@ class Dispatcher:
                   for _ in range(self._processing_worker_queue.qsize())]
             )
         except ValueError:
-            if self.hunger_policy == 'sleep':
+            if self.hunger_policy == 'sleep' and not self.event_driven:
                 time.sleep(5)
             elif self.hunger_policy == 'exit':
                 self._poison_pill = True
@@ -189,7 +342,8 @@ class Dispatcher:
         for worker, (submission_id, submission_name) in zip(workers,
                                                             submissions):
             dt = worker.time_since_last_status_check()
-            if dt is not None and dt < self.time_between_collection:
+            if (not self._force_collection and dt is not None and
+                    dt < self.time_between_collection):
                 self._processing_worker_queue.put_nowait(
                     (worker, (submission_id, submission_name)))
                 time.sleep(0)
@@ -200,7 +354,12 @@ class Dispatcher:
                 time.sleep(0)
             else:
                 logger.info(f'Collecting results from worker {worker}')
+                start = time.time()
                 returncode, stderr = worker.collect_results()
+                collection_time = time.time() - start
+                self._collection_times.append(collection_time)
+                logger.info('Collected results from worker {} in {:.2f}s'
+                            .format(worker, collection_time))
                 if returncode:
                     if returncode == 124:
                         logger.info(
@@ -212,46 +371,138 @@ class Dispatcher:
                             f'Worker {worker} killed due to an error '
                             'during training'
                         )
-                    submission_status = 'training_error'
-                else:
-                    submission_status = 'tested'
-
-                set_submission_state(
-                    session, submission_id, submission_status
+                self._awaiting_worker_queue.task_done(
+                    get_submission_by_id(session, submission_id).team.name
                 )
-                set_submission_error_msg(session, submission_id, stderr)
-                self._processed_submission_queue.put_nowait(
-                    (submission_id, submission_name))
                 worker.teardown()
+                if submission_id in self._fold_tasks:
+                    self._fold_task_done(session, submission_id,
+                                         submission_name, returncode, stderr)
+                else:
+                    self._set_training_result(session, submission_id,
+                                              submission_name, returncode,
+                                              stderr)
+        self._force_collection = False
+
+    def _set_training_result(self, session, submission_id, submission_name,
+                             returncode, error_msg, state=None):
+        if state is None:
+            state = 'training_error' if returncode else 'tested'
+        set_submission_state(session, submission_id, state)
+        set_submission_error_msg(session, submission_id, error_msg)
+        self._processed_submission_queue.put_nowait(
+            (submission_id, submission_name))
+
+    def _fold_task_done(self, session, submission_id, submission_name,
+                        returncode=0, error_msg='', state=None):
+        """Account a finished task of a submission trained fold by fold.
+
+        Once all folds are trained, the bagging task is queued. Once it is
+        done or once all tasks are finished after an error, the result of the
+        submission is stored.
+        """
+        fold_task = self._fold_tasks[submission_id]
+        fold_task['n_unfinished'] -= 1
+        if returncode and not fold_task['returncode']:
+            fold_task['returncode'] = returncode
+            fold_task['error_msg'] = error_msg
+            fold_task['state'] = state
+        if fold_task['n_unfinished'] > 0:
+            return
+        if not fold_task['returncode'] and not fold_task['bagging']:
+            fold_task['n_unfinished'] = 1
+            fold_task['bagging'] = True
+            worker = self.worker(self._worker_config, submission_name,
+                                 fold='bag')
+            self._awaiting_worker_queue.put_nowait(
+                (worker, (submission_id, submission_name)),
+                get_submission_by_id(session, submission_id).team.name,
+                expected_time=0, front=True
+            )
+            logger.info('All folds of the submission {} are trained. Queue '
+                        'the bagging.'.format(submission_name))
+            return
+        del self._fold_tasks[submission_id]
+        if fold_task['returncode']:
+            shutil.rmtree(
+                os.path.join(self._worker_config['submissions_dir'],
+                             submission_name, 'training_output'),
+                ignore_errors=True
+            )
+        self._set_training_result(
+            session, submission_id, submission_name, fold_task['returncode'],
+            fold_task['error_msg'], fold_task['state']
+        )
 
     def update_database_results(self, session):
-        """Update the database with the results of ramp_test_submission."""
-        make_update_leaderboard = False
+        """Update the database with the results of ramp_test_submission.
+
+        All the submissions processed since the last call are ingested
+        together in a single transaction. Only the leaderboards of the teams
+        owning these submissions are updated.
+        """
+        training_outputs = {}
+        team_names = set()
         while not self._processed_submission_queue.empty():
-            make_update_leaderboard = True
             submission_id, submission_name = \
                 self._processed_submission_queue.get_nowait()
-            if 'error' in get_submission_state(session, submission_id):
+            submission = get_submission_by_id(session, submission_id)
+            team_names.add(submission.team.name)
+            if 'error' in submission.state:
                 continue
             logger.info('Write info in database for submission {}'
                         .format(submission_name))
-            path_predictions = os.path.join(
-                self._worker_config['predictions_dir'], submission_name
-            )
             # NOTE: In the past we were adding the predictions into the
             # database. Since they require too much space, we stop to store
             # them in the database and instead, keep it onto the disk.
             # set_predictions(session, submission_id, path_predictions)
-            set_time(session, submission_id, path_predictions)
-            set_scores(session, submission_id, path_predictions)
-            set_bagged_scores(session, submission_id, path_predictions)
-            set_submission_state(session, submission_id, 'scored')
+            training_outputs[submission_id] = os.path.join(
+                self._worker_config['predictions_dir'], submission_name
+            )
+        if training_outputs:
+            ingest_training_outputs(session, training_outputs)
 
-        if make_update_leaderboard:
+        if team_names:
             logger.info('Update all leaderboards')
             update_leaderboards(session, self._ramp_config['event_name'])
-            update_all_user_leaderboards(session,
-                                         self._ramp_config['event_name'])
+            # the leaderboards of a team only depend on its own submissions
+            for team_name in sorted(team_names):
+                update_user_leaderboards(
+                    session, self._ramp_config['event_name'], team_name
+                )
+
+    def wait_for_event(self, notifiers):
+        """Block until a submission is notified or a worker finished.
+
+        Parameters
+        ----------
+        notifiers : dict of {'submission', 'worker'} -> BaseNotifier
+            The notifiers announcing new submissions and finished workers.
+        """
+        if (not self._awaiting_worker_queue.empty() and
+                not self._processing_worker_queue.full()):
+            return
+        time_to_poll = max(
+            self.poll_timeout - (time.time() - self._last_fetch), 0
+        )
+        if self._processing_worker_queue.empty():
+            timeout = time_to_poll
+        else:
+            # the workers not spawning a child process (e.g. on the cloud)
+            # still need to be polled
+            timeout = min(self.time_between_collection, time_to_poll)
+        notified = wait_for_notification(
+            [n for n in notifiers.values() if n is not None], timeout
+        )
+        for notifier in notified:
+            payloads = notifier.consume()
+            if notifier is notifiers['worker']:
+                self._force_collection = True
+            elif self._ramp_config['event_name'] in payloads:
+                logger.info('Notified of a new submission')
+                self._fetch_needed = True
+        if time.time() - self._last_fetch >= self.poll_timeout:
+            self._fetch_needed = True
 
     @staticmethod
     def _reset_submission_after_failure(session, even_name):
@@ -272,13 +523,26 @@ class Dispatcher:
             self._reset_submission_after_failure(
                 session, self._ramp_config['event_name']
             )
+            notifiers = {}
+            if self.event_driven:
+                notifiers['submission'] = make_submission_notifier(
+                    self._database_config
+                )
+                notifiers['worker'] = ChildProcessNotifier()
             try:
                 while not self._poison_pill:
-                    self.fetch_from_db(session)
+                    if not self.event_driven or self._fetch_needed:
+                        self.fetch_from_db(session)
                     self.launch_workers(session)
                     self.collect_result(session)
                     self.update_database_results(session)
+                    if self.event_driven and not self._poison_pill:
+                        self.wait_for_event(notifiers)
             finally:
+                for notifier in notifiers.values():
+                    if notifier is not None:
+                        notifier.close()
+                self.worker.release_resources(self._worker_config)
                 # reset the submissions to 'new' in case of error or unfinished
                 # training
                 self._reset_submission_after_failure(
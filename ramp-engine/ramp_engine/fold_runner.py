@@ -0,0 +1,100 @@
+"""Train a single CV fold of a submission or bag the trained folds.
+
+This script is executed with the Python interpreter of the environment of the
+worker and therefore only depends on ``ramp-workflow``. The outputs are
+written as ``ramp-test --save-output`` does: the fold ``i`` is saved in
+``<submission>/training_output/fold_i`` and the bagging step reads the saved
+folds and writes the bagged scores in ``<submission>/training_output``::
+
+    python fold_runner.py train --fold 0 --submission starting_kit ...
+    python fold_runner.py bag --submission starting_kit ...
+"""
+import argparse
+import os
+import warnings
+
+from rampwf.utils.io import load_y_pred
+from rampwf.utils.submission import bag_submissions
+from rampwf.utils.submission import run_submission_on_cv_fold
+from rampwf.utils.testing import assert_cv
+from rampwf.utils.testing import assert_data
+from rampwf.utils.testing import assert_read_problem
+
+
+def _read_problem(args):
+    problem = assert_read_problem(args.ramp_kit_dir)
+    X_train, y_train, X_test, y_test = assert_data(args.ramp_kit_dir,
+                                                   args.ramp_data_dir)
+    cv = assert_cv(args.ramp_kit_dir, args.ramp_data_dir)
+    training_output_path = os.path.join(
+        args.ramp_submission_dir, args.submission, 'training_output'
+    )
+    return problem, X_train, y_train, X_test, y_test, cv, training_output_path
+
+
+def train_fold(args):
+    """Train, validate, and test the submission on a single CV fold."""
+    problem, X_train, y_train, X_test, y_test, cv, training_output_path = \
+        _read_problem(args)
+    fold_output_path = os.path.join(training_output_path,
+                                    'fold_{}'.format(args.fold))
+    os.makedirs(fold_output_path, exist_ok=True)
+    _, _, df_scores = run_submission_on_cv_fold(
+        problem, os.path.join(args.ramp_submission_dir, args.submission),
+        cv[args.fold], X_train, y_train, X_test, y_test, save_output=True,
+        fold_output_path=fold_output_path, ramp_data_dir=args.ramp_data_dir
+    )
+    df_scores.to_csv(os.path.join(fold_output_path, 'scores.csv'))
+    print(df_scores)
+
+
+def bag_folds(args):
+    """Bag the predictions of the trained folds."""
+    problem, X_train, y_train, X_test, y_test, cv, training_output_path = \
+        _read_problem(args)
+    predictions_valid_list, predictions_test_list = [], []
+    for fold_i, (_, valid_is) in enumerate(cv):
+        fold_output_path = os.path.join(training_output_path,
+                                        'fold_{}'.format(fold_i))
+        y_pred_train = load_y_pred(problem, data_path=args.ramp_data_dir,
+                                   input_path=fold_output_path,
+                                   suffix='train')
+        predictions_valid_list.append(
+            problem.Predictions(y_pred=y_pred_train, fold_is=valid_is)
+        )
+        if y_test is not None:
+            y_pred_test = load_y_pred(problem, data_path=args.ramp_data_dir,
+                                      input_path=fold_output_path,
+                                      suffix='test')
+            predictions_test_list.append(
+                problem.Predictions(y_pred=y_pred_test)
+            )
+    bag_submissions(
+        problem, cv, y_train, y_test, predictions_valid_list,
+        predictions_test_list, training_output_path,
+        ramp_data_dir=args.ramp_data_dir, score_type_index=None,
+        save_output=True
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('step', choices=['train', 'bag'])
+    parser.add_argument('--fold', type=int, default=None)
+    parser.add_argument('--submission', default='starting_kit')
+    parser.add_argument('--ramp-kit-dir', default='.')
+    parser.add_argument('--ramp-data-dir', default='.')
+    parser.add_argument('--ramp-submission-dir', default='submissions')
+    args = parser.parse_args(argv)
+    if args.step == 'train' and args.fold is None:
+        parser.error('--fold is required to train a fold')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if args.step == 'train':
+            train_fold(args)
+        else:
+            bag_folds(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import logging
 import os
@@ -5,10 +6,173 @@ import shutil
 import subprocess
 from datetime import datetime
 
+from ramp_utils.training_output import save_training_output
+from ramp_utils.training_output import TRAINING_OUTPUT_FILENAME
+
 from .base import BaseWorker, _get_traceback
 
 logger = logging.getLogger('RAMP-WORKER')
 
+# script training a single fold or bagging the folds of a submission
+_FOLD_RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'fold_runner.py')
+
+# cache of the resolved conda environments shared by all the workers of the
+# process: env name -> (bin path, env path, mtime of the env path)
+_CONDA_ENVS_CACHE = {}
+
+
+def _get_conda_envs_from_conda():
+    """Get the base and the other conda environments by running conda."""
+    proc = subprocess.Popen(
+        ["conda", "info", "--envs", "--json"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT
+    )
+    stdout, _ = proc.communicate()
+    conda_info = json.loads(stdout)
+    return conda_info['envs'][0], conda_info['envs'][1:]
+
+
+def _get_conda_envs_from_files():
+    """Get the base and the other conda environments without running conda.
+
+    The base environment is found using the ``CONDA_EXE`` or
+    ``CONDA_PREFIX`` environment variables while the other environments are
+    listed in ``~/.conda/environments.txt`` or in the ``envs`` folder of the
+    base environment.
+    """
+    base = None
+    if os.environ.get('CONDA_EXE'):
+        base = os.path.dirname(os.path.dirname(os.environ['CONDA_EXE']))
+    elif os.environ.get('CONDA_PREFIX'):
+        prefix = os.path.normpath(os.environ['CONDA_PREFIX'])
+        parent = os.path.dirname(prefix)
+        base = (os.path.dirname(parent)
+                if os.path.basename(parent) == 'envs' else prefix)
+    if base is not None and not os.path.isdir(base):
+        base = None
+
+    envs = []
+    environments_txt = os.path.join(
+        os.path.expanduser('~'), '.conda', 'environments.txt'
+    )
+    if os.path.isfile(environments_txt):
+        with open(environments_txt) as f:
+            envs += [line.strip() for line in f if line.strip()]
+    if base is not None and os.path.isdir(os.path.join(base, 'envs')):
+        envs += [os.path.join(base, 'envs', env)
+                 for env in sorted(os.listdir(os.path.join(base, 'envs')))]
+    envs = [os.path.normpath(env) for env in envs]
+    envs = [env for env in dict.fromkeys(envs)
+            if os.path.isdir(env) and env != base]
+    return base, envs
+
+
+def _find_conda_env(env_name, base, envs):
+    if env_name == 'base':
+        return base
+    for env in envs:
+        if env_name == os.path.split(env)[-1]:
+            return env
+
+
+def _get_conda_env_bin_path(env_name):
+    """Get the path to the ``bin`` folder of a conda environment.
+
+    The path is cached and invalidated when the modification time of the
+    environment folder changes. Conda is only run when the environment cannot
+    be found from the files written by conda.
+
+    Parameters
+    ----------
+    env_name : str
+        The name of the conda environment.
+
+    Returns
+    -------
+    bin_path : str
+        The path to the ``bin`` folder of the environment.
+    """
+    if env_name in _CONDA_ENVS_CACHE:
+        bin_path, env_path, mtime = _CONDA_ENVS_CACHE[env_name]
+        try:
+            if os.stat(env_path).st_mtime_ns == mtime:
+                return bin_path
+        except OSError:
+            pass
+        del _CONDA_ENVS_CACHE[env_name]
+
+    env_path = _find_conda_env(env_name, *_get_conda_envs_from_files())
+    if env_path is None:
+        base, envs = _get_conda_envs_from_conda()
+        if env_name != 'base' and not envs:
+            raise ValueError('Only the conda base environment exist. You '
+                             'need to create the "{}" conda environment '
+                             'to use it.'.format(env_name))
+        env_path = _find_conda_env(env_name, base, envs)
+        if env_path is None:
+            raise ValueError('The specified conda environment {} does not '
+                             'exist. You need to create it.'
+                             .format(env_name))
+    bin_path = os.path.join(env_path, 'bin')
+    _CONDA_ENVS_CACHE[env_name] = (bin_path, env_path,
+                                   os.stat(env_path).st_mtime_ns)
+    return bin_path
+
+
+def _copy_file_verified(src, dst, chunk_size=1 << 20):
+    """Copy a file by chunks and check the checksum of the copy."""
+    src_hash = hashlib.sha256()
+    with open(src, 'rb') as f_src, open(dst, 'wb') as f_dst:
+        for chunk in iter(lambda: f_src.read(chunk_size), b''):
+            src_hash.update(chunk)
+            f_dst.write(chunk)
+    dst_hash = hashlib.sha256()
+    with open(dst, 'rb') as f_dst:
+        for chunk in iter(lambda: f_dst.read(chunk_size), b''):
+            dst_hash.update(chunk)
+    if src_hash.digest() != dst_hash.digest():
+        raise IOError('The checksum of the copy of {} in {} does not match.'
+                      .format(src, dst))
+    shutil.copystat(src, dst)
+    return dst
+
+
+def _same_filesystem(path_1, path_2):
+    return os.stat(path_1).st_dev == os.stat(path_2).st_dev
+
+
+def _move_directory(src, dst):
+    """Move a directory without copying it when possible.
+
+    The directory is renamed when both paths are on the same filesystem.
+    Otherwise, it is copied file by file, verifying the checksums, in a
+    temporary directory renamed once complete and the source is removed.
+
+    Parameters
+    ----------
+    src : str
+        The directory to move.
+    dst : str
+        The destination path. It should not exist.
+    """
+    dst_parent = os.path.dirname(os.path.abspath(dst))
+    os.makedirs(dst_parent, exist_ok=True)
+    if _same_filesystem(src, dst_parent):
+        os.rename(src, dst)
+        return
+    tmp_dst = os.path.join(
+        dst_parent, '.{}.{}.tmp'.format(os.path.basename(dst), os.getpid())
+    )
+    try:
+        shutil.copytree(src, tmp_dst, copy_function=_copy_file_verified)
+        os.rename(tmp_dst, dst)
+    except BaseException:
+        shutil.rmtree(tmp_dst, ignore_errors=True)
+        raise
+    shutil.rmtree(src)
+
 
 class CondaEnvWorker(BaseWorker):
     """Local worker which uses conda environment to dispatch submission.
@@ -32,8 +196,21 @@ class CondaEnvWorker(BaseWorker):
         * 'timeout': timeout after a given number of seconds when
           running the worker. If not provided, a default of 7200
           is used.
+        * 'output_format': either 'directory' to move the
+          ``training_output`` directory as written by ``ramp-test`` or
+          'bundle' to store the predictions in a single
+          ``training_output.npz`` file. The directory is kept when the
+          predictions cannot be bundled. If not provided, 'directory' is
+          used.
     submission : str
         Name of the RAMP submission to be handle by the worker.
+    fold : None, int or 'bag', default=None
+        The part of the submission processed by the worker:
+
+        * if None: all the CV folds are trained and bagged with ``ramp-test``;
+        * if int: only this CV fold is trained. The outputs are kept in the
+          ``training_output`` folder of the submission for the bagging step;
+        * if 'bag': the trained CV folds are bagged.
 
     Attributes
     ----------
@@ -47,8 +224,11 @@ class CondaEnvWorker(BaseWorker):
             * 'finished': the worker finished to train the submission.
             * 'collected': the results of the training have been collected.
     """
-    def __init__(self, config, submission):
+    supports_fold_tasks = True
+
+    def __init__(self, config, submission, fold=None):
         super().__init__(config=config, submission=submission)
+        self.fold = fold
 
     def setup(self):
         """Set up the worker.
@@ -62,40 +242,21 @@ class CondaEnvWorker(BaseWorker):
             self._check_config_name(self.config, required_param)
         # find the path to the conda environment
         env_name = self.config.get('conda_env', 'base')
-        proc = subprocess.Popen(
-            ["conda", "info", "--envs", "--json"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT
-        )
-        stdout, _ = proc.communicate()
-        conda_info = json.loads(stdout)
-
-        if env_name == 'base':
-            self._python_bin_path = os.path.join(conda_info['envs'][0], 'bin')
-        else:
-            envs_path = conda_info['envs'][1:]
-            if not envs_path:
-                self.status = 'error'
-                raise ValueError('Only the conda base environment exist. You '
-                                 'need to create the "{}" conda environment '
-                                 'to use it.'.format(env_name))
-            is_env_found = False
-            for env in envs_path:
-                if env_name == os.path.split(env)[-1]:
-                    is_env_found = True
-                    self._python_bin_path = os.path.join(env, 'bin')
-                    break
-            if not is_env_found:
-                self.status = 'error'
-                raise ValueError('The specified conda environment {} does not '
-                                 'exist. You need to create it.'
-                                 .format(env_name))
+        try:
+            self._python_bin_path = _get_conda_env_bin_path(env_name)
+        except ValueError:
+            self.status = 'error'
+            raise
         super(CondaEnvWorker, self).setup()
 
     def teardown(self):
         """Remove the predictions stores within the submission."""
         if self.status != 'collected':
             raise ValueError("Collect the results before to kill the worker.")
+        if isinstance(self.fold, int):
+            # the outputs of the fold are required by the bagging step
+            super().teardown()
+            return
         output_training_dir = os.path.join(self.config['kit_dir'],
                                            'submissions', self.submission,
                                            'training_output')
@@ -126,6 +287,14 @@ class CondaEnvWorker(BaseWorker):
     def timeout(self):
         return self.config.get('timeout', 7200)
 
+    @property
+    def _log_name(self):
+        if self.fold is None:
+            return 'log'
+        elif self.fold == 'bag':
+            return 'log_bag'
+        return 'log_fold_{}'.format(self.fold)
+
     def launch_submission(self):
         """Launch the submission.
 
@@ -133,22 +302,33 @@ class CondaEnvWorker(BaseWorker):
         environment given in the configuration. The submission is launched in
         a subprocess to free to not lock the Python main process.
         """
-        cmd_ramp = os.path.join(self._python_bin_path, 'ramp-test')
         if self.status == 'running':
             raise ValueError('Wait that the submission is processed before to '
                              'launch a new one.')
         self._log_dir = os.path.join(self.config['logs_dir'], self.submission)
         if not os.path.exists(self._log_dir):
             os.makedirs(self._log_dir)
-        self._log_file = open(os.path.join(self._log_dir, 'log'), 'wb+')
+        self._log_file = open(os.path.join(self._log_dir, self._log_name),
+                              'wb+')
+        paths = ['--submission', self.submission,
+                 '--ramp-kit-dir', self.config['kit_dir'],
+                 '--ramp-data-dir', self.config['data_dir'],
+                 '--ramp-submission-dir', self.config['submissions_dir']]
+        if self.fold is None:
+            cmd = ([os.path.join(self._python_bin_path, 'ramp-test')] +
+                   paths + ['--save-output', '--ignore-warning'])
+        else:
+            # ramp-test cannot process a single fold: run the fold runner
+            # with the Python interpreter of the environment
+            cmd = [os.path.join(self._python_bin_path, 'python'),
+                   _FOLD_RUNNER]
+            if self.fold == 'bag':
+                cmd += ['bag']
+            else:
+                cmd += ['train', '--fold', str(self.fold)]
+            cmd += paths
         self._proc = subprocess.Popen(
-            [cmd_ramp,
-             '--submission', self.submission,
-             '--ramp-kit-dir', self.config['kit_dir'],
-             '--ramp-data-dir', self.config['data_dir'],
-             '--ramp-submission-dir', self.config['submissions_dir'],
-             '--save-output',
-             '--ignore-warning'],
+            cmd,
             stdout=self._log_file,
             stderr=self._log_file,
         )
@@ -168,7 +348,8 @@ class CondaEnvWorker(BaseWorker):
             # communicate() will wait for the process to be completed
             self._proc.communicate()
             self._log_file.close()
-            with open(os.path.join(self._log_dir, 'log'), 'rb') as f:
+            with open(os.path.join(self._log_dir, self._log_name),
+                      'rb') as f:
                 log_output = f.read()
             error_msg = _get_traceback(log_output.decode('utf-8'))
             if self.status == 'timeout':
@@ -184,6 +365,14 @@ class CondaEnvWorker(BaseWorker):
             output_training_dir = os.path.join(
                 self.config['submissions_dir'], self.submission,
                 'training_output')
+            if isinstance(self.fold, int):
+                # the predictions are copied once all folds are bagged
+                if returncode:
+                    shutil.rmtree(os.path.join(
+                        output_training_dir, 'fold_{}'.format(self.fold)
+                    ), ignore_errors=True)
+                self.status = 'collected'
+                return (returncode, error_msg)
             if os.path.exists(pred_dir):
                 shutil.rmtree(pred_dir)
             if returncode:
@@ -191,8 +380,19 @@ class CondaEnvWorker(BaseWorker):
                     shutil.rmtree(output_training_dir)
                 self.status = 'collected'
                 return (returncode, error_msg)
-            # copy the predictions into the disk
-            # no need to create the directory, it will be handle by copytree
-            shutil.copytree(output_training_dir, pred_dir)
+            bundled = False
+            if self.config.get('output_format', 'directory') == 'bundle':
+                # consolidate the predictions in a single file
+                try:
+                    save_training_output(
+                        output_training_dir,
+                        os.path.join(pred_dir, TRAINING_OUTPUT_FILENAME)
+                    )
+                    bundled = True
+                except ValueError as e:
+                    logger.warning('Keep the training output directory of '
+                                   '{}: {}'.format(self.submission, e))
+            if not bundled:
+                _move_directory(output_training_dir, pred_dir)
             self.status = 'collected'
             return (returncode, error_msg)
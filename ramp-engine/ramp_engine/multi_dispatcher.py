@@ -0,0 +1,203 @@
+import logging
+import multiprocessing
+import os
+import time
+
+from ramp_database.model import Event
+from ramp_database.tools.submission import set_submission_state
+from ramp_database.utils import session_scope
+
+from ramp_utils import read_config
+
+from .dispatcher import Dispatcher
+
+logger = logging.getLogger('RAMP-DISPATCHER')
+
+
+class MultiEventDispatcher:
+    """Dispatcher processing the submissions of all the open events.
+
+    A single process shares one database session and one pool of workers
+    across the open events. Each event is handled by a :class:`Dispatcher`
+    which fetches its submissions and collects its results, while the
+    admission of the workers is done globally: a free slot is given to the
+    event with the smallest number of running workers relative to its
+    weight, without exceeding the quota of the event.
+
+    The quota and weight of an event are read from the ``dispatcher`` section
+    of its configuration file: ``n_workers`` (default: ``n_workers`` of the
+    multi-event dispatcher) and ``weight`` (default: 1). The open events are
+    refreshed every ``event_refresh_interval`` seconds: newly opened events
+    are added and closed events are removed once their running workers are
+    collected.
+
+    Parameters
+    ----------
+    config : str
+        Path to the configuration YAML file containing the information about
+        the database.
+    events_dir : str
+        The path in which all events configuration files will be located. We
+        expect a pattern as `event_dir/<a ramp event>/config.yml`.
+    n_workers : int, default=1
+        Maximum number of workers which can run submissions simultaneously
+        across all events. A negative value is relative to the number of
+        CPUs.
+    hunger_policy : {None, 'sleep', 'exit'}
+        Policy to apply in case that there is no anymore workers to be
+        processed:
+
+        * if None: the dispatcher will work without interruption;
+        * if 'sleep': the dispatcher will sleep for 5 seconds before to check
+          for new submission;
+        * if 'exit': the dispatcher will stop after collecting the results of
+          the last submissions.
+    time_between_collection : int, default=1
+        The amount of time in seconds to wait before checking if we can
+        collect results from worker.
+    event_refresh_interval : int, default=60
+        The amount of time in seconds between two checks of the open events.
+    """
+    def __init__(self, config, events_dir, n_workers=1, hunger_policy=None,
+                 time_between_collection=1, event_refresh_interval=60):
+        self.config = config
+        self._database_config = read_config(
+            config, filter_section='sqlalchemy'
+        )
+        self.events_dir = os.path.abspath(events_dir)
+        if not os.path.isdir(self.events_dir):
+            raise ValueError(
+                "The path {} is not existing.".format(events_dir)
+            )
+        self.n_workers = (max(multiprocessing.cpu_count() + 1 + n_workers, 1)
+                          if n_workers < 0 else n_workers)
+        self.hunger_policy = hunger_policy
+        self.time_between_collection = time_between_collection
+        self.event_refresh_interval = event_refresh_interval
+        # event name -> (dispatcher, weight)
+        self._dispatchers = {}
+        # events which are closed but still have workers to collect
+        self._closing_events = set()
+        self._last_refresh = None
+        self._poison_pill = False
+
+    def _make_dispatcher(self, event_name):
+        from . import available_workers
+        event_config = os.path.join(self.events_dir, event_name, 'config.yml')
+        if not os.path.isfile(event_config):
+            logger.warning('No configuration file {} for the event {}. The '
+                           'event is skipped.'
+                           .format(event_config, event_name))
+            return None
+        internal_event_config = read_config(event_config)
+        dispatcher_config = internal_event_config.get('dispatcher', {})
+        n_workers = dispatcher_config.get('n_workers', self.n_workers)
+        dispatcher = Dispatcher(
+            config=self.config, event_config=event_config,
+            worker=available_workers[
+                internal_event_config['worker']['worker_type']
+            ],
+            n_workers=n_workers,
+            n_threads=dispatcher_config.get('n_threads', None),
+            hunger_policy=None,
+            time_between_collection=self.time_between_collection,
+            scheduling_policy=dispatcher_config.get('scheduling_policy',
+                                                    'fifo'),
+            deadline_window=dispatcher_config.get('deadline_window', 3600),
+            fold_parallel=dispatcher_config.get('fold_parallel', False)
+        )
+        return dispatcher, dispatcher_config.get('weight', 1)
+
+    def refresh_events(self, session):
+        """Add the newly opened events and remove the closed ones."""
+        self._last_refresh = time.time()
+        open_events = {e.name for e in session.query(Event).all()
+                       if e.is_open}
+        for event_name in sorted(open_events - set(self._dispatchers)):
+            dispatcher = self._make_dispatcher(event_name)
+            if dispatcher is None:
+                continue
+            logger.info('Start dispatching the event {}'.format(event_name))
+            Dispatcher._reset_submission_after_failure(session, event_name)
+            self._dispatchers[event_name] = dispatcher
+        self._closing_events.difference_update(open_events)
+        for event_name in set(self._dispatchers) - open_events:
+            if event_name not in self._closing_events:
+                logger.info('The event {} is closed. Stop dispatching it once '
+                            'the running workers finished.'
+                            .format(event_name))
+                self._closing_events.add(event_name)
+
+    def _n_running_workers(self):
+        return sum(dispatcher._processing_worker_queue.qsize()
+                   for dispatcher, _ in self._dispatchers.values())
+
+    def launch_workers(self, session):
+        """Launch the awaiting workers of the events within the quotas."""
+        while self._n_running_workers() < self.n_workers:
+            candidates = [
+                (dispatcher._processing_worker_queue.qsize() / weight,
+                 event_name)
+                for event_name, (dispatcher, weight)
+                in self._dispatchers.items()
+                if (event_name not in self._closing_events and
+                    weight > 0 and dispatcher.can_launch_worker())
+            ]
+            if not candidates:
+                return
+            _, event_name = min(candidates)
+            self._dispatchers[event_name][0].launch_next_worker(session)
+
+    def _remove_closed_events(self, session):
+        for event_name in list(self._closing_events):
+            dispatcher, _ = self._dispatchers[event_name]
+            if dispatcher._processing_worker_queue.empty():
+                # the submissions not yet started are trained again when the
+                # event is reopened
+                while not dispatcher._awaiting_worker_queue.empty():
+                    _, (submission_id, _) = \
+                        dispatcher._awaiting_worker_queue.get_nowait()
+                    set_submission_state(session, submission_id, 'new')
+                del self._dispatchers[event_name]
+                self._closing_events.remove(event_name)
+                logger.info('Stop dispatching the event {}'.format(event_name))
+
+    def kill(self, signum=None, frame=None):
+        """Stop the dispatcher at the end of the current iteration."""
+        self._poison_pill = True
+
+    def launch(self):
+        """Launch the dispatcher."""
+        logger.info('Starting the RAMP multi-event dispatcher')
+        with session_scope(self._database_config) as session:
+            try:
+                while not self._poison_pill:
+                    if (self._last_refresh is None or
+                            time.time() - self._last_refresh >=
+                            self.event_refresh_interval):
+                        self.refresh_events(session)
+                    for event_name, (dispatcher, _) in \
+                            self._dispatchers.items():
+                        if event_name not in self._closing_events:
+                            dispatcher.fetch_from_db(session)
+                    self.launch_workers(session)
+                    for dispatcher, _ in self._dispatchers.values():
+                        dispatcher.collect_result(session)
+                        dispatcher.update_database_results(session)
+                    self._remove_closed_events(session)
+                    if self._n_running_workers() == 0:
+                        awaiting = any(
+                            not dispatcher._awaiting_worker_queue.empty()
+                            for dispatcher, _ in self._dispatchers.values()
+                        )
+                        if self.hunger_policy == 'exit' and not awaiting:
+                            self._poison_pill = True
+                        elif self.hunger_policy == 'sleep':
+                            time.sleep(5)
+            finally:
+                # reset the submissions to 'new' in case of error or
+                # unfinished training
+                for event_name in self._dispatchers:
+                    Dispatcher._reset_submission_after_failure(session,
+                                                               event_name)
+            logger.info('Dispatcher killed by the poison pill')
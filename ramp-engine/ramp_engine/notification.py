@@ -0,0 +1,190 @@
+"""
+The :mod:`ramp_engine.notification` module provides the notification channels
+used by the dispatcher to sleep while idle and to wake up as soon as a new
+submission is available or a worker finished.
+"""
+import logging
+import os
+import select
+import signal
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine.url import URL
+
+from ramp_database.model.submission import SUBMISSION_NOTIFY_CHANNEL
+from ramp_database.model.submission import install_submission_notify_trigger
+from ramp_database.utils import ARRAY_STORAGE_OPTIONS
+from ramp_database.utils import ENGINE_OPTIONS
+
+logger = logging.getLogger('RAMP-DISPATCHER')
+
+
+class BaseNotifier:
+    """Base class for the notification channels.
+
+    A notifier exposes a file descriptor through :meth:`fileno` such that it
+    can be waited on using :func:`select.select`. Once the file descriptor is
+    readable, :meth:`consume` should be called to drain the pending
+    notifications.
+    """
+
+    def fileno(self):
+        """int: The file descriptor to wait on."""
+        raise NotImplementedError
+
+    def consume(self):
+        """Drain the pending notifications.
+
+        Returns
+        -------
+        payloads : list of str
+            The payloads of the notifications received.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the resources used by the notifier."""
+        pass
+
+
+class PostgresNotifier(BaseNotifier):
+    """Receive the notifications sent through PostgreSQL ``LISTEN/NOTIFY``.
+
+    A trigger installed on the ``submissions`` table calls ``pg_notify`` with
+    the name of the event each time a submission is set to the ``'new'``
+    state. The trigger is (re)installed when the notifier is created.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration file containing the information to connect to the
+        dataset. It corresponds to the ``sqlalchemy`` key of the RAMP
+        configuration.
+    channel : str, default='ramp_submission_new'
+        The name of the channel to listen to.
+    """
+
+    def __init__(self, config, channel=SUBMISSION_NOTIFY_CHANNEL):
+        self.channel = channel
+        # LISTEN requires a dedicated connection in autocommit mode which
+        # stays open for the whole life of the dispatcher.
+        url_config = {key: value for key, value in config.items()
+                      if key not in ENGINE_OPTIONS and
+                      key not in ARRAY_STORAGE_OPTIONS}
+        self._engine = create_engine(URL(**url_config))
+        install_submission_notify_trigger(self._engine)
+        self._conn = self._engine.raw_connection()
+        self._conn.connection.set_isolation_level(0)
+        cursor = self._conn.cursor()
+        cursor.execute('LISTEN {};'.format(self.channel))
+        cursor.close()
+
+    def fileno(self):
+        return self._conn.connection.fileno()
+
+    def consume(self):
+        dbapi_conn = self._conn.connection
+        dbapi_conn.poll()
+        payloads = []
+        while dbapi_conn.notifies:
+            payloads.append(dbapi_conn.notifies.pop(0).payload)
+        return payloads
+
+    def close(self):
+        self._conn.close()
+        self._engine.dispose()
+
+
+class ChildProcessNotifier(BaseNotifier):
+    """Get notified when a child process of the dispatcher exits.
+
+    A ``SIGCHLD`` handler writes into a self-pipe such that a worker running
+    as a subprocess wakes up the dispatcher right after it finished. The
+    handler can only be installed from the main thread; otherwise, the
+    notifier stays silent and the dispatcher relies on its timeout.
+    """
+
+    def __init__(self):
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+        os.set_blocking(self._write_fd, False)
+        self._previous_handler = None
+        try:
+            self._previous_handler = signal.signal(
+                signal.SIGCHLD, self._handle_sigchld
+            )
+        except ValueError:
+            logger.debug('SIGCHLD handler can only be installed from the '
+                         'main thread. Fall back on polling the workers.')
+
+    def _handle_sigchld(self, signum, frame):
+        try:
+            os.write(self._write_fd, b'\0')
+        except BlockingIOError:
+            # the pipe is full: the dispatcher will wake up anyway
+            pass
+
+    def fileno(self):
+        return self._read_fd
+
+    def consume(self):
+        n_exited = 0
+        while True:
+            try:
+                data = os.read(self._read_fd, 4096)
+            except (BlockingIOError, InterruptedError):
+                break
+            if not data:
+                break
+            n_exited += len(data)
+        return ['SIGCHLD'] * n_exited
+
+    def close(self):
+        if self._previous_handler is not None:
+            signal.signal(signal.SIGCHLD, self._previous_handler)
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+
+def make_submission_notifier(config):
+    """Create the notifier announcing new submissions for a database.
+
+    Parameters
+    ----------
+    config : dict
+        Configuration file containing the information to connect to the
+        dataset. It corresponds to the ``sqlalchemy`` key of the RAMP
+        configuration.
+
+    Returns
+    -------
+    notifier : :class:`BaseNotifier` or None
+        The notifier. None if the database does not support
+        ``LISTEN/NOTIFY``: the dispatcher will only rely on its timeout.
+    """
+    if config.get('drivername', '').startswith('postgresql'):
+        return PostgresNotifier(config)
+    return None
+
+
+def wait_for_notification(notifiers, timeout):
+    """Block until one of the notifiers is readable or the timeout expires.
+
+    Parameters
+    ----------
+    notifiers : list of :class:`BaseNotifier`
+        The notifiers to wait on.
+    timeout : float
+        The maximum amount of time to wait in seconds.
+
+    Returns
+    -------
+    notified : list of :class:`BaseNotifier`
+        The notifiers which received a notification. Their pending
+        notifications are not drained.
+    """
+    if not notifiers:
+        select.select([], [], [], timeout)
+        return []
+    readable, _, _ = select.select(notifiers, [], [], timeout)
+    return readable
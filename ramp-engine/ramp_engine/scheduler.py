@@ -0,0 +1,216 @@
+import datetime
+import itertools
+import time
+from collections import Counter
+from collections import deque
+from queue import Empty
+
+
+class FIFOPolicy:
+    """Process the submissions in their order of arrival."""
+    uses_expected_time = False
+
+    def priority(self, entry, queue):
+        """Sort key of a queued submission; the smallest is processed first.
+
+        Parameters
+        ----------
+        entry : dict
+            The queued submission with the keys ``'team'``,
+            ``'expected_time'``, ``'enqueue_time'``, and ``'order'``.
+        queue : :class:`SubmissionQueue`
+            The queue containing the submission.
+
+        Returns
+        -------
+        priority : tuple
+            The sort key of the submission.
+        """
+        return (entry['order'],)
+
+
+class FairSharePolicy(FIFOPolicy):
+    """Give the next slot to the team with the fewest running submissions.
+
+    Submissions of a same team are processed in their order of arrival such
+    that a team sending many submissions at once does not starve the others.
+    """
+
+    def priority(self, entry, queue):
+        return (queue.running[entry['team']], entry['order'])
+
+
+class ShortestJobFirstPolicy(FIFOPolicy):
+    """Process first the submissions expected to train the fastest.
+
+    The expected training time is the mean training time of the previous
+    submissions of the team. Teams without history are processed first.
+    """
+    uses_expected_time = True
+
+    def priority(self, entry, queue):
+        expected_time = entry['expected_time']
+        return (0 if expected_time is None else expected_time, entry['order'])
+
+
+class DeadlinePolicy(FIFOPolicy):
+    """Fair share which favours the submissions finishing before the closing.
+
+    Within ``deadline_window`` seconds of the closing of the event, the
+    submissions expected to finish before the closing are processed first,
+    from the shortest to the longest. Otherwise, the policy behaves as
+    :class:`FairSharePolicy`.
+
+    Parameters
+    ----------
+    deadline_window : float, default=3600
+        The time in seconds before the closing of the event from which the
+        deadline is taken into account.
+    """
+    uses_expected_time = True
+
+    def __init__(self, deadline_window=3600):
+        self.deadline_window = deadline_window
+
+    def priority(self, entry, queue):
+        if queue.closing_timestamp is not None:
+            time_left = (queue.closing_timestamp -
+                         datetime.datetime.utcnow()).total_seconds()
+            if 0 < time_left <= self.deadline_window:
+                expected_time = entry['expected_time'] or 0
+                return (expected_time > time_left, expected_time,
+                        entry['order'])
+        return (False, queue.running[entry['team']], entry['order'])
+
+
+available_policies = {
+    'fifo': FIFOPolicy,
+    'fair_share': FairSharePolicy,
+    'sjf': ShortestJobFirstPolicy,
+    'deadline': DeadlinePolicy,
+}
+
+
+class SubmissionQueue:
+    """Queue of the submissions awaiting a worker ordered by a policy.
+
+    The queue exposes the subset of the :class:`queue.Queue` API used by the
+    dispatcher. The priorities are evaluated when a submission is taken out of
+    the queue since they depend on the submissions currently running.
+
+    Parameters
+    ----------
+    policy : str or policy instance, default='fifo'
+        The scheduling policy. A string refers to a key of
+        ``available_policies``: ``'fifo'``, ``'fair_share'``, ``'sjf'``
+        (shortest expected job first), or ``'deadline'``.
+    closing_timestamp : datetime or None, default=None
+        The closing time of the event used by the ``'deadline'`` policy.
+    policy_params : dict or None, default=None
+        The parameters of the policy when ``policy`` is a string, e.g.
+        ``{'deadline_window': 7200}`` for the ``'deadline'`` policy.
+    """
+
+    def __init__(self, policy='fifo', closing_timestamp=None,
+                 policy_params=None):
+        if isinstance(policy, str):
+            if policy not in available_policies:
+                raise ValueError(
+                    "Unknown scheduling policy '{}'. Choose one of {}."
+                    .format(policy, sorted(available_policies))
+                )
+            policy = available_policies[policy](**(policy_params or {}))
+        self.policy = policy
+        self.closing_timestamp = closing_timestamp
+        # number of submissions of each team taken out of the queue and not
+        # yet finished
+        self.running = Counter()
+        self._entries = []
+        self._counter = itertools.count()
+        # waiting times of the last submissions taken out of the queue
+        self._wait_times = deque(maxlen=100)
+
+    def put_nowait(self, item, team_name=None, expected_time=None,
+                   front=False):
+        """Add a submission to the queue.
+
+        Parameters
+        ----------
+        item : object
+            The queued item returned by :meth:`get`.
+        team_name : str or None, default=None
+            The team which made the submission.
+        expected_time : float or None, default=None
+            The expected training time of the submission in seconds.
+        front : bool, default=False
+            Whether the submission is taken out of the queue before the
+            others regardless of the policy, e.g. to finish a submission
+            already started.
+        """
+        self._entries.append({
+            'item': item, 'team': team_name, 'expected_time': expected_time,
+            'enqueue_time': time.time(), 'order': next(self._counter),
+            'front': front
+        })
+
+    def get_nowait(self):
+        """Remove and return the submission with the highest priority."""
+        if not self._entries:
+            raise Empty
+        entry = min(self._entries,
+                    key=lambda entry: (not entry['front'],
+                                       self.policy.priority(entry, self)))
+        self._entries.remove(entry)
+        self.running[entry['team']] += 1
+        self._wait_times.append(time.time() - entry['enqueue_time'])
+        return entry['item']
+
+    get = get_nowait
+
+    def task_done(self, team_name=None):
+        """Indicate that a submission taken out of the queue finished.
+
+        Parameters
+        ----------
+        team_name : str or None, default=None
+            The team which made the submission.
+        """
+        self.running[team_name] -= 1
+        if self.running[team_name] <= 0:
+            del self.running[team_name]
+
+    def qsize(self):
+        return len(self._entries)
+
+    def empty(self):
+        return not self._entries
+
+    def metrics(self):
+        """Metrics about the queue.
+
+        Returns
+        -------
+        metrics : dict
+            The dictionary contains:
+
+            * ``'queue_length'``: the number of awaiting submissions;
+            * ``'n_running'``: the number of submissions taken out of the
+              queue and not finished;
+            * ``'max_wait_time'`` and ``'mean_wait_time'``: the time in
+              seconds since the awaiting submissions have been queued;
+            * ``'mean_dispatch_wait_time'``: the time in seconds that the last
+              100 dispatched submissions waited in the queue.
+        """
+        now = time.time()
+        wait_times = [now - entry['enqueue_time'] for entry in self._entries]
+        return {
+            'queue_length': len(self._entries),
+            'n_running': sum(self.running.values()),
+            'max_wait_time': max(wait_times, default=0.),
+            'mean_wait_time': (sum(wait_times) / len(wait_times)
+                               if wait_times else 0.),
+            'mean_dispatch_wait_time': (
+                sum(self._wait_times) / len(self._wait_times)
+                if self._wait_times else 0.
+            ),
+        }
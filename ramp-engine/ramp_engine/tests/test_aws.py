@@ -4,14 +4,18 @@ copy the _config.yml file and rename it config.yml, then update it using the
 credentials to interact with Amazon
 
 """
+import io
 import logging
 import os
 import shutil
+import subprocess
+import tarfile
 
 import pytest
 
 from ramp_database.tools.submission import get_submissions
 from ramp_engine import Dispatcher, AWSWorker
+from ramp_engine.aws import api as aws_api
 from ramp_utils import generate_worker_config, read_config
 from ramp_utils.testing import database_config_template
 from ramp_utils.testing import ramp_config_template
@@ -93,3 +97,188 @@ def test_aws_dispatcher(session_toy):  # noqa
         session_toy, event_config['ramp']['event_name'], 'training_error'
     )
     assert len(submission) == 2
+
+
+def _mock_boto_session(monkeypatch, ips):
+    sessions = []
+
+    class Instance:
+        def __init__(self, instance_id):
+            self.public_ip_address = ips[instance_id]
+
+    class Resource:
+        def Instance(self, instance_id):
+            ips['n_calls'] = ips.get('n_calls', 0) + 1
+            return Instance(instance_id)
+
+    class Session:
+        def __init__(self, **kwargs):
+            sessions.append(kwargs)
+
+        def resource(self, name):
+            return Resource()
+
+    monkeypatch.setattr(aws_api.boto3.session, 'Session', Session)
+    monkeypatch.setattr(aws_api, '_BOTO_SESSIONS', {})
+    monkeypatch.setattr(aws_api, '_INSTANCE_IPS', {})
+    return sessions
+
+
+def _aws_config(**kwargs):
+    config = {'access_key_id': 'key', 'secret_access_key': 'secret',
+              'region_name': 'us-west-2', 'ami_user_name': 'ubuntu',
+              'key_path': '/path/to/key.pem'}
+    config.update(kwargs)
+    return config
+
+
+def test_aws_cached_ip_and_session(monkeypatch):
+    ips = {'i-0': '1.2.3.4', 'i-1': '5.6.7.8'}
+    sessions = _mock_boto_session(monkeypatch, ips)
+    commands = []
+    monkeypatch.setattr(aws_api.subprocess, 'call',
+                        lambda cmd, **kwargs: commands.append(cmd) or 0)
+    config = _aws_config()
+
+    for _ in range(3):
+        aws_api._run(config, 'i-0', 'ls')
+        aws_api._upload(config, 'i-0', 'source', 'dest')
+    aws_api._run(config, 'i-1', 'ls')
+    assert len(sessions) == 1
+    assert ips['n_calls'] == 2
+    assert all('ubuntu@1.2.3.4' in cmd for cmd in commands[:-1])
+    assert 'ubuntu@5.6.7.8' in commands[-1]
+
+    # the ssh and rsync commands reuse the same multiplexed connection
+    control_dir = aws_api._get_ssh_control_dir()
+    ssh = ("ssh -o 'StrictHostKeyChecking no' -i /path/to/key.pem "
+           "-o ControlMaster=auto -o ControlPath={} -o ControlPersist=600"
+           .format(os.path.join(control_dir, '%C')))
+    assert commands[0] == ssh + ' ubuntu@1.2.3.4 "ls"'
+    assert commands[1] == ('rsync -e "{}" -avzP source ubuntu@1.2.3.4:dest'
+                           .format(ssh))
+
+    # closing the connection forgets the ip of the instance
+    aws_api._close_ssh_connection(config, 'i-0')
+    assert commands[-1] == ssh + ' -O exit ubuntu@1.2.3.4'
+    aws_api._run(config, 'i-0', 'ls')
+    assert ips['n_calls'] == 3
+
+
+def test_aws_ssh_without_multiplexing():
+    config = _aws_config(ssh_control_persist_secs=0)
+    assert aws_api._ssh_command(config) == (
+        "ssh -o 'StrictHostKeyChecking no' -i /path/to/key.pem"
+    )
+
+
+def test_aws_batched_training_status(monkeypatch):
+    n_calls = {'describe_instances': 0, 'run': 0}
+
+    class Client:
+        def describe_instances(self, Filters):
+            n_calls['describe_instances'] += 1
+            return {'Reservations': [{'Instances': [
+                {'InstanceId': 'i-0', 'State': {'Name': 'running'}},
+                {'InstanceId': 'i-1', 'State': {'Name': 'terminated'}},
+            ]}]}
+
+    class Session:
+        def client(self, name):
+            return Client()
+
+    output = (
+        "There\nsubmission_1\n1\n--ramp-training-outputs--\n"
+        "/kit/submissions/submission_0/training_output/fold_0\n"
+        "/kit/submissions/submission_0/training_output/fold_0/"
+        "y_pred_train.npz\n"
+        "/kit/submissions/submission_0/training_output/fold_0/"
+        "y_pred_test.npz\n"
+        "/kit/submissions/submission_1/training_output/fold_0\n"
+    )
+
+    def run(config, instance_id, cmd, return_output=False):
+        n_calls['run'] += 1
+        return output.encode('utf-8')
+
+    monkeypatch.setattr(aws_api, '_get_boto_session',
+                        lambda config: Session())
+    monkeypatch.setattr(aws_api, '_run', run)
+    monkeypatch.setattr(aws_api, '_TRAINING_STATUS', {})
+    monkeypatch.setattr(aws_api, '_INSTANCE_STATES', [None, {}])
+    config = {'remote_ramp_kit_folder': '/kit', 'status_cache_ttl_secs': 60}
+
+    # all the checks of an instance share a single remote command
+    assert aws_api._training_finished(config, 'i-0', 'submission_0')
+    assert not aws_api._training_finished(config, 'i-0', 'submission_1')
+    assert aws_api._training_successful(config, 'i-0', 'submission_0')
+    assert aws_api._training_successful(config, 'i-0', 'submission_0',
+                                        actual_nb_folds=1)
+    assert not aws_api._training_successful(config, 'i-0', 'submission_1')
+    assert n_calls == {'describe_instances': 1, 'run': 1}
+
+    # the training on a terminated instance is over
+    assert aws_api._training_finished(config, 'i-1', 'submission_2')
+    assert n_calls == {'describe_instances': 1, 'run': 1}
+
+    # a new training invalidates the cached status of the instance
+    aws_api._TRAINING_STATUS.pop('i-0')
+    aws_api._training_finished(config, 'i-0', 'submission_0')
+    assert n_calls == {'describe_instances': 1, 'run': 2}
+
+
+def test_aws_delta_upload(monkeypatch, tmpdir):
+    # the remote commands are run locally instead of through ssh
+    monkeypatch.setattr(aws_api, '_ssh_command',
+                        lambda config: """sh -c 'exec sh -c "$1"'""")
+    monkeypatch.setattr(aws_api, '_get_instance_ip',
+                        lambda config, instance_id: '1.2.3.4')
+    monkeypatch.setattr(aws_api, '_UPLOADED_BLOBS', {})
+    sent = []
+    run = subprocess.run
+
+    def run_and_record(cmd, **kwargs):
+        with tarfile.open(fileobj=io.BytesIO(kwargs['input'])) as tar:
+            sent.append(sorted(tar.getnames()))
+        return run(cmd, **kwargs)
+
+    monkeypatch.setattr(aws_api.subprocess, 'run', run_and_record)
+    remote_kit = tmpdir.mkdir('remote_kit')
+    config = {'remote_ramp_kit_folder': str(remote_kit),
+              'ami_user_name': 'ubuntu'}
+    submissions_dir = tmpdir.mkdir('submissions')
+    submission = submissions_dir.mkdir('submission_000000001')
+    submission.join('estimator.py').write('model = 1\n')
+    submission.join('features.py').write('features = 1\n')
+    submission.mkdir('data').join('extra file.csv').write('a,b\n')
+
+    assert aws_api.upload_submission(config, 'i-0', 'submission_000000001',
+                                     str(submissions_dir)) == 0
+    remote_submission = remote_kit.join('submissions', 'submission_000000001')
+    assert remote_submission.join('estimator.py').read() == 'model = 1\n'
+    assert remote_submission.join('features.py').read() == 'features = 1\n'
+    assert remote_submission.join('data', 'extra file.csv').read() == 'a,b\n'
+    assert len(sent[0]) == 4
+
+    # a resubmission only sends the modified file and its manifest
+    resubmission = submissions_dir.mkdir('submission_000000002')
+    resubmission.join('estimator.py').write('model = 2\n')
+    resubmission.join('features.py').write('features = 1\n')
+    assert aws_api.upload_submission(config, 'i-0', 'submission_000000002',
+                                     str(submissions_dir)) == 0
+    assert sent[1] == sorted([aws_api._hash_file(
+        str(resubmission.join('estimator.py'))
+    ), 'submission_000000002.manifest'])
+    remote_resubmission = remote_kit.join('submissions',
+                                          'submission_000000002')
+    assert remote_resubmission.join('estimator.py').read() == 'model = 2\n'
+    assert (remote_resubmission.join('features.py').read() ==
+            'features = 1\n')
+
+    # the hashes are forgotten when the upload fails
+    config['remote_ramp_kit_folder'] = str(tmpdir.join('file'))
+    tmpdir.join('file').write('')
+    monkeypatch.setattr(aws_api, '_upload', lambda *args: 1)
+    assert aws_api.upload_submission(config, 'i-0', 'submission_000000002',
+                                     str(submissions_dir)) == 1
+    assert 'i-0' not in aws_api._UPLOADED_BLOBS
@@ -0,0 +1,187 @@
+import threading
+import time
+
+import pytest
+
+from ramp_engine.aws import api as aws_api
+from ramp_engine.aws import pool as aws_pool
+from ramp_engine.aws.pool import InstancePool
+from ramp_engine.aws.pool import close_instance_pool
+from ramp_engine.aws.pool import get_instance_pool
+
+
+class FakeInstance:
+    def __init__(self, instance_id):
+        self.id = instance_id
+
+
+class FakeEC2:
+    """Stub of the ec2 api and of the remote commands."""
+
+    def __init__(self):
+        self.tags = {}
+        self.terminated = []
+        self.commands = []
+        self.n_launched = 0
+        self.exit_status = 0
+        self.launch_delay = 0
+
+    def launch_ec2_instances(self, config, nb=1):
+        time.sleep(self.launch_delay)
+        instances = []
+        for _ in range(nb):
+            instance_id = 'i-{}'.format(self.n_launched)
+            self.n_launched += 1
+            self.tags[instance_id] = {}
+            instances.append(FakeInstance(instance_id))
+        return instances
+
+    def terminate_ec2_instance(self, config, instance_id):
+        self.terminated.append(instance_id)
+        del self.tags[instance_id]
+
+    def list_ec2_instance_ids(self, config):
+        return list(self.tags)
+
+    def _get_tags(self, config, instance_id):
+        return self.tags[instance_id]
+
+    def _add_or_update_tag(self, config, instance_id, key, value):
+        self.tags[instance_id][key] = value
+
+    def _run(self, config, instance_id, cmd, return_output=False):
+        self.commands.append((instance_id, cmd))
+        return self.exit_status
+
+
+@pytest.fixture
+def ec2(monkeypatch):
+    ec2 = FakeEC2()
+    for name in ('launch_ec2_instances', 'terminate_ec2_instance',
+                 'list_ec2_instance_ids', '_get_tags', '_add_or_update_tag',
+                 '_run'):
+        monkeypatch.setattr(aws_api, name, getattr(ec2, name))
+    monkeypatch.setattr(aws_pool, '_POOLS', {})
+    return ec2
+
+
+@pytest.fixture
+def config():
+    return {'region_name': 'us-west-2', 'ami_image_name': 'iris',
+            'instance_type': 't2.micro', 'remote_ramp_kit_folder': '/kit',
+            'pool_min_idle': 1, 'pool_max_idle': 2}
+
+
+def _wait_for_launches(pool):
+    while pool.metrics()['n_launching']:
+        time.sleep(0.01)
+
+
+def test_instance_pool_scale(ec2, config):
+    pool = InstancePool(config, min_idle=1, max_idle=2, idle_ttl=0)
+    pool.scale(n_awaiting=0)
+    _wait_for_launches(pool)
+    assert pool.metrics() == {'n_idle': 1, 'n_busy': 0, 'n_launching': 0}
+    assert ec2.tags['i-0'] == {'ramp_aws_pool': pool.name + ':idle'}
+
+    # the pool grows with the queue up to max_idle
+    pool.scale(n_awaiting=5)
+    _wait_for_launches(pool)
+    assert pool.metrics()['n_idle'] == 2
+
+    # the instances which are not needed are terminated after idle_ttl
+    pool.scale(n_awaiting=0)
+    assert pool.metrics()['n_idle'] == 1
+    assert len(ec2.terminated) == 1
+    pool.close()
+    assert pool.metrics()['n_idle'] == 0
+    assert len(ec2.terminated) == 2
+
+
+def test_instance_pool_idle_ttl(ec2, config):
+    pool = InstancePool(config, min_idle=0, max_idle=2, idle_ttl=600)
+    pool.scale(n_awaiting=2)
+    _wait_for_launches(pool)
+    pool.scale(n_awaiting=0)
+    # the idle instances are kept until the end of idle_ttl
+    assert pool.metrics()['n_idle'] == 2
+    assert ec2.terminated == []
+
+
+def test_instance_pool_acquire_release(ec2, config):
+    pool = InstancePool(config, min_idle=1, max_idle=1)
+    pool.scale(n_awaiting=1)
+    _wait_for_launches(pool)
+
+    instance_id = pool.acquire()
+    assert instance_id == 'i-0'
+    assert ec2.tags['i-0']['ramp_aws_pool'].endswith(':busy')
+    assert pool.metrics() == {'n_idle': 0, 'n_busy': 1, 'n_launching': 0}
+
+    # the remote submission folder is cleaned before reusing the instance
+    pool.release(instance_id, 'submission_0')
+    assert ec2.commands == [('i-0', 'rm -rf /kit/submissions/submission_0')]
+    assert ec2.tags['i-0']['ramp_aws_pool'].endswith(':idle')
+    assert pool.acquire() == 'i-0'
+    assert ec2.n_launched == 1
+
+    # without an idle instance, an instance is launched
+    assert pool.acquire() == 'i-1'
+    assert pool.metrics()['n_busy'] == 2
+
+    # an instance which cannot be cleaned is terminated
+    ec2.exit_status = 1
+    pool.release('i-1', 'submission_1')
+    assert ec2.terminated == ['i-1']
+    assert pool.metrics() == {'n_idle': 0, 'n_busy': 1, 'n_launching': 0}
+
+    # an instance can be terminated instead of being reused
+    ec2.exit_status = 0
+    pool.release('i-0', 'submission_0', terminate=True)
+    assert ec2.terminated == ['i-1', 'i-0']
+    assert pool.metrics() == {'n_idle': 0, 'n_busy': 0, 'n_launching': 0}
+
+
+def test_instance_pool_acquire_waits_for_launch(ec2, config):
+    ec2.launch_delay = 0.2
+    pool = InstancePool(config, min_idle=0, max_idle=1)
+    pool.scale(n_awaiting=1)
+    assert pool.metrics()['n_launching'] == 1
+    instance_ids = []
+    threads = [threading.Thread(target=lambda: instance_ids.append(
+        pool.acquire())) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # the first acquisition uses the instance launched by the pool and the
+    # second one launches its own instance
+    assert sorted(instance_ids) == ['i-0', 'i-1']
+    assert ec2.n_launched == 2
+
+
+def test_get_instance_pool(ec2, config):
+    ec2.launch_ec2_instances(config, nb=2)
+    ec2.tags['i-0']['ramp_aws_pool'] = 'us-west-2/iris/t2.micro:idle'
+    ec2.tags['i-1']['ramp_aws_pool'] = 'us-west-2/iris/t2.micro:busy'
+
+    pool = get_instance_pool(config)
+    assert pool is get_instance_pool(dict(config))
+    assert (pool.min_idle, pool.max_idle) == (1, 2)
+    # the idle instances of a previous pool are reused
+    assert pool.metrics()['n_idle'] == 1
+    assert pool.acquire() == 'i-0'
+
+    other_config = dict(config, instance_type='t2.large')
+    other_pool = get_instance_pool(other_config)
+    assert other_pool is not pool
+
+    # only the pool of the configuration is closed
+    pool.release('i-0')
+    other_pool.release(other_pool.acquire())
+    close_instance_pool(config)
+    assert list(aws_pool._POOLS.values()) == [other_pool]
+    assert pool.metrics()['n_idle'] == 0
+    assert other_pool.metrics()['n_idle'] == 1
+    close_instance_pool(other_config)
+    assert aws_pool._POOLS == {}
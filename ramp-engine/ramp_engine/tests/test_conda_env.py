@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from ramp_engine import local
+from ramp_engine.local import _get_conda_env_bin_path
+
+
+@pytest.fixture
+def fake_conda(tmpdir, monkeypatch):
+    # create a conda installation with a base environment and two
+    # environments, one of them living outside of the base folder
+    base = os.path.join(str(tmpdir), 'miniconda')
+    for env in ('ramp-iris', 'ramp-boston'):
+        os.makedirs(os.path.join(base, 'envs', env, 'bin'))
+    os.makedirs(os.path.join(base, 'bin'))
+    external_env = os.path.join(str(tmpdir), 'external', 'ramp-mars')
+    os.makedirs(os.path.join(external_env, 'bin'))
+
+    home = os.path.join(str(tmpdir), 'home')
+    os.makedirs(os.path.join(home, '.conda'))
+    with open(os.path.join(home, '.conda', 'environments.txt'), 'w') as f:
+        f.write('\n'.join([base, external_env]) + '\n')
+
+    monkeypatch.setenv('HOME', home)
+    monkeypatch.delenv('CONDA_EXE', raising=False)
+    monkeypatch.setenv('CONDA_PREFIX',
+                       os.path.join(base, 'envs', 'ramp-boston'))
+    monkeypatch.setattr(local, '_CONDA_ENVS_CACHE', {})
+
+    def _conda_should_not_run():
+        raise AssertionError('conda should not be run')
+    monkeypatch.setattr(local, '_get_conda_envs_from_conda',
+                        _conda_should_not_run)
+    return base, external_env
+
+
+def test_get_conda_env_bin_path_without_conda(fake_conda):
+    base, external_env = fake_conda
+    assert _get_conda_env_bin_path('base') == os.path.join(base, 'bin')
+    assert (_get_conda_env_bin_path('ramp-iris') ==
+            os.path.join(base, 'envs', 'ramp-iris', 'bin'))
+    assert (_get_conda_env_bin_path('ramp-mars') ==
+            os.path.join(external_env, 'bin'))
+
+
+def test_get_conda_env_bin_path_cache(fake_conda, monkeypatch):
+    base, _ = fake_conda
+    env_path = os.path.join(base, 'envs', 'ramp-iris')
+    bin_path = _get_conda_env_bin_path('ramp-iris')
+    assert 'ramp-iris' in local._CONDA_ENVS_CACHE
+
+    # the cached path is used as long as the environment is not modified
+    def _probing_should_not_run():
+        raise AssertionError('the environment should be cached')
+    monkeypatch.setattr(local, '_get_conda_envs_from_files',
+                        _probing_should_not_run)
+    assert _get_conda_env_bin_path('ramp-iris') == bin_path
+
+    # modifying the environment invalidates the cache
+    stat = os.stat(env_path)
+    os.utime(env_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    with pytest.raises(AssertionError, match='should be cached'):
+        _get_conda_env_bin_path('ramp-iris')
+
+
+def test_get_conda_env_bin_path_fallback_conda(fake_conda, monkeypatch):
+    base, _ = fake_conda
+    monkeypatch.setattr(
+        local, '_get_conda_envs_from_conda',
+        lambda: (base, [os.path.join(base, 'envs', 'ramp-iris')])
+    )
+    err_msg = 'The specified conda environment xxx does not exist.'
+    with pytest.raises(ValueError, match=err_msg):
+        _get_conda_env_bin_path('xxx')
+
+    monkeypatch.setattr(local, '_get_conda_envs_from_conda',
+                        lambda: (base, []))
+    err_msg = 'Only the conda base environment exist.'
+    with pytest.raises(ValueError, match=err_msg):
+        _get_conda_env_bin_path('xxx')
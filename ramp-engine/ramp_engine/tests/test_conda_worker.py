@@ -40,7 +40,7 @@ pytestmark = pytest.mark.skipif(
 
 @pytest.fixture
 def get_conda_worker():
-    def _create_worker(submission_name, conda_env='ramp-iris'):
+    def _create_worker(submission_name, conda_env='ramp-iris', fold=None):
         module_path = os.path.dirname(__file__)
         config = {'kit_dir': os.path.join(module_path, 'kits', 'iris'),
                   'data_dir': os.path.join(module_path, 'kits', 'iris'),
@@ -50,7 +50,8 @@ def get_conda_worker():
                   'predictions_dir': os.path.join(
                       module_path, 'kits', 'iris', 'predictions'),
                   'conda_env': conda_env}
-        return CondaEnvWorker(config=config, submission='starting_kit')
+        return CondaEnvWorker(config=config, submission='starting_kit',
+                              fold=fold)
     return _create_worker
 
 
@@ -108,6 +109,58 @@ def test_conda_worker(submission, get_conda_worker):
         _remove_directory(worker)
 
 
+@pytest.mark.parametrize(
+    "output_format, expected_files",
+    [('bundle', ['training_output.npz']),
+     ('directory', ['bagged_scores.csv', 'fold_0', 'fold_1'])]
+)
+def test_conda_worker_output_format(output_format, expected_files,
+                                    get_conda_worker):
+    worker = get_conda_worker('starting_kit')
+    worker.config['output_format'] = output_format
+    try:
+        worker.setup()
+        worker.launch_submission()
+        exit_status, _ = worker.collect_results()
+        assert exit_status == 0
+        pred_dir = os.path.join(worker.config['predictions_dir'],
+                                worker.submission)
+        assert sorted(os.listdir(pred_dir)) == expected_files
+        worker.teardown()
+    finally:
+        _remove_directory(worker)
+
+
+def test_conda_worker_fold_tasks(get_conda_worker):
+    workers = [get_conda_worker('starting_kit', fold=fold_i)
+               for fold_i in range(2)]
+    try:
+        for worker in workers:
+            worker.setup()
+            worker.launch_submission()
+        for fold_i, worker in enumerate(workers):
+            exit_status, _ = worker.collect_results()
+            assert exit_status == 0
+            worker.teardown()
+            # the fold outputs are kept for the bagging
+            assert os.path.isfile(os.path.join(
+                worker.config['submissions_dir'], worker.submission,
+                'training_output', 'fold_{}'.format(fold_i), 'scores.csv'
+            ))
+
+        worker = get_conda_worker('starting_kit', fold='bag')
+        worker.setup()
+        worker.launch_submission()
+        exit_status, _ = worker.collect_results()
+        assert exit_status == 0
+        pred_dir = os.path.join(worker.config['predictions_dir'],
+                                worker.submission)
+        assert os.listdir(pred_dir) == ['training_output.npz']
+        worker.teardown()
+    finally:
+        _remove_directory(workers[0])
+
+
 def test_conda_worker_without_conda_env_specified(get_conda_worker):
     worker = get_conda_worker('starting_kit')
     # remove the conda_env parameter from the configuration
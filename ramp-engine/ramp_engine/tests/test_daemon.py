@@ -52,3 +52,12 @@ def test_daemon(session_toy):
     finally:
         daemon.kill_dispatcher(None, None)
     assert len(daemon._proc) == 0
+
+
+def test_daemon_multi_event():
+    events_dir = os.path.join(os.path.dirname(__file__), 'events')
+    daemon = Daemon(config=database_config_template(), events_dir=events_dir,
+                    multi_event=True, n_workers=4)
+    assert daemon._multi_dispatcher.n_workers == 4
+    daemon.kill_dispatcher(None, None)
+    assert daemon._multi_dispatcher._poison_pill
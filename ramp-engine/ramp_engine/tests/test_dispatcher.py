@@ -13,9 +13,11 @@ from ramp_database.utils import session_scope
 from ramp_database.testing import create_toy_db
 
 from ramp_database.tools.event import get_event
+from ramp_database.tools.submission import get_bagged_scores
 from ramp_database.tools.submission import get_submissions
 from ramp_database.tools.submission import get_submission_by_id
 
+from ramp_engine.aws import AWSWorker
 from ramp_engine.local import CondaEnvWorker
 from ramp_engine.dispatcher import Dispatcher
 
@@ -52,6 +54,22 @@ def test_integration_dispatcher(session_toy):
     assert 'ValueError' in submission.error_msg
 
 
+def test_integration_dispatcher_event_driven(session_toy):
+    config = read_config(database_config_template())
+    event_config = read_config(ramp_config_template())
+    dispatcher = Dispatcher(
+        config=config, event_config=event_config, worker=CondaEnvWorker,
+        n_workers=-1, hunger_policy='exit', event_driven=True,
+        poll_timeout=5
+    )
+    dispatcher.launch()
+
+    submissions = get_submissions(
+        session_toy, event_config['ramp']['event_name'], 'training_error'
+    )
+    assert len(submissions) == 2
+
+
 def test_unit_test_dispatcher(session_toy):
     # make sure that the size of the list is bigger than the number of
     # submissions
@@ -154,3 +172,73 @@ def test_dispatcher_timeout(session_toy):
         session_toy, event_config['ramp']['event_name'], 'training_error'
     )
     assert len(submissions) >= 2
+
+
+@pytest.mark.parametrize(
+    "scheduling_policy", ['fifo', 'fair_share', 'sjf', 'deadline']
+)
+def test_dispatcher_scheduling_policy(session_toy, scheduling_policy):
+    config = read_config(database_config_template())
+    event_config = read_config(ramp_config_template())
+    dispatcher = Dispatcher(
+        config=config, event_config=event_config, worker=CondaEnvWorker,
+        n_workers=1, hunger_policy='exit',
+        scheduling_policy=scheduling_policy
+    )
+    dispatcher.fetch_from_db(session_toy)
+    assert dispatcher._awaiting_worker_queue.closing_timestamp is not None
+    metrics = dispatcher.queue_metrics()
+    assert metrics['queue_length'] == 6
+    assert metrics['n_running'] == 0
+
+    dispatcher.launch()
+    submissions = get_submissions(
+        session_toy, event_config['ramp']['event_name'], 'training_error'
+    )
+    assert len(submissions) == 2
+    assert dispatcher.queue_metrics()['n_running'] == 0
+    worker_metrics = dispatcher.worker_metrics()
+    assert worker_metrics['n_processing'] == 0
+    assert (worker_metrics['max_collection_time'] >=
+            worker_metrics['mean_collection_time'] > 0)
+
+
+def test_dispatcher_scheduling_policy_error():
+    config = read_config(database_config_template())
+    event_config = read_config(ramp_config_template())
+    with pytest.raises(ValueError, match="Unknown scheduling policy"):
+        Dispatcher(config=config, event_config=event_config,
+                   worker=CondaEnvWorker, scheduling_policy='xxx')
+
+
+def test_integration_dispatcher_fold_parallel(session_toy):
+    config = read_config(database_config_template())
+    event_config = read_config(ramp_config_template())
+    dispatcher = Dispatcher(
+        config=config, event_config=event_config, worker=CondaEnvWorker,
+        n_workers=-1, hunger_policy='exit', fold_parallel=True
+    )
+    dispatcher.fetch_from_db(session_toy)
+    # one task per fold and per submission
+    assert dispatcher._awaiting_worker_queue.qsize() == 2 * 6
+    dispatcher.launch()
+    assert dispatcher._fold_tasks == {}
+
+    event_name = event_config['ramp']['event_name']
+    submissions = get_submissions(session_toy, event_name, 'training_error')
+    assert len(submissions) == 2
+    submission = get_submission_by_id(session_toy, submissions[0][0])
+    assert 'ValueError' in submission.error_msg
+    submissions = get_submissions(session_toy, event_name, 'scored')
+    assert len(submissions) == 4
+    for submission_id, _, _ in submissions:
+        assert not get_bagged_scores(session_toy, submission_id).empty
+
+
+def test_dispatcher_fold_parallel_error():
+    config = read_config(database_config_template())
+    event_config = read_config(ramp_config_template())
+    err_msg = "The worker AWSWorker cannot train the CV folds"
+    with pytest.raises(ValueError, match=err_msg):
+        Dispatcher(config=config, event_config=event_config,
+                   worker=AWSWorker, fold_parallel=True)
@@ -0,0 +1,65 @@
+import os
+import shutil
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+from rampwf.utils.testing import assert_submission
+
+from ramp_engine.fold_runner import main
+
+KIT_DIR = os.path.join(os.path.dirname(__file__), 'kits', 'iris')
+
+
+@pytest.fixture
+def iris_kit(tmpdir):
+    kit_dir = os.path.join(str(tmpdir), 'iris')
+    shutil.copytree(KIT_DIR, kit_dir,
+                    ignore=shutil.ignore_patterns('training_output'))
+    return kit_dir
+
+
+def test_fold_runner_error():
+    with pytest.raises(SystemExit):
+        main(['train'])
+
+
+def test_fold_runner(iris_kit):
+    paths = ['--submission', 'starting_kit', '--ramp-kit-dir', iris_kit,
+             '--ramp-data-dir', iris_kit, '--ramp-submission-dir',
+             os.path.join(iris_kit, 'submissions')]
+    training_output = os.path.join(iris_kit, 'submissions', 'starting_kit',
+                                   'training_output')
+    # the folds can be trained in any order
+    for fold_i in (1, 0):
+        main(['train', '--fold', str(fold_i)] + paths)
+        assert os.path.isfile(os.path.join(
+            training_output, 'fold_{}'.format(fold_i), 'scores.csv'
+        ))
+    main(['bag'] + paths)
+    bagged_scores = pd.read_csv(
+        os.path.join(training_output, 'bagged_scores.csv')
+    )
+    scores = [pd.read_csv(os.path.join(training_output,
+                                       'fold_{}'.format(fold_i),
+                                       'scores.csv'))
+              for fold_i in range(2)]
+
+    # the outputs are the same as the ones of ramp-test
+    shutil.rmtree(training_output)
+    assert_submission(
+        ramp_kit_dir=iris_kit, ramp_data_dir=iris_kit,
+        ramp_submission_dir=os.path.join(iris_kit, 'submissions'),
+        submission='starting_kit', save_output=True
+    )
+    assert_frame_equal(
+        bagged_scores,
+        pd.read_csv(os.path.join(training_output, 'bagged_scores.csv'))
+    )
+    for fold_i in range(2):
+        expected_scores = pd.read_csv(os.path.join(
+            training_output, 'fold_{}'.format(fold_i), 'scores.csv'
+        ))
+        assert_frame_equal(scores[fold_i].drop(columns='time'),
+                           expected_scores.drop(columns='time'))
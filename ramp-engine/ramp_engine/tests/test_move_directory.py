@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from ramp_engine import local
+from ramp_engine.local import _copy_file_verified
+from ramp_engine.local import _move_directory
+
+
+@pytest.fixture
+def training_output(tmpdir):
+    training_output = os.path.join(str(tmpdir), 'submissions',
+                                   'starting_kit', 'training_output')
+    os.makedirs(os.path.join(training_output, 'fold_0'))
+    with open(os.path.join(training_output, 'bagged_scores.csv'), 'w') as f:
+        f.write('step,n_bag,acc\nvalid,0,0.5\n')
+    with open(os.path.join(training_output, 'fold_0', 'y_pred_test.npz'),
+              'wb') as f:
+        f.write(os.urandom(3 * (1 << 20)))
+    return training_output
+
+
+def _read_files(directory):
+    files = {}
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, directory)] = f.read()
+    return files
+
+
+@pytest.mark.parametrize("same_filesystem", [True, False])
+def test_move_directory(training_output, tmpdir, monkeypatch,
+                        same_filesystem):
+    expected_files = _read_files(training_output)
+    monkeypatch.setattr(local, '_same_filesystem',
+                        lambda path_1, path_2: same_filesystem)
+    copied = []
+
+    def copy_file_verified(src, dst):
+        copied.append(src)
+        return _copy_file_verified(src, dst)
+
+    monkeypatch.setattr(local, '_copy_file_verified', copy_file_verified)
+    pred_dir = os.path.join(str(tmpdir), 'predictions', 'starting_kit')
+    _move_directory(training_output, pred_dir)
+
+    assert not os.path.exists(training_output)
+    assert _read_files(pred_dir) == expected_files
+    # the files are only copied when changing of filesystem
+    assert len(copied) == (0 if same_filesystem else len(expected_files))
+    assert os.listdir(os.path.dirname(pred_dir)) == ['starting_kit']
+
+
+def test_copy_file_verified_error(training_output, tmpdir, monkeypatch):
+    # corrupt the copy while it is written
+    class CorruptedFile:
+        def __init__(self, f):
+            self._f = f
+
+        def write(self, chunk):
+            return self._f.write(chunk[::-1])
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return self._f.__exit__(*args)
+
+    original_open = open
+
+    def corrupted_open(path, mode='r', *args, **kwargs):
+        f = original_open(path, mode, *args, **kwargs)
+        return CorruptedFile(f) if 'w' in mode else f
+
+    monkeypatch.setattr('builtins.open', corrupted_open)
+    with pytest.raises(IOError, match='checksum'):
+        _copy_file_verified(
+            os.path.join(training_output, 'bagged_scores.csv'),
+            os.path.join(str(tmpdir), 'bagged_scores.csv')
+        )
@@ -0,0 +1,113 @@
+import datetime
+import os
+import shutil
+from queue import LifoQueue
+
+import pytest
+
+from ramp_utils import read_config
+from ramp_utils.testing import database_config_template
+from ramp_utils.testing import ramp_config_template
+
+from ramp_database.model import Event
+from ramp_database.model import Model
+from ramp_database.utils import setup_db
+from ramp_database.utils import session_scope
+from ramp_database.testing import create_toy_db
+
+from ramp_database.tools.submission import get_submissions
+
+from ramp_engine.multi_dispatcher import MultiEventDispatcher
+
+EVENTS_DIR = os.path.join(os.path.dirname(__file__), 'events')
+
+
+@pytest.fixture
+def session_toy(database_connection):
+    database_config = read_config(database_config_template())
+    ramp_config = ramp_config_template()
+    try:
+        deployment_dir = create_toy_db(database_config, ramp_config)
+        with session_scope(database_config['sqlalchemy']) as session:
+            yield session
+    finally:
+        shutil.rmtree(deployment_dir, ignore_errors=True)
+        db, _ = setup_db(database_config['sqlalchemy'])
+        Model.metadata.drop_all(db)
+
+
+class _FakeDispatcher:
+    def __init__(self, n_workers, n_awaiting):
+        self._processing_worker_queue = LifoQueue(maxsize=n_workers)
+        self.n_awaiting = n_awaiting
+
+    def can_launch_worker(self):
+        return (not self._processing_worker_queue.full() and
+                self.n_awaiting > 0)
+
+    def launch_next_worker(self, session):
+        self.n_awaiting -= 1
+        self._processing_worker_queue.put_nowait(None)
+        return True
+
+
+def test_multi_event_dispatcher_error_init():
+    with pytest.raises(ValueError, match="The path xxx is not existing"):
+        MultiEventDispatcher(config=database_config_template(),
+                             events_dir='xxx')
+
+
+def test_multi_event_dispatcher_launch_workers():
+    dispatcher = MultiEventDispatcher(
+        config=database_config_template(), events_dir=EVENTS_DIR,
+        n_workers=6
+    )
+    dispatcher._dispatchers = {
+        'event_1': (_FakeDispatcher(n_workers=6, n_awaiting=10), 2),
+        'event_2': (_FakeDispatcher(n_workers=6, n_awaiting=10), 1),
+        'event_3': (_FakeDispatcher(n_workers=1, n_awaiting=10), 1),
+        'event_4': (_FakeDispatcher(n_workers=6, n_awaiting=10), 1),
+    }
+    dispatcher._closing_events = {'event_4'}
+    dispatcher.launch_workers(None)
+
+    n_running = {
+        event_name: event_dispatcher._processing_worker_queue.qsize()
+        for event_name, (event_dispatcher, _)
+        in dispatcher._dispatchers.items()
+    }
+    # the global pool is shared according to the weights, the quota of the
+    # events, and the closed events do not start new workers
+    assert n_running == {'event_1': 3, 'event_2': 2, 'event_3': 1,
+                         'event_4': 0}
+
+
+def test_multi_event_dispatcher_refresh_events(session_toy):
+    dispatcher = MultiEventDispatcher(
+        config=database_config_template(), events_dir=EVENTS_DIR
+    )
+    dispatcher.refresh_events(session_toy)
+    # there is no configuration file for the boston housing event
+    assert list(dispatcher._dispatchers) == ['iris_test']
+
+    event = session_toy.query(Event).filter_by(name="iris_test").one()
+    event.closing_timestamp = datetime.datetime.utcnow()
+    session_toy.commit()
+    dispatcher.refresh_events(session_toy)
+    assert dispatcher._closing_events == {'iris_test'}
+    dispatcher._remove_closed_events(session_toy)
+    assert dispatcher._dispatchers == {}
+    assert dispatcher._closing_events == set()
+
+
+def test_integration_multi_event_dispatcher(session_toy):
+    dispatcher = MultiEventDispatcher(
+        config=database_config_template(), events_dir=EVENTS_DIR,
+        n_workers=-1, hunger_policy='exit'
+    )
+    dispatcher.launch()
+
+    # the iris kit contain a submission which should fail for each user
+    submissions = get_submissions(session_toy, 'iris_test', 'training_error')
+    assert len(submissions) == 2
+    assert len(get_submissions(session_toy, 'iris_test', 'scored')) == 4
@@ -0,0 +1,27 @@
+import subprocess
+import sys
+
+import pytest
+
+from ramp_engine.notification import ChildProcessNotifier
+from ramp_engine.notification import make_submission_notifier
+from ramp_engine.notification import wait_for_notification
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='requires SIGCHLD')
+def test_child_process_notifier():
+    notifier = ChildProcessNotifier()
+    try:
+        assert wait_for_notification([notifier], timeout=0) == []
+        proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+        assert wait_for_notification([notifier], timeout=10) == [notifier]
+        proc.wait()
+        assert len(notifier.consume()) >= 1
+    finally:
+        notifier.close()
+
+
+def test_make_submission_notifier():
+    # without LISTEN/NOTIFY, the dispatcher relies on its timeout
+    config = {'drivername': 'sqlite', 'database': ':memory:'}
+    assert make_submission_notifier(config) is None
@@ -0,0 +1,103 @@
+import datetime
+from queue import Empty
+
+import pytest
+
+from ramp_engine.scheduler import DeadlinePolicy
+from ramp_engine.scheduler import SubmissionQueue
+
+
+def _fill_queue(queue):
+    # team_1 sends 3 submissions at once before the other teams
+    queue.put_nowait('team_1_sub_1', 'team_1', expected_time=100)
+    queue.put_nowait('team_1_sub_2', 'team_1', expected_time=100)
+    queue.put_nowait('team_1_sub_3', 'team_1', expected_time=100)
+    queue.put_nowait('team_2_sub_1', 'team_2', expected_time=10)
+    queue.put_nowait('team_3_sub_1', 'team_3', expected_time=None)
+    queue.put_nowait('team_4_sub_1', 'team_4', expected_time=1000)
+
+
+def _drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get())
+    return items
+
+
+def test_submission_queue_error():
+    with pytest.raises(ValueError, match="Unknown scheduling policy 'xxx'"):
+        SubmissionQueue('xxx')
+
+
+def test_submission_queue_fifo():
+    queue = SubmissionQueue()
+    _fill_queue(queue)
+    assert queue.qsize() == 6
+    assert _drain(queue) == ['team_1_sub_1', 'team_1_sub_2', 'team_1_sub_3',
+                             'team_2_sub_1', 'team_3_sub_1', 'team_4_sub_1']
+    with pytest.raises(Empty):
+        queue.get_nowait()
+
+
+def test_submission_queue_fair_share():
+    queue = SubmissionQueue('fair_share')
+    _fill_queue(queue)
+    assert _drain(queue) == ['team_1_sub_1', 'team_2_sub_1', 'team_3_sub_1',
+                             'team_4_sub_1', 'team_1_sub_2', 'team_1_sub_3']
+
+    # the running submissions are accounted until they are finished
+    _fill_queue(queue)
+    for team_name in ('team_2', 'team_3', 'team_4'):
+        queue.task_done(team_name)
+    assert queue.get() == 'team_2_sub_1'
+
+
+def test_submission_queue_sjf():
+    queue = SubmissionQueue('sjf')
+    _fill_queue(queue)
+    assert _drain(queue) == ['team_3_sub_1', 'team_2_sub_1', 'team_1_sub_1',
+                             'team_1_sub_2', 'team_1_sub_3', 'team_4_sub_1']
+
+
+@pytest.mark.parametrize(
+    "time_to_closing, expected_order",
+    [(datetime.timedelta(days=1),
+      ['team_1_sub_1', 'team_2_sub_1', 'team_3_sub_1', 'team_4_sub_1',
+       'team_1_sub_2', 'team_1_sub_3']),
+     (datetime.timedelta(seconds=500),
+      ['team_3_sub_1', 'team_2_sub_1', 'team_1_sub_1', 'team_1_sub_2',
+       'team_1_sub_3', 'team_4_sub_1'])]
+)
+def test_submission_queue_deadline(time_to_closing, expected_order):
+    closing_timestamp = datetime.datetime.utcnow() + time_to_closing
+    queue = SubmissionQueue('deadline', closing_timestamp=closing_timestamp,
+                            policy_params={'deadline_window': 3600})
+    assert isinstance(queue.policy, DeadlinePolicy)
+    _fill_queue(queue)
+    assert _drain(queue) == expected_order
+
+
+def test_submission_queue_metrics():
+    queue = SubmissionQueue()
+    metrics = queue.metrics()
+    assert metrics['queue_length'] == 0
+    assert metrics['max_wait_time'] == 0
+
+    _fill_queue(queue)
+    queue.get()
+    metrics = queue.metrics()
+    assert metrics['queue_length'] == 5
+    assert metrics['n_running'] == 1
+    assert metrics['max_wait_time'] >= metrics['mean_wait_time'] >= 0
+    assert metrics['mean_dispatch_wait_time'] >= 0
+    queue.task_done('team_1')
+    assert queue.metrics()['n_running'] == 0
+
+
+def test_submission_queue_front():
+    queue = SubmissionQueue('sjf')
+    _fill_queue(queue)
+    queue.put_nowait('team_4_bagging', 'team_4', expected_time=1000,
+                     front=True)
+    assert queue.get() == 'team_4_bagging'
+    assert queue.get() == 'team_3_sub_1'
@@ -7,7 +7,10 @@ from flask_mail import Mail
 from flask_sqlalchemy import SQLAlchemy
 
 from ramp_database.model import Model
+from ramp_database.utils import setup_array_storage
 
+from .cache import LeaderboardCache
+from .interaction import UserInteractionSink
 from ._version import __version__  # noqa
 
 all = [
@@ -18,6 +21,8 @@ HERE = os.path.dirname(__file__)
 db = SQLAlchemy(model_class=Model)
 login_manager = LoginManager()
 mail = Mail()
+leaderboard_cache = LeaderboardCache()
+user_interaction_sink = UserInteractionSink()
 
 
 def create_app(config):
@@ -57,6 +62,7 @@ def create_app(config):
 
     app = Flask('ramp-frontend', root_path=HERE)
     app.config.update(config)
+    setup_array_storage(config.get('ARRAY_STORAGE', {}))
 
     with app.app_context():
         db.init_app(app)
@@ -67,6 +73,10 @@ def create_app(config):
                                        'this page.')
         # register the email manager
         mail.init_app(app)
+        # register the cache of the leaderboards
+        leaderboard_cache.init_app(app)
+        # register the recording of the user interactions
+        user_interaction_sink.init_app(app)
         # register our blueprint
         from .views import admin
         from .views import auth
@@ -0,0 +1,109 @@
+"""
+The :mod:`ramp_frontend.cache` provides a cache for the leaderboards served
+by the frontend.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class LeaderboardCache:
+    """Read-through cache of the leaderboards HTML stored in the database.
+
+    The leaderboards are cached by key and version: the database is read only
+    if the version of the cached leaderboard differs, i.e. once each time the
+    leaderboards are updated. The entries are kept in memory and, optionally,
+    in files shared between the processes serving the frontend.
+
+    Parameters
+    ----------
+    max_entries : int, default=256
+        The maximum number of leaderboards kept in memory. The least recently
+        used leaderboards are discarded first.
+    cache_dir : str or None, default=None
+        The directory where the leaderboards are shared between processes. If
+        None, the leaderboards are only cached in memory.
+    """
+
+    def __init__(self, max_entries=256, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure the cache from the ``LEADERBOARD_CACHE_SIZE`` and
+        ``LEADERBOARD_CACHE_DIR`` settings of a Flask app."""
+        self.max_entries = app.config.get('LEADERBOARD_CACHE_SIZE',
+                                          self.max_entries)
+        self.cache_dir = app.config.get('LEADERBOARD_CACHE_DIR',
+                                        self.cache_dir)
+        self.clear()
+
+    def clear(self):
+        """Discard the leaderboards cached in memory."""
+        with self._lock:
+            self._entries.clear()
+
+    def _filename(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest + '.html')
+
+    def _read_file(self, key, version):
+        try:
+            with open(self._filename(key), encoding='utf-8') as f:
+                if f.readline().rstrip('\n') != str(version):
+                    return None
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_file(self, key, version, html):
+        filename = self._filename(key)
+        tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_filename, 'w', encoding='utf-8') as f:
+                f.write('{}\n{}'.format(version, html))
+            os.replace(tmp_filename, filename)
+        except OSError:
+            pass
+
+    def get(self, key, version, load):
+        """Get a leaderboard, loading it if not cached for this version.
+
+        Parameters
+        ----------
+        key : tuple
+            The key identifying the leaderboard, e.g. the event name and the
+            type of leaderboard.
+        version : int
+            The version of the leaderboard.
+        load : callable
+            Function without parameter returning the HTML of the leaderboard
+            when it is not cached.
+
+        Returns
+        -------
+        html : str or None
+            The HTML of the leaderboard.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+        html = None
+        if self.cache_dir is not None:
+            html = self._read_file(key, version)
+        if html is None:
+            html = load()
+            if self.cache_dir is not None and html is not None:
+                self._write_file(key, version, html)
+        with self._lock:
+            self._entries[key] = (version, html)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
@@ -0,0 +1,337 @@
+"""
+The :mod:`ramp_frontend.interaction` records the interactions of the users
+with the frontend.
+"""
+import atexit
+import datetime
+import difflib
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from ramp_database.model import EventTeam
+from ramp_database.model import UserInteraction
+from ramp_database.tools.user import add_user_interaction
+
+logger = logging.getLogger('RAMP-FRONTEND')
+
+
+def diff_code(old_code, new_code, max_size=20000):
+    """Compute the difference and the similarity between two codes.
+
+    The similarity is the ratio of :class:`difflib.SequenceMatcher`, which is
+    quadratic in the size of the codes. Above ``max_size`` characters, it is
+    approximated in linear time by the proportion of characters belonging to
+    lines present in both codes.
+
+    Parameters
+    ----------
+    old_code : str
+        The code before the modification.
+    new_code : str
+        The code after the modification.
+    max_size : int, default=20000
+        The maximum total number of characters of the two codes for which
+        the exact similarity is computed.
+
+    Returns
+    -------
+    diff : str
+        The unified diff between the lines of the two codes.
+    similarity : float
+        The similarity between the two codes, between 0 and 1.
+    """
+    old_lines, new_lines = old_code.splitlines(), new_code.splitlines()
+    diff = '\n'.join(difflib.unified_diff(old_lines, new_lines))
+    size = len(old_code) + len(new_code)
+    if size <= max_size:
+        similarity = difflib.SequenceMatcher(a=old_code, b=new_code).ratio()
+    else:
+        common_lines = Counter(old_lines) & Counter(new_lines)
+        n_common = sum((len(line) + 1) * count
+                       for line, count in common_lines.items())
+        similarity = min(2 * n_common / size, 1.0)
+    return diff, similarity
+
+
+class UserInteractionSink:
+    """Buffer the user interactions and write them in bulk.
+
+    In asynchronous mode, the interactions are queued in memory and inserted
+    in the database by a background thread, either once ``batch_size``
+    interactions are queued or every ``flush_interval`` milliseconds. The
+    requests do not wait for the database to commit nor for the difference
+    between the submitted codes, computed by a pool of ``n_diff_workers``
+    threads. At most ``max_queue_size`` differences are waiting to be
+    computed, the same policy than for a full queue applying beyond. In
+    synchronous mode, each interaction is committed with
+    :func:`ramp_database.tools.user.add_user_interaction`.
+
+    Parameters
+    ----------
+    asynchronous : bool, default=False
+        Whether to write the interactions from a background thread.
+    max_queue_size : int, default=10000
+        The maximum number of interactions waiting to be written.
+    batch_size : int, default=100
+        The maximum number of interactions inserted at once.
+    flush_interval : int, default=500
+        The maximum time in milliseconds an interaction waits before being
+        written.
+    block_timeout : float, default=0
+        The time in seconds to wait for a place in a full queue, or for a
+        difference to be computed, before dropping an interaction.
+    n_diff_workers : int, default=1
+        The number of threads computing the difference between codes.
+    diff_max_size : int, default=20000
+        The size of the codes above which their similarity is approximated.
+        See :func:`diff_code`.
+    """
+
+    def __init__(self, asynchronous=False, max_queue_size=10000,
+                 batch_size=100, flush_interval=500, block_timeout=0,
+                 n_diff_workers=1, diff_max_size=20000):
+        self.asynchronous = asynchronous
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.n_diff_workers = n_diff_workers
+        self.diff_max_size = diff_max_size
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        # bound the interactions waiting for the difference between codes
+        self._diff_slots = threading.BoundedSemaphore(max_queue_size)
+        self._n_diff_pending = 0
+        self._engine = None
+        self._thread = None
+        self._executor = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._metrics = {'n_written': 0, 'n_dropped': 0, 'n_blocked': 0,
+                         'n_failed': 0}
+        atexit.register(self.close)
+
+    def init_app(self, app):
+        """Configure the sink from the ``USER_INTERACTION_ASYNC``,
+        ``USER_INTERACTION_QUEUE_SIZE``, ``USER_INTERACTION_BATCH_SIZE``,
+        ``USER_INTERACTION_FLUSH_INTERVAL``,
+        ``USER_INTERACTION_BLOCK_TIMEOUT``,
+        ``USER_INTERACTION_DIFF_WORKERS`` and
+        ``USER_INTERACTION_DIFF_MAX_SIZE`` settings of a Flask app."""
+        self.close()
+        self.asynchronous = app.config.get('USER_INTERACTION_ASYNC',
+                                           self.asynchronous)
+        self.max_queue_size = app.config.get('USER_INTERACTION_QUEUE_SIZE',
+                                             self.max_queue_size)
+        self.batch_size = app.config.get('USER_INTERACTION_BATCH_SIZE',
+                                         self.batch_size)
+        self.flush_interval = app.config.get(
+            'USER_INTERACTION_FLUSH_INTERVAL', self.flush_interval
+        )
+        self.block_timeout = app.config.get('USER_INTERACTION_BLOCK_TIMEOUT',
+                                            self.block_timeout)
+        self.n_diff_workers = app.config.get('USER_INTERACTION_DIFF_WORKERS',
+                                             self.n_diff_workers)
+        self.diff_max_size = app.config.get('USER_INTERACTION_DIFF_MAX_SIZE',
+                                            self.diff_max_size)
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._diff_slots = threading.BoundedSemaphore(self.max_queue_size)
+
+    def _count(self, metric, n=1):
+        with self._lock:
+            self._metrics[metric] += n
+
+    def metrics(self):
+        """Get the number of interactions queued, written, dropped because
+        the queue was full, delayed by a full queue, and lost because of a
+        database error. The queued interactions include the ones waiting for
+        the difference between codes.
+
+        Returns
+        -------
+        metrics : dict
+            The ``'n_queued'``, ``'n_written'``, ``'n_dropped'``,
+            ``'n_blocked'`` and ``'n_failed'`` interactions.
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            n_diff_pending = self._n_diff_pending
+        metrics['n_queued'] = self._queue.qsize() + n_diff_pending
+        return metrics
+
+    def add(self, session, interaction=None, user=None, problem=None,
+            event=None, ip=None, note=None, submission=None,
+            submission_file=None, diff=None, similarity=None, old_code=None,
+            new_code=None):
+        """Record a user interaction.
+
+        The parameters are the ones of
+        :func:`ramp_database.tools.user.add_user_interaction`. In
+        asynchronous mode, the session is only used to find the event/team
+        of the user and is not committed.
+
+        If ``old_code`` and ``new_code`` are given, ``diff`` and
+        ``similarity`` are computed from them with :func:`diff_code`, in the
+        background in asynchronous mode.
+        """
+        code_changed = old_code is not None and new_code is not None
+        if not self.asynchronous:
+            if code_changed:
+                diff, similarity = diff_code(old_code, new_code,
+                                             self.diff_max_size)
+            add_user_interaction(
+                session, interaction=interaction, user=user, problem=problem,
+                event=event, ip=ip, note=note, submission=submission,
+                submission_file=submission_file, diff=diff,
+                similarity=similarity
+            )
+            return
+        event_team_id = None
+        if event is not None and user is not None:
+            # same rule than UserInteraction: the team admined by the user
+            event_team_id = (
+                session.query(EventTeam.id)
+                       .filter(EventTeam.event_id == event.id)
+                       .filter(EventTeam.team_id == user.admined_teams[0].id)
+                       .scalar()
+            )
+        record = {
+            'timestamp': datetime.datetime.utcnow(),
+            'interaction': interaction,
+            'note': note,
+            'submission_file_diff': diff,
+            'submission_file_similarity': similarity,
+            'ip': ip,
+            'user_id': None if user is None else user.id,
+            'problem_id': None if problem is None else problem.id,
+            'event_team_id': event_team_id,
+            'submission_id': None if submission is None else submission.id,
+            'submission_file_id': (None if submission_file is None
+                                   else submission_file.id),
+        }
+        self._start(session.get_bind())
+        if code_changed:
+            if self._acquire_diff_slot(record):
+                self._executor.submit(self._put_with_diff, record, old_code,
+                                      new_code)
+        else:
+            self._put(record)
+
+    def _acquire_diff_slot(self, record):
+        acquired = self._diff_slots.acquire(blocking=False)
+        if not acquired and self.block_timeout > 0:
+            self._count('n_blocked')
+            acquired = self._diff_slots.acquire(timeout=self.block_timeout)
+        if not acquired:
+            self._count('n_dropped')
+            logger.warning('Too many differences between codes are waiting '
+                           'to be computed, the interaction "{}" is dropped'
+                           .format(record['interaction']))
+            return False
+        with self._lock:
+            self._n_diff_pending += 1
+        return True
+
+    def _put(self, record):
+        try:
+            self._queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if self.block_timeout > 0:
+            self._count('n_blocked')
+            try:
+                self._queue.put(record, timeout=self.block_timeout)
+                return
+            except queue.Full:
+                pass
+        self._count('n_dropped')
+        logger.warning('The queue of user interactions is full, the '
+                       'interaction "{}" is dropped'
+                       .format(record['interaction']))
+
+    def _put_with_diff(self, record, old_code, new_code):
+        try:
+            diff, similarity = diff_code(old_code, new_code,
+                                         self.diff_max_size)
+            record['submission_file_diff'] = diff
+            record['submission_file_similarity'] = similarity
+        except Exception as e:
+            logger.error('Failed to compute the difference between codes: '
+                         '{}'.format(e))
+        try:
+            self._put(record)
+        finally:
+            with self._lock:
+                self._n_diff_pending -= 1
+            self._diff_slots.release()
+
+    def _start(self, engine):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._engine = engine
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.n_diff_workers,
+                    thread_name_prefix='user-interaction-diff'
+                )
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name='user-interaction-sink')
+            self._thread.start()
+
+    def _get_batch(self, timeout):
+        records = []
+        deadline = time.monotonic() + timeout
+        while len(records) < self.batch_size:
+            try:
+                records.append(self._queue.get(
+                    timeout=max(deadline - time.monotonic(), 0)
+                ))
+            except queue.Empty:
+                break
+        return records
+
+    def _write(self, records):
+        if not records:
+            return
+        with self._write_lock:
+            try:
+                with self._engine.begin() as connection:
+                    connection.execute(UserInteraction.__table__.insert(),
+                                       records)
+                self._count('n_written', len(records))
+            except Exception as e:
+                self._count('n_failed', len(records))
+                logger.error('Failed to write {} user interactions: {}'
+                             .format(len(records), e))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._write(self._get_batch(self.flush_interval / 1000))
+
+    def flush(self):
+        """Write all the queued interactions."""
+        if self._engine is None:
+            return
+        while not self._queue.empty():
+            self._write(self._get_batch(0))
+
+    def close(self):
+        """Stop the background threads after writing the queued
+        interactions."""
+        executor = self._executor
+        if executor is not None:
+            executor.shutdown(wait=True)
+            self._executor = None
+        thread = self._thread
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+            self._thread = None
+        self.flush()
@@ -0,0 +1,44 @@
+from ramp_frontend.cache import LeaderboardCache
+
+
+class _Loader:
+    def __init__(self, html):
+        self.html = html
+        self.n_calls = 0
+
+    def __call__(self):
+        self.n_calls += 1
+        return self.html
+
+
+def test_leaderboard_cache():
+    cache = LeaderboardCache(max_entries=2)
+    loader = _Loader('<table>v1</table>')
+    for _ in range(3):
+        assert cache.get(('iris', 'public'), 1, loader) == '<table>v1</table>'
+    assert loader.n_calls == 1
+
+    # a new version of the leaderboard is read from the database
+    loader.html = '<table>v2</table>'
+    assert cache.get(('iris', 'public'), 2, loader) == '<table>v2</table>'
+    assert loader.n_calls == 2
+
+    # the least recently used leaderboard is discarded
+    cache.get(('iris', 'private'), 1, _Loader('private'))
+    cache.get(('boston', 'public'), 1, _Loader('boston'))
+    assert cache.get(('iris', 'public'), 2, loader) == '<table>v2</table>'
+    assert loader.n_calls == 3
+
+
+def test_leaderboard_cache_shared_dir(tmpdir):
+    cache_dir = str(tmpdir)
+    loader = _Loader('<table>v1</table>')
+    LeaderboardCache(cache_dir=cache_dir).get(('iris', 'public'), 1, loader)
+    # another process reads the leaderboard from the shared directory
+    cache = LeaderboardCache(cache_dir=cache_dir)
+    assert cache.get(('iris', 'public'), 1, loader) == '<table>v1</table>'
+    assert loader.n_calls == 1
+    # unless the version changed
+    loader.html = '<table>v2</table>'
+    assert cache.get(('iris', 'public'), 2, loader) == '<table>v2</table>'
+    assert loader.n_calls == 2
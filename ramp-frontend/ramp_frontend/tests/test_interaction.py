@@ -0,0 +1,157 @@
+import difflib
+import shutil
+import threading
+import time
+
+import pytest
+
+from ramp_utils import read_config
+from ramp_utils.testing import database_config_template
+from ramp_utils.testing import ramp_config_template
+
+from ramp_database.model import Model
+from ramp_database.model import UserInteraction
+from ramp_database.testing import create_toy_db
+from ramp_database.utils import setup_db
+from ramp_database.utils import session_scope
+
+from ramp_database.tools.event import get_event
+from ramp_database.tools.user import get_user_by_name
+
+from ramp_frontend.interaction import diff_code
+from ramp_frontend.interaction import UserInteractionSink
+
+
+@pytest.fixture(scope='module')
+def session_toy(database_connection):
+    database_config = read_config(database_config_template())
+    ramp_config = ramp_config_template()
+    try:
+        deployment_dir = create_toy_db(database_config, ramp_config)
+        with session_scope(database_config['sqlalchemy']) as session:
+            yield session
+    finally:
+        shutil.rmtree(deployment_dir, ignore_errors=True)
+        db, _ = setup_db(database_config['sqlalchemy'])
+        Model.metadata.drop_all(db)
+
+
+def _count_interactions(session, interaction):
+    return (session.query(UserInteraction)
+                   .filter_by(interaction=interaction)
+                   .count())
+
+
+def test_diff_code():
+    old_code = 'import numpy as np\n\nX = np.zeros(10)\n'
+    new_code = 'import numpy as np\n\nX = np.ones(10)\n'
+    diff, similarity = diff_code(old_code, new_code)
+    assert '-X = np.zeros(10)' in diff
+    assert '+X = np.ones(10)' in diff
+    assert similarity == pytest.approx(
+        difflib.SequenceMatcher(a=old_code, b=new_code).ratio()
+    )
+
+    # large codes use the approximation based on the common lines
+    old_code = ''.join('x_{} = {}\n'.format(i, i) for i in range(5000))
+    new_code = old_code + 'y = 0\n'
+    diff, similarity = diff_code(old_code, new_code, max_size=1000)
+    assert '+y = 0' in diff
+    assert similarity == pytest.approx(
+        2 * len(old_code) / (len(old_code) + len(new_code))
+    )
+    assert diff_code(old_code, old_code, max_size=1000)[1] == 1.0
+    assert diff_code(old_code, '', max_size=1000)[1] == 0.0
+
+
+def test_user_interaction_sink_synchronous(session_toy):
+    sink = UserInteractionSink()
+    user = get_user_by_name(session_toy, 'test_user')
+    sink.add(session_toy, interaction='landing', user=user)
+    assert _count_interactions(session_toy, 'landing') == 1
+    assert sink.metrics()['n_queued'] == 0
+
+
+def test_user_interaction_sink_asynchronous(session_toy):
+    sink = UserInteractionSink(asynchronous=True, batch_size=10,
+                               flush_interval=10)
+    user = get_user_by_name(session_toy, 'test_user')
+    event = get_event(session_toy, 'iris_test')
+    for _ in range(25):
+        sink.add(session_toy, interaction='looking at leaderboard',
+                 user=user, event=event)
+    sink.close()
+    session_toy.commit()
+    interactions = (session_toy.query(UserInteraction)
+                               .filter_by(interaction='looking at leaderboard')
+                               .all())
+    assert len(interactions) == 25
+    assert all(ui.event_team.team.name == 'test_user' for ui in interactions)
+    assert sink.metrics() == {'n_queued': 0, 'n_written': 25, 'n_dropped': 0,
+                              'n_blocked': 0, 'n_failed': 0}
+
+
+def test_user_interaction_sink_code_diff(session_toy):
+    sink = UserInteractionSink(asynchronous=True, flush_interval=10)
+    user = get_user_by_name(session_toy, 'test_user')
+    event = get_event(session_toy, 'iris_test')
+    sink.add(session_toy, interaction='save', user=user, event=event,
+             old_code='a = 1\n', new_code='a = 2\n')
+    sink.close()
+    session_toy.commit()
+    interaction = (session_toy.query(UserInteraction)
+                              .filter_by(interaction='save')
+                              .one())
+    assert '+a = 2' in interaction.submission_file_diff
+    assert 0 < interaction.submission_file_similarity < 1
+
+
+def test_user_interaction_sink_full_queue(session_toy):
+    sink = UserInteractionSink(asynchronous=True, max_queue_size=1,
+                               batch_size=1)
+    user = get_user_by_name(session_toy, 'test_user')
+    # block the writing such that the queue fills up
+    with sink._write_lock:
+        sink.add(session_toy, interaction='logout', user=user)
+        while not sink._queue.empty():
+            time.sleep(0.01)
+        sink.add(session_toy, interaction='logout', user=user)
+        sink.add(session_toy, interaction='logout', user=user)
+        metrics = sink.metrics()
+        assert metrics['n_queued'] == 1
+        assert metrics['n_dropped'] == 1
+    sink.close()
+    session_toy.commit()
+    assert _count_interactions(session_toy, 'logout') == 2
+    assert sink.metrics()['n_written'] == 2
+
+
+def test_user_interaction_sink_pending_diffs(session_toy, monkeypatch):
+    sink = UserInteractionSink(asynchronous=True, max_queue_size=1,
+                               batch_size=1, flush_interval=10)
+    user = get_user_by_name(session_toy, 'test_user')
+    computing = threading.Event()
+    release = threading.Event()
+
+    def slow_diff_code(*args):
+        computing.set()
+        release.wait()
+        return diff_code(*args)
+
+    monkeypatch.setattr('ramp_frontend.interaction.diff_code',
+                        slow_diff_code)
+    # the interactions waiting for the difference between codes are bounded
+    # and counted as queued
+    sink.add(session_toy, interaction='upload', user=user,
+             old_code='a = 1\n', new_code='a = 2\n')
+    computing.wait()
+    sink.add(session_toy, interaction='upload', user=user,
+             old_code='a = 1\n', new_code='a = 3\n')
+    metrics = sink.metrics()
+    assert metrics['n_queued'] == 1
+    assert metrics['n_dropped'] == 1
+    release.set()
+    sink.close()
+    session_toy.commit()
+    assert _count_interactions(session_toy, 'upload') == 1
+    assert sink.metrics()['n_queued'] == 0
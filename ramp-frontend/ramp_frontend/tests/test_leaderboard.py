@@ -0,0 +1,105 @@
+import shutil
+
+import pytest
+
+from ramp_utils import generate_flask_config
+from ramp_utils import read_config
+from ramp_utils.testing import database_config_template
+from ramp_utils.testing import ramp_config_template
+
+from ramp_database.model import Model
+from ramp_database.testing import create_toy_db
+from ramp_database.utils import setup_db
+from ramp_database.utils import session_scope
+
+from ramp_database.tools.leaderboard import invalidate_user_leaderboards
+from ramp_database.tools.leaderboard import update_leaderboards
+from ramp_database.tools.leaderboard import update_user_leaderboards
+from ramp_database.tools.team import get_event_team_by_name
+
+from ramp_frontend import create_app
+from ramp_frontend.testing import login_scope
+
+
+@pytest.fixture(scope='module')
+def client_session(database_connection):
+    database_config = read_config(database_config_template())
+    ramp_config = ramp_config_template()
+    try:
+        deployment_dir = create_toy_db(database_config, ramp_config)
+        flask_config = generate_flask_config(database_config)
+        app = create_app(flask_config)
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        with session_scope(database_config['sqlalchemy']) as session:
+            yield app.test_client(), session
+    finally:
+        shutil.rmtree(deployment_dir, ignore_errors=True)
+        try:
+            # In case of failure we should close the global flask engine
+            from ramp_frontend import db as db_flask
+            db_flask.session.close()
+        except RuntimeError:
+            pass
+        db, _ = setup_db(database_config['sqlalchemy'])
+        Model.metadata.drop_all(db)
+
+
+@pytest.mark.parametrize(
+    "page, update_leaderboard",
+    [('/events/iris_test/leaderboard', update_leaderboards),
+     ('/events/iris_test/my_submissions',
+      lambda session, event_name: update_user_leaderboards(
+          session, event_name, 'test_user'))]
+)
+def test_leaderboard_etag(client_session, page, update_leaderboard):
+    client, session = client_session
+
+    with login_scope(client, 'test_user', 'test') as client:
+        rv = client.get(page)
+        assert rv.status_code == 200
+        etag = rv.headers['ETag']
+        assert rv.headers['Cache-Control'] == 'private, no-cache'
+
+        # the leaderboard did not change
+        rv = client.get(page, headers={'If-None-Match': etag})
+        assert rv.status_code == 304
+        assert rv.data == b''
+
+        # the leaderboard was updated
+        update_leaderboard(session, 'iris_test')
+        rv = client.get(page, headers={'If-None-Match': etag})
+        assert rv.status_code == 200
+        assert rv.headers['ETag'] != etag
+        assert rv.data
+
+
+def test_leaderboard_json(client_session):
+    client, _ = client_session
+
+    with login_scope(client, 'test_user', 'test') as client:
+        rv = client.get('/events/iris_test/leaderboard.json?per_page=2')
+        assert rv.status_code == 200
+        leaderboard = rv.get_json()
+        assert leaderboard['page'] == 1
+        assert leaderboard['per_page'] == 2
+        assert len(leaderboard['submissions']) <= 2
+
+        rv = client.get('/events/iris_test/leaderboard.json?sort=xxx')
+        assert rv.status_code == 400
+        assert 'can be sorted by' in rv.get_json()['error']
+
+        rv = client.get('/events/xxx/leaderboard.json')
+        assert rv.status_code == 404
+
+
+def test_my_submissions_outdated_leaderboard(client_session):
+    client, session = client_session
+
+    invalidate_user_leaderboards(session, 'iris_test', ['test_user'])
+    with login_scope(client, 'test_user', 'test') as client:
+        rv = client.get('/events/iris_test/my_submissions')
+        assert rv.status_code == 200
+    event_team = get_event_team_by_name(session, 'iris_test', 'test_user')
+    session.refresh(event_team)
+    assert not event_team.leaderboard_outdated
@@ -1,4 +1,5 @@
 import datetime
+import io
 import os
 import shutil
 
@@ -588,6 +589,56 @@ def test_sandbox_upload_file(client_session, makedrop_event,
         assert "upload" in user_interactions["interaction"].values
 
 
+def test_sandbox_upload_file_shared(client_session, makedrop_event):
+    # the sandboxes of the teams are hard links to the same stored files
+    client, session = client_session
+    sign_up_team(session, "iris_test_4event", "test_user")
+    sign_up_team(session, "iris_test_4event", "test_user_2")
+
+    def estimator_path(event_name, user_name):
+        event = get_event(session, event_name)
+        sandbox_submission = get_submission_by_name(
+            session, event_name, user_name, event.ramp_sandbox_name
+        )
+        return os.path.join(sandbox_submission.path, "estimator.py")
+
+    def read(path):
+        with open(path) as f:
+            return f.read()
+
+    other_path = estimator_path("iris_test_4event", "test_user_2")
+    other_code = read(other_path)
+    with login_scope(client, "test_user", "test") as client:
+        rv = client.post(
+            "http://localhost/events/iris_test_4event/sandbox",
+            headers={"Referer":
+                     "http://localhost/events/iris_test_4event/sandbox"},
+            data={"file": (io.BytesIO(b"uploaded = 1\n"), "estimator.py")},
+            follow_redirects=False,
+        )
+        assert rv.status_code == 302
+    path = estimator_path("iris_test_4event", "test_user")
+    assert read(path) == "uploaded = 1\n"
+    assert read(other_path) == other_code
+
+    # importing a submission into the sandbox
+    submission = get_submission_by_name(session, "iris_test", "test_user",
+                                        "random_forest_10_10")
+    path = estimator_path("iris_test", "test_user")
+    other_path = estimator_path("iris_test", "test_user_2")
+    code, other_code = read(path), read(other_path)
+    try:
+        with login_scope(client, "test_user", "test") as client:
+            client.post("{}/estimator.py".format(submission.hash_),
+                        data={"selected_f_names": ["estimator.py"]})
+        assert read(path) == read(os.path.join(submission.path,
+                                               "estimator.py"))
+        assert read(other_path) == other_code
+    finally:
+        with open(path, "w") as f:
+            f.write(code)
+
+
 def test_sandbox_save_file(client_session, makedrop_event):
     client, session = client_session
     sign_up_team(session, "iris_test_4event", "test_user")
@@ -19,7 +19,6 @@ from ramp_database.utils import check_password
 from ramp_database.utils import hash_password
 
 from ramp_database.tools.user import add_user
-from ramp_database.tools.user import add_user_interaction
 from ramp_database.tools.user import get_user_by_name_or_email
 from ramp_database.tools.user import set_user_by_instance
 
@@ -29,6 +28,7 @@ from ramp_database.exceptions import NameClashError
 
 from ramp_frontend import db
 from ramp_frontend import login_manager
+from ramp_frontend import user_interaction_sink
 
 from ..forms import EmailForm
 from ..forms import LoginForm
@@ -62,7 +62,7 @@ def load_user(id):
 def login():
     """Login request."""
     if app.config['TRACK_USER_INTERACTION']:
-        add_user_interaction(db.session, interaction='landing')
+        user_interaction_sink.add(db.session, interaction='landing')
 
     if flask_login.current_user.is_authenticated:
         logger.info('User already logged-in')
@@ -91,7 +91,7 @@ def login():
         logger.info('User "{}" is logged in'
                     .format(flask_login.current_user.name))
         if app.config['TRACK_USER_INTERACTION']:
-            add_user_interaction(
+            user_interaction_sink.add(
                 db.session, interaction='login', user=flask_login.current_user
             )
         next_ = request.args.get('next')
@@ -108,7 +108,8 @@ def logout():
     """Logout request."""
     user = flask_login.current_user
     if app.config['TRACK_USER_INTERACTION']:
-        add_user_interaction(db.session, interaction='logout', user=user)
+        user_interaction_sink.add(db.session, interaction='logout',
+                                  user=user)
     session['logged_in'] = False
     user.is_authenticated = False
     db.session.commit()
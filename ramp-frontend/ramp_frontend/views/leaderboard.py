@@ -1,13 +1,18 @@
 """Blueprint for all leaderboard functions for the RAMP frontend."""
 import datetime
+import hashlib
 import logging
 
 import flask_login
 
 from flask import Blueprint
 from flask import current_app as app
+from flask import jsonify
+from flask import make_response
 from flask import redirect
 from flask import render_template
+from flask import request
+from flask import session
 from flask import url_for
 
 from ramp_database.tools.event import get_event
@@ -16,16 +21,74 @@ from ramp_database.tools.frontend import is_accessible_code
 from ramp_database.tools.frontend import is_accessible_event
 from ramp_database.tools.frontend import is_accessible_leaderboard
 from ramp_database.tools.frontend import is_user_signed_up
-from ramp_database.tools.user import add_user_interaction
+from ramp_database.tools.leaderboard import get_leaderboard_page
+from ramp_database.tools.leaderboard import update_user_leaderboards
 from ramp_database.tools.team import get_event_team_by_name
 
+from ramp_frontend import __version__
 from ramp_frontend import db
+from ramp_frontend import leaderboard_cache
+from ramp_frontend import user_interaction_sink
 
 from .redirect import redirect_to_user
 
 mod = Blueprint('leaderboard', __name__)
 logger = logging.getLogger('RAMP-FRONTEND')
 
+MAX_PER_PAGE = 100
+
+
+def _get_leaderboard_html(owner, key, attribute):
+    """Get a leaderboard of an event or an event team through the cache.
+
+    Parameters
+    ----------
+    owner : :class:`ramp_database.model.Event` or \
+            :class:`ramp_database.model.EventTeam`
+        The instance storing the leaderboard.
+    key : tuple
+        The key identifying the owner, e.g. the event name.
+    attribute : str
+        The name of the attribute storing the leaderboard.
+
+    Returns
+    -------
+    leaderboard_html : str or None
+        The HTML of the leaderboard.
+    """
+    return leaderboard_cache.get(key + (attribute,),
+                                 owner.leaderboard_version,
+                                 lambda: getattr(owner, attribute))
+
+
+def _leaderboard_response(etag_parts, render):
+    """Render a leaderboard page unless the client already has it.
+
+    Parameters
+    ----------
+    etag_parts : tuple
+        The values on which the page depends, including the version of the
+        leaderboards. They are hashed with the user name to create the ETag.
+    render : callable
+        Function without parameter rendering the page.
+
+    Returns
+    -------
+    response : :class:`flask.Response`
+        The rendered page or an empty "304 Not Modified" response if the
+        ETag of the page matches the ``If-None-Match`` header of the request.
+    """
+    etag_parts = (__version__, flask_login.current_user.name) + etag_parts
+    etag = hashlib.sha1(repr(etag_parts).encode('utf-8')).hexdigest()
+    # the flashed messages are displayed by the page
+    if '_flashes' not in session and etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 
 @mod.route("/events/<event_name>/my_submissions")
 @flask_login.login_required
@@ -45,7 +108,7 @@ def my_submissions(event_name):
             .format(flask_login.current_user.firstname, event_name)
         )
     if app.config['TRACK_USER_INTERACTION']:
-        add_user_interaction(
+        user_interaction_sink.add(
             db.session, interaction='looking at my_submissions',
             user=flask_login.current_user, event=event
         )
@@ -59,23 +122,41 @@ def my_submissions(event_name):
     # Doesn't work if team mergers are allowed
     event_team = get_event_team_by_name(db.session, event_name,
                                         flask_login.current_user.name)
-    leaderboard_html = event_team.leaderboard_html
-    failed_leaderboard_html = event_team.failed_leaderboard_html
-    new_leaderboard_html = event_team.new_leaderboard_html
+    # the leaderboards of the team are recomputed only when displayed
+    if event_team.leaderboard_outdated:
+        update_user_leaderboards(db.session, event_name,
+                                 event_team.team.name)
     admin = is_admin(db.session, event_name, flask_login.current_user.name)
-    if event.official_score_type.is_lower_the_better:
-        sorting_direction = 'asc'
-    else:
-        sorting_direction = 'desc'
-    return render_template('leaderboard.html',
-                           leaderboard_title='Trained submissions',
-                           leaderboard=leaderboard_html,
-                           failed_leaderboard=failed_leaderboard_html,
-                           new_leaderboard=new_leaderboard_html,
-                           sorting_column_index=4,
-                           sorting_direction=sorting_direction,
-                           event=event,
-                           admin=admin)
+
+    def render():
+        key = (event_name, event_team.team.name)
+        if event.official_score_type.is_lower_the_better:
+            sorting_direction = 'asc'
+        else:
+            sorting_direction = 'desc'
+        return render_template(
+            'leaderboard.html',
+            leaderboard_title='Trained submissions',
+            leaderboard=_get_leaderboard_html(
+                event_team, key, 'leaderboard_html'
+            ),
+            failed_leaderboard=_get_leaderboard_html(
+                event_team, key, 'failed_leaderboard_html'
+            ),
+            new_leaderboard=_get_leaderboard_html(
+                event_team, key, 'new_leaderboard_html'
+            ),
+            sorting_column_index=4,
+            sorting_direction=sorting_direction,
+            event=event,
+            admin=admin
+        )
+
+    return _leaderboard_response(
+        ('my_submissions', event_name, event_team.leaderboard_version,
+         admin),
+        render
+    )
 
 
 @mod.route("/events/<event_name>/leaderboard")
@@ -95,47 +176,96 @@ def leaderboard(event_name):
             '{}: no event named "{}"'
             .format(flask_login.current_user.firstname, event_name))
     if app.config['TRACK_USER_INTERACTION']:
-        add_user_interaction(
+        user_interaction_sink.add(
             db.session,
             interaction='looking at leaderboard',
             user=flask_login.current_user,
             event=event
         )
 
-    if is_accessible_leaderboard(db.session, event_name,
-                                 flask_login.current_user.name):
-        leaderboard_html = event.public_leaderboard_html_with_links
-    else:
-        leaderboard_html = event.public_leaderboard_html_no_links
-    if event.official_score_type.is_lower_the_better:
-        sorting_direction = 'asc'
-    else:
-        sorting_direction = 'desc'
-
-    leaderboard_kwargs = dict(
-        leaderboard=leaderboard_html,
-        leaderboard_title='Leaderboard',
-        sorting_column_index=4,
-        sorting_direction=sorting_direction,
-        event=event
-    )
+    with_links = is_accessible_leaderboard(db.session, event_name,
+                                           flask_login.current_user.name)
+    admin = is_admin(db.session, event_name, flask_login.current_user.name)
 
-    if is_admin(db.session, event_name, flask_login.current_user.name):
-        failed_leaderboard_html = event.failed_leaderboard_html
-        new_leaderboard_html = event.new_leaderboard_html
-        template = render_template(
-            'leaderboard.html',
-            failed_leaderboard=failed_leaderboard_html,
-            new_leaderboard=new_leaderboard_html,
-            admin=True,
-            **leaderboard_kwargs
+    def render():
+        key = (event_name,)
+        if with_links:
+            leaderboard_html = _get_leaderboard_html(
+                event, key, 'public_leaderboard_html_with_links'
+            )
+        else:
+            leaderboard_html = _get_leaderboard_html(
+                event, key, 'public_leaderboard_html_no_links'
+            )
+        if event.official_score_type.is_lower_the_better:
+            sorting_direction = 'asc'
+        else:
+            sorting_direction = 'desc'
+
+        leaderboard_kwargs = dict(
+            leaderboard=leaderboard_html,
+            leaderboard_title='Leaderboard',
+            sorting_column_index=4,
+            sorting_direction=sorting_direction,
+            event=event
         )
-    else:
-        template = render_template(
+
+        if admin:
+            failed_leaderboard_html = _get_leaderboard_html(
+                event, key, 'failed_leaderboard_html'
+            )
+            new_leaderboard_html = _get_leaderboard_html(
+                event, key, 'new_leaderboard_html'
+            )
+            return render_template(
+                'leaderboard.html',
+                failed_leaderboard=failed_leaderboard_html,
+                new_leaderboard=new_leaderboard_html,
+                admin=True,
+                **leaderboard_kwargs
+            )
+        return render_template(
             'leaderboard.html', **leaderboard_kwargs
         )
 
-    return template
+    return _leaderboard_response(
+        ('leaderboard', event_name, event.leaderboard_version, with_links,
+         admin),
+        render
+    )
+
+
+@mod.route("/events/<event_name>/leaderboard.json")
+@flask_login.login_required
+def leaderboard_json(event_name):
+    """Page of the public leaderboard in JSON format.
+
+    The page is selected with the ``page`` and ``per_page`` (at most
+    ``MAX_PER_PAGE``) query parameters, the submissions are sorted by the
+    ``sort`` column and can be restricted to a ``team``. See
+    :func:`ramp_database.tools.leaderboard.get_leaderboard_page`.
+
+    Parameters
+    ----------
+    event_name : str
+        The name of the event.
+    """
+    if not is_accessible_event(db.session, event_name,
+                               flask_login.current_user.name):
+        return jsonify(error='no event named "{}"'.format(event_name)), 404
+    with_links = is_accessible_leaderboard(db.session, event_name,
+                                           flask_login.current_user.name)
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), MAX_PER_PAGE)
+    try:
+        leaderboard = get_leaderboard_page(
+            db.session, event_name, page=page, per_page=per_page,
+            sort=request.args.get('sort'),
+            team_name=request.args.get('team'), with_links=with_links
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return jsonify(leaderboard)
 
 
 @mod.route("/events/<event_name>/competition_leaderboard")
@@ -156,7 +286,7 @@ def competition_leaderboard(event_name):
             .format(flask_login.current_user.firstname, event_name)
         )
     if app.config['TRACK_USER_INTERACTION']:
-        add_user_interaction(
+        user_interaction_sink.add(
             db.session,
             interaction='looking at leaderboard',
             user=flask_login.current_user,
@@ -167,19 +297,28 @@ def competition_leaderboard(event_name):
         db.session, event_name, flask_login.current_user.name
     )
     asked = approved
-    leaderboard_html = event.public_competition_leaderboard_html
-    leaderboard_kwargs = dict(
-        leaderboard=leaderboard_html,
-        leaderboard_title='Leaderboard',
-        sorting_column_index=0,
-        sorting_direction='asc',
-        event=event,
-        admin=admin,
-        asked=asked,
-        approved=approved
-    )
 
-    return render_template('leaderboard.html', **leaderboard_kwargs)
+    def render():
+        leaderboard_html = _get_leaderboard_html(
+            event, (event_name,), 'public_competition_leaderboard_html'
+        )
+        leaderboard_kwargs = dict(
+            leaderboard=leaderboard_html,
+            leaderboard_title='Leaderboard',
+            sorting_column_index=0,
+            sorting_direction='asc',
+            event=event,
+            admin=admin,
+            asked=asked,
+            approved=approved
+        )
+        return render_template('leaderboard.html', **leaderboard_kwargs)
+
+    return _leaderboard_response(
+        ('competition_leaderboard', event_name, event.leaderboard_version,
+         admin, approved),
+        render
+    )
 
 
 @mod.route("/events/<event_name>/private_leaderboard")
@@ -207,37 +346,44 @@ def private_leaderboard(event_name):
         return redirect(url_for('ramp.problems'))
 
     if app.config['TRACK_USER_INTERACTION']:
-        add_user_interaction(
+        user_interaction_sink.add(
             db.session,
             interaction='looking at private leaderboard',
             user=flask_login.current_user,
             event=event
         )
-    leaderboard_html = event.private_leaderboard_html
     admin = is_admin(db.session, event_name, flask_login.current_user.name)
-    if event.official_score_type.is_lower_the_better:
-        sorting_direction = 'asc'
-    else:
-        sorting_direction = 'desc'
-
     approved = is_user_signed_up(
         db.session, event_name, flask_login.current_user.name
     )
     asked = approved
-    template = render_template(
-        'leaderboard.html',
-        leaderboard_title='Leaderboard',
-        leaderboard=leaderboard_html,
-        sorting_column_index=5,
-        sorting_direction=sorting_direction,
-        event=event,
-        private=True,
-        admin=admin,
-        asked=asked,
-        approved=approved
-    )
 
-    return template
+    def render():
+        leaderboard_html = _get_leaderboard_html(
+            event, (event_name,), 'private_leaderboard_html'
+        )
+        if event.official_score_type.is_lower_the_better:
+            sorting_direction = 'asc'
+        else:
+            sorting_direction = 'desc'
+        return render_template(
+            'leaderboard.html',
+            leaderboard_title='Leaderboard',
+            leaderboard=leaderboard_html,
+            sorting_column_index=5,
+            sorting_direction=sorting_direction,
+            event=event,
+            private=True,
+            admin=admin,
+            asked=asked,
+            approved=approved
+        )
+
+    return _leaderboard_response(
+        ('private_leaderboard', event_name, event.leaderboard_version, admin,
+         approved),
+        render
+    )
 
 
 @mod.route("/events/<event_name>/private_competition_leaderboard")
@@ -265,7 +411,7 @@ def private_competition_leaderboard(event_name):
         return redirect(url_for('ramp.problems'))
 
     if app.config['TRACK_USER_INTERACTION']:
-        add_user_interaction(
+        user_interaction_sink.add(
             db.session,
             interaction='looking at private leaderboard',
             user=flask_login.current_user,
@@ -277,17 +423,25 @@ def private_competition_leaderboard(event_name):
         db.session, event_name, flask_login.current_user.name
     )
     asked = approved
-    leaderboard_html = event.private_competition_leaderboard_html
-
-    leaderboard_kwargs = dict(
-        leaderboard=leaderboard_html,
-        leaderboard_title='Leaderboard',
-        sorting_column_index=0,
-        sorting_direction='asc',
-        event=event,
-        admin=admin,
-        asked=asked,
-        approved=approved
-    )
 
-    return render_template('leaderboard.html', **leaderboard_kwargs)
+    def render():
+        leaderboard_html = _get_leaderboard_html(
+            event, (event_name,), 'private_competition_leaderboard_html'
+        )
+        leaderboard_kwargs = dict(
+            leaderboard=leaderboard_html,
+            leaderboard_title='Leaderboard',
+            sorting_column_index=0,
+            sorting_direction='asc',
+            event=event,
+            admin=admin,
+            asked=asked,
+            approved=approved
+        )
+        return render_template('leaderboard.html', **leaderboard_kwargs)
+
+    return _leaderboard_response(
+        ('private_competition_leaderboard', event_name,
+         event.leaderboard_version, admin, approved),
+        render
+    )
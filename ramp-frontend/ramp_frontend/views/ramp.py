@@ -1,9 +1,7 @@
 import datetime
-import difflib
 import logging
 import io
 import os
-import shutil
 import tempfile
 import time
 import zipfile
@@ -39,6 +37,7 @@ from ramp_database.exceptions import TooEarlySubmissionError
 
 from ramp_database.tools.event import get_event
 from ramp_database.tools.event import get_problem
+from ramp_database.tools.frontend import get_problems_overview
 from ramp_database.tools.frontend import is_admin
 from ramp_database.tools.frontend import is_accessible_code
 from ramp_database.tools.frontend import is_accessible_event
@@ -47,14 +46,15 @@ from ramp_database.tools.frontend import is_user_sign_up_requested
 from ramp_database.tools.leaderboard import update_leaderboards
 from ramp_database.tools.submission import add_submission
 from ramp_database.tools.submission import add_submission_similarity
+from ramp_database.tools.submission import copy_submission_file
 from ramp_database.tools.submission import get_source_submissions
 from ramp_database.tools.submission import get_submission_by_name
-from ramp_database.tools.user import add_user_interaction
 from ramp_database.tools.team import ask_sign_up_team
 from ramp_database.tools.team import get_event_team_by_name
 from ramp_database.tools.team import sign_up_team
 
 from ramp_frontend import db
+from ramp_frontend import user_interaction_sink
 
 from ..forms import AskForEventForm
 from ..forms import CodeForm
@@ -83,36 +83,12 @@ def problems():
             if flask_login.current_user.is_authenticated else None)
     admin = user.access_level == 'admin' if user is not None else False
     if app.config['TRACK_USER_INTERACTION']:
-        add_user_interaction(
+        user_interaction_sink.add(
             db.session, interaction='looking at problems', user=user
         )
-    problems = get_problem(db.session, None)
-
-    for problem in problems:
-        for event in problem.events:
-            # check the state of the event
-            now = datetime.datetime.now()
-            start = event.opening_timestamp
-            start_collab = event.public_opening_timestamp
-            end = event.closing_timestamp
-            if now < start or now >= end:
-                event.state = 'close'
-            elif now >= start and now < start_collab:
-                event.state = 'competitive'
-            elif now >= start and now >= start_collab and now < end:
-                event.state = 'collab'
-            if user:
-                signed = get_event_team_by_name(
-                                    db.session, event.name,
-                                    flask_login.current_user.name)
-                if not signed:
-                    event.state_user = 'not_signed'
-                elif signed.approved:
-                    event.state_user = 'signed'
-                elif signed:
-                    event.state_user = 'waiting'
-            else:
-                event.state_user = 'not_signed'
+    problems = get_problems_overview(
+        db.session, user.name if user is not None else None
+    )
 
     # problems = Problem.query.order_by(Problem.id.desc())
     return render_template('problems.html',
@@ -136,14 +112,14 @@ def problem(problem_name):
     if current_problem:
         if app.config['TRACK_USER_INTERACTION']:
             if flask_login.current_user.is_authenticated:
-                add_user_interaction(
+                user_interaction_sink.add(
                     db.session,
                     interaction='looking at problem',
                     user=flask_login.current_user,
                     problem=current_problem
                 )
             else:
-                add_user_interaction(
+                user_interaction_sink.add(
                     db.session, interaction='looking at problem',
                     problem=current_problem
                 )
@@ -216,8 +192,10 @@ def user_event(event_name):
     event = get_event(db.session, event_name)
     if event:
         if app.config['TRACK_USER_INTERACTION']:
-            add_user_interaction(db.session, interaction='looking at event',
-                                 event=event, user=flask_login.current_user)
+            user_interaction_sink.add(
+                db.session, interaction='looking at event', event=event,
+                user=flask_login.current_user
+            )
         admin = is_admin(db.session, event_name, flask_login.current_user.name)
         approved = is_user_signed_up(
             db.session, event_name, flask_login.current_user.name
@@ -251,8 +229,10 @@ def sign_up_for_event(event_name):
                                 .format(flask_login.current_user.firstname,
                                         event_name))
     if app.config['TRACK_USER_INTERACTION']:
-        add_user_interaction(db.session, interaction='signing up at event',
-                             user=flask_login.current_user, event=event)
+        user_interaction_sink.add(
+            db.session, interaction='signing up at event',
+            user=flask_login.current_user, event=event
+        )
 
     ask_sign_up_team(db.session, event.name, flask_login.current_user.name)
     if event.is_controled_signup:
@@ -391,19 +371,15 @@ def sandbox(event_name):
                         old_code = submission_file.get_code()
                         submission_file.set_code(
                             request.form[submission_file.name])
-                        new_code = submission_file.get_code()
-                        diff = '\n'.join(difflib.unified_diff(
-                            old_code.splitlines(), new_code.splitlines()))
-                        similarity = difflib.SequenceMatcher(
-                            a=old_code, b=new_code).ratio()
                         if app.config['TRACK_USER_INTERACTION']:
-                            add_user_interaction(
+                            user_interaction_sink.add(
                                 db.session,
                                 interaction='save',
                                 user=flask_login.current_user,
                                 event=event,
                                 submission_file=submission_file,
-                                diff=diff, similarity=similarity
+                                old_code=old_code,
+                                new_code=submission_file.get_code()
                             )
             except Exception as e:
                 return redirect_to_sandbox(event, 'Error: {}'.format(e))
@@ -456,30 +432,25 @@ def sandbox(event_name):
             else:
                 # non-editable files are not verified for now
                 dst = os.path.join(sandbox_submission.path, upload_f_name)
-                shutil.copy2(tmp_f_name, dst)
+                copy_submission_file(tmp_f_name, dst)
             logger.info('{} uploaded {} in {}'
                         .format(flask_login.current_user.name, upload_f_name,
                                 event))
 
             if submission_file.is_editable:
-                new_code = submission_file.get_code()
-                diff = '\n'.join(difflib.unified_diff(
-                    old_code.splitlines(), new_code.splitlines()))
-                similarity = difflib.SequenceMatcher(
-                    a=old_code, b=new_code).ratio()
                 if app.config['TRACK_USER_INTERACTION']:
-                    add_user_interaction(
+                    user_interaction_sink.add(
                         db.session,
                         interaction='upload',
                         user=flask_login.current_user,
                         event=event,
                         submission_file=submission_file,
-                        diff=diff,
-                        similarity=similarity
+                        old_code=old_code,
+                        new_code=submission_file.get_code()
                     )
             else:
                 if app.config['TRACK_USER_INTERACTION']:
-                    add_user_interaction(
+                    user_interaction_sink.add(
                         db.session,
                         interaction='upload',
                         user=flask_login.current_user,
@@ -547,7 +518,7 @@ def sandbox(event_name):
                                new_submission.name, new_submission.path)
                     send_mail(admin.email, subject, body)
             if app.config['TRACK_USER_INTERACTION']:
-                add_user_interaction(
+                user_interaction_sink.add(
                     db.session,
                     interaction='submit',
                     user=flask_login.current_user,
@@ -727,7 +698,7 @@ def credit(submission_hash):
                 )
 
         if app.config['TRACK_USER_INTERACTION']:
-            add_user_interaction(
+            user_interaction_sink.add(
                 db.session,
                 interaction='giving credit',
                 user=flask_login.current_user,
@@ -833,7 +804,7 @@ def view_model(submission_hash, f_name):
         return redirect_to_user(error_str)
 
     if app.config['TRACK_USER_INTERACTION']:
-        add_user_interaction(
+        user_interaction_sink.add(
             db.session,
             interaction='looking at submission',
             user=flask_login.current_user,
@@ -853,7 +824,7 @@ def view_model(submission_hash, f_name):
         #    with ZipFile(archive_filename, 'w') as archive:
         #        archive.write(f_name)
         if app.config['TRACK_USER_INTERACTION']:
-            add_user_interaction(
+            user_interaction_sink.add(
                 db.session,
                 interaction='download',
                 user=flask_login.current_user,
@@ -890,14 +861,14 @@ def view_model(submission_hash, f_name):
             # TODO: deal with different extensions of the same file
             src = os.path.join(submission.path, filename)
             dst = os.path.join(sandbox_submission.path, filename)
-            shutil.copy2(src, dst)  # copying also metadata
+            copy_submission_file(src, dst)  # copying also metadata
             logger.info('Copying {} to {}'.format(src, dst))
 
             submission_file = SubmissionFile.query.filter_by(
                 submission=submission,
                 workflow_element=workflow_element).one()
             if app.config['TRACK_USER_INTERACTION']:
-                add_user_interaction(
+                user_interaction_sink.add(
                     db.session,
                     interaction='copy',
                     user=flask_login.current_user,
@@ -948,7 +919,7 @@ def view_submission_error(submission_hash):
     # TODO: check if event == submission.event_team.event
 
     if app.config['TRACK_USER_INTERACTION']:
-        add_user_interaction(
+        user_interaction_sink.add(
             db.session,
             interaction='looking at error',
             user=flask_login.current_user,
@@ -8,6 +8,7 @@ from ramp_database.testing import setup_ramp_kit_ramp_data
 from ramp_database.tools.event import add_event
 from ramp_database.tools.event import add_problem
 from ramp_database.tools.event import get_problem
+from ramp_database.utils import init_db
 from ramp_database.utils import session_scope
 
 from .config_parser import read_config
@@ -35,6 +36,7 @@ def deploy_ramp_event(config, event_config, setup_ramp_repo=True, force=False):
     database_config = read_config(config, filter_section='sqlalchemy')
     ramp_config = generate_ramp_config(event_config, config)
 
+    init_db(database_config)
     with session_scope(database_config) as session:
         setup_files_extension_type(session)
         if setup_ramp_repo:
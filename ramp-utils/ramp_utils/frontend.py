@@ -38,4 +38,9 @@ def generate_flask_config(config):
          .format(database_config['drivername'], database_config['username'],
                  database_config['password'], database_config['host'],
                  database_config['port'], database_config['database']))
+    # the storage of the arrays is configured when creating the app
+    array_storage = {key: value for key, value in database_config.items()
+                     if key.startswith('array_')}
+    if array_storage:
+        flask_config['ARRAY_STORAGE'] = array_storage
     return flask_config
@@ -30,3 +30,11 @@ def test_generate_flask_config(config):
         'DOMAIN_NAME': 'localhost'
         }
     assert flask_config == expected_config
+
+
+def test_generate_flask_config_array_storage():
+    config = read_config(database_config_template())
+    config['sqlalchemy']['array_codec'] = 'zstd'
+    flask_config = generate_flask_config(config)
+    assert flask_config['ARRAY_STORAGE'] == {'array_codec': 'zstd'}
+    assert 'array' not in flask_config['SQLALCHEMY_DATABASE_URI']
@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+from numpy.testing import assert_array_equal
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+
+from ramp_utils.training_output import load_training_output
+from ramp_utils.training_output import save_training_output
+from ramp_utils.training_output import TRAINING_OUTPUT_FILENAME
+
+
+@pytest.fixture
+def training_output_dir(tmpdir):
+    # mimic the output of ramp-test --save-output with 2 folds
+    training_output_dir = os.path.join(str(tmpdir), 'training_output')
+    rng = np.random.RandomState(42)
+    for fold_i in range(2):
+        fold_dir = os.path.join(training_output_dir,
+                                'fold_{}'.format(fold_i))
+        os.makedirs(fold_dir)
+        for step in ('train', 'valid', 'test'):
+            np.savetxt(os.path.join(fold_dir, step + '_time'),
+                       [rng.rand()])
+            np.savez_compressed(os.path.join(fold_dir,
+                                             'y_pred_{}.npz'.format(step)),
+                                y_pred=rng.rand(10, 3))
+        pd.DataFrame(
+            rng.rand(3, 3), columns=['acc', 'nll', 'time'],
+            index=pd.Index(['train', 'valid', 'test'], name='step')
+        ).to_csv(os.path.join(fold_dir, 'scores.csv'))
+    pd.DataFrame(
+        rng.rand(4, 2), columns=['acc', 'nll'],
+        index=pd.MultiIndex.from_product([['valid', 'test'], [0, 1]],
+                                         names=['step', 'n_bag'])
+    ).to_csv(os.path.join(training_output_dir, 'bagged_scores.csv'))
+    return training_output_dir
+
+
+def test_load_training_output_directory(training_output_dir):
+    training_output = load_training_output(training_output_dir)
+    assert len(training_output['folds']) == 2
+    fold = training_output['folds'][0]
+    assert set(fold) == {'time', 'scores'}
+    assert set(fold['time']) == {'train', 'valid', 'test'}
+    assert list(fold['scores'].columns) == ['acc', 'nll', 'time']
+    assert training_output['bagged_scores'].shape == (4, 2)
+
+    training_output = load_training_output(training_output_dir,
+                                           predictions=True)
+    assert training_output['folds'][1]['y_pred_test'].shape == (10, 3)
+
+
+def test_save_training_output(training_output_dir, tmpdir):
+    bundle_dir = os.path.join(str(tmpdir), 'predictions')
+    save_training_output(training_output_dir,
+                         os.path.join(bundle_dir, TRAINING_OUTPUT_FILENAME))
+    # a single file is written
+    assert os.listdir(bundle_dir) == [TRAINING_OUTPUT_FILENAME]
+
+    expected = load_training_output(training_output_dir, predictions=True)
+    for path in (bundle_dir, os.path.join(bundle_dir,
+                                          TRAINING_OUTPUT_FILENAME)):
+        training_output = load_training_output(path, predictions=True)
+        assert_frame_equal(training_output['bagged_scores'],
+                           expected['bagged_scores'])
+        for fold, expected_fold in zip(training_output['folds'],
+                                       expected['folds']):
+            assert fold['time'] == pytest.approx(expected_fold['time'])
+            assert_frame_equal(fold['scores'], expected_fold['scores'])
+            for step in ('train', 'test'):
+                assert_array_equal(fold['y_pred_' + step],
+                                   expected_fold['y_pred_' + step])
+
+
+def test_save_training_output_object_predictions(training_output_dir,
+                                                 tmpdir):
+    # predictions with an object dtype cannot be read back without pickle
+    np.savez_compressed(
+        os.path.join(training_output_dir, 'fold_0', 'y_pred_test.npz'),
+        y_pred=np.array([['a', 1]] * 10, dtype=object)
+    )
+    training_output = load_training_output(training_output_dir,
+                                           predictions=True)
+    assert training_output['folds'][0]['y_pred_test'].dtype == object
+    filename = os.path.join(str(tmpdir), 'predictions',
+                            TRAINING_OUTPUT_FILENAME)
+    with pytest.raises(ValueError, match='object dtype'):
+        save_training_output(training_output_dir, filename)
+    assert not os.path.exists(os.path.dirname(filename))
+
+
+def test_save_training_output_error(training_output_dir, tmpdir,
+                                    monkeypatch):
+    # the original error is raised when the archive cannot be written
+    def savez(*args, **kwargs):
+        raise MemoryError
+
+    monkeypatch.setattr(np, 'savez', savez)
+    bundle_dir = os.path.join(str(tmpdir), 'predictions')
+    with pytest.raises(MemoryError):
+        save_training_output(training_output_dir,
+                             os.path.join(bundle_dir,
+                                          TRAINING_OUTPUT_FILENAME))
+    assert os.listdir(bundle_dir) == []
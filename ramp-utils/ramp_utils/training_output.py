@@ -0,0 +1,188 @@
+"""Read and write the outputs of a trained submission.
+
+``ramp-test --save-output`` writes a ``training_output`` directory containing
+a ``fold_i`` sub-directory for each CV fold, holding the training times, the
+scores, and the predictions, and the ``bagged_scores.csv`` file. The same
+information can be consolidated in a single ``numpy`` archive, avoiding to
+read and copy many small files.
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+TRAINING_OUTPUT_FILENAME = 'training_output.npz'
+_STEPS = ('train', 'valid', 'test')
+
+
+def _list_folds(training_output_dir):
+    folds = [int(fold_dir[len('fold_'):])
+             for fold_dir in os.listdir(training_output_dir)
+             if re.fullmatch(r'fold_\d+', fold_dir)]
+    return sorted(folds)
+
+
+def _read_directory(training_output_dir, predictions):
+    folds = []
+    for fold_i in _list_folds(training_output_dir):
+        fold_dir = os.path.join(training_output_dir, 'fold_{}'.format(fold_i))
+        fold = {
+            'time': {step: np.loadtxt(os.path.join(fold_dir, step + '_time'))
+                     .item() for step in _STEPS},
+            'scores': pd.read_csv(os.path.join(fold_dir, 'scores.csv'),
+                                  index_col=0)
+        }
+        if predictions:
+            for step in ('train', 'test'):
+                filename = os.path.join(fold_dir,
+                                        'y_pred_{}.npz'.format(step))
+                # ramp-test pickles the predictions with an object dtype
+                with np.load(filename, allow_pickle=True) as y_pred:
+                    fold['y_pred_' + step] = y_pred['y_pred']
+        folds.append(fold)
+    bagged_scores = pd.read_csv(
+        os.path.join(training_output_dir, 'bagged_scores.csv'),
+        index_col=[0, 1]
+    )
+    return {'folds': folds, 'bagged_scores': bagged_scores}
+
+
+def _read_bundle(filename, predictions):
+    with np.load(filename, allow_pickle=False) as bundle:
+        scores_columns = list(bundle['scores_columns'])
+        scores_index = pd.Index(bundle['scores_index'], name='step')
+        folds = []
+        for fold_i in range(len(bundle['time'])):
+            fold = {
+                'time': dict(zip(_STEPS, bundle['time'][fold_i].tolist())),
+                'scores': pd.DataFrame(bundle['scores'][fold_i],
+                                       index=scores_index,
+                                       columns=scores_columns)
+            }
+            if predictions:
+                for step in ('train', 'test'):
+                    key = 'y_pred_{}_{}'.format(step, fold_i)
+                    fold['y_pred_' + step] = bundle[key]
+            folds.append(fold)
+        bagged_scores = pd.DataFrame(
+            bundle['bagged_scores'],
+            index=pd.MultiIndex.from_arrays(
+                [bundle['bagged_scores_step'], bundle['bagged_scores_n_bag']],
+                names=['step', 'n_bag']
+            ),
+            columns=list(bundle['bagged_scores_columns'])
+        )
+    return {'folds': folds, 'bagged_scores': bagged_scores}
+
+
+def load_training_output(path, predictions=False):
+    """Load the outputs of a trained submission.
+
+    Parameters
+    ----------
+    path : str
+        Either the path to a training output archive or to a directory. A
+        directory containing a ``training_output.npz`` archive is read from
+        the archive, otherwise the layout of ``ramp-test --save-output`` is
+        expected.
+    predictions : bool, default=False
+        Whether to load the predictions of each fold.
+
+    Returns
+    -------
+    training_output : dict
+        The dictionary contains:
+
+        * ``'folds'``: a list with a dictionary for each CV fold holding the
+          training times (``'time'``: dict of ``step -> time``), the scores
+          (``'scores'``: DataFrame indexed by step with a column per score
+          type), and, if ``predictions=True``, the predictions on the
+          training and testing sets (``'y_pred_train'`` and
+          ``'y_pred_test'``);
+        * ``'bagged_scores'``: a DataFrame indexed by step and number of
+          bagged folds with a column per score type.
+
+    See also
+    --------
+    ramp_utils.training_output.save_training_output
+    """
+    if os.path.isdir(path):
+        filename = os.path.join(path, TRAINING_OUTPUT_FILENAME)
+        if not os.path.isfile(filename):
+            return _read_directory(path, predictions)
+        path = filename
+    return _read_bundle(path, predictions)
+
+
+def save_training_output(training_output_dir, filename):
+    """Consolidate the training output directory in a single archive.
+
+    The archive is written in a temporary file which is renamed once complete
+    such that a partially written archive is never read.
+
+    Parameters
+    ----------
+    training_output_dir : str
+        The ``training_output`` directory written by
+        ``ramp-test --save-output``.
+    filename : str
+        The path of the archive to create.
+
+    Raises
+    ------
+    ValueError :
+        when the predictions are not numerical (e.g. an object array) and
+        thus cannot be stored without pickling them.
+
+    See also
+    --------
+    ramp_utils.training_output.load_training_output
+    """
+    training_output = _read_directory(training_output_dir, predictions=True)
+    folds = training_output['folds']
+    bagged_scores = training_output['bagged_scores']
+    scores_columns = list(folds[0]['scores'].columns)
+    arrays = {
+        'scores_columns': np.array(scores_columns, dtype=str),
+        'scores_index': np.array(folds[0]['scores'].index, dtype=str),
+        'time': np.array([[fold['time'][step] for step in _STEPS]
+                          for fold in folds]),
+        'scores': np.array([fold['scores'][scores_columns].to_numpy()
+                            for fold in folds]),
+        'bagged_scores_columns': np.array(bagged_scores.columns, dtype=str),
+        'bagged_scores': bagged_scores.to_numpy(),
+        'bagged_scores_step': np.array(
+            bagged_scores.index.get_level_values('step'), dtype=str
+        ),
+        'bagged_scores_n_bag': np.array(
+            bagged_scores.index.get_level_values('n_bag')
+        ),
+    }
+    for fold_i, fold in enumerate(folds):
+        for step in ('train', 'test'):
+            arrays['y_pred_{}_{}'.format(step, fold_i)] = \
+                fold['y_pred_' + step]
+    # the archive is read without allowing pickles
+    object_arrays = sorted(key for key, array in arrays.items()
+                           if array.dtype.hasobject)
+    if object_arrays:
+        raise ValueError(
+            'The arrays {} of the training output "{}" have an object dtype '
+            'and cannot be stored in an archive. Keep the training output '
+            'directory instead.'.format(object_arrays, training_output_dir)
+        )
+
+    dirname = os.path.dirname(os.path.abspath(filename))
+    os.makedirs(dirname, exist_ok=True)
+    tmp_filename = os.path.join(
+        dirname, '.{}.{}.tmp'.format(os.path.basename(filename), os.getpid())
+    )
+    try:
+        with open(tmp_filename, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        raise